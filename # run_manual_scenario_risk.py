@@ -1,44 +1,17 @@
 # run_manual_scenario_risk_auto.py
-import json, os, sys, csv, difflib
-from pathlib import Path
+import argparse, json, sys, csv, difflib, time
 import pandas as pd
 import requests
+from artifact_manifest import find_artifact
+from run_metrics import stage, record_epss, record_cache, record_steps
+from tid_hierarchy import build_tid_hierarchy, step_cves, attach_epss, lookup_cve
+from cve_intel import load_intel, pick_key, intel_cols
+from epss_history import EpssLookupError, batched_lookup
+from li_engine import build_li_table, li_lookup, load_tid_score_csv
 
 # =========================
-# 파일 자동 탐색 유틸
+# 파일 자동 탐색 후보 (artifact_manifest.py)
 # =========================
-def find_file(candidates):
-    """
-    candidates: [정확 경로 or 글롭 패턴]
-    - 스크립트 폴더, 현재 폴더, USERPROFILE/Desktop/바탕 화면, OneDrive/Desktop/바탕 화면에서 탐색
-    """
-    here = Path(__file__).resolve().parent
-    cwd = Path.cwd()
-    bases = {here, cwd}
-    up = os.environ.get("USERPROFILE")
-    if up:
-        bases.add(Path(up) / "Desktop")
-        bases.add(Path(up) / "바탕 화면")
-    one = os.environ.get("OneDrive")
-    if one:
-        bases.add(Path(one) / "Desktop")
-        bases.add(Path(one) / "바탕 화면")
-
-    # 1) 정확 경로 먼저 검사
-    for c in candidates:
-        p = Path(c)
-        if p.exists():
-            return str(p)
-
-    # 2) 패턴 검색
-    for base in list(bases):
-        for c in candidates:
-            pat = c if any(ch in c for ch in "*?[]") else Path(c).name
-            hits = sorted(base.glob(pat))
-            if hits:
-                return str(hits[-1])
-    return None
-
 BUNDLE_CANDIDATES = [
     r"enterprise-attack-1.0.json",
     r"enterprise-attack*.json",
@@ -57,11 +30,13 @@ MAPPING_CANDIDATES = [
 # =========================
 # EPSS
 # =========================
-def fetch_epss_bulk(cves):
+def fetch_epss_bulk(cves, raise_errors=False):
+    """raise_errors=True면 실패를 {}로 삼키지 않고 예외 그대로 (묶음 조회에서 실패 CVE를 캐시하지 않도록)"""
     cves = [c for c in {c.strip().upper() for c in cves} if c]
     if not cves:
         return {}
     url = f"https://api.first.org/data/v1/epss?cve={','.join(cves)}"
+    t0 = time.perf_counter()
     try:
         r = requests.get(url, timeout=15)
         r.raise_for_status()
@@ -72,8 +47,12 @@ def fetch_epss_bulk(cves):
             epss = float(row.get("epss", 0.0))
             pct = float(row.get("percentile", 0.0)) * 100
             out[cve] = {"epss": round(epss,4), "percentile": round(pct,2), "date": row.get("date")}
+        record_epss("api", len(cves), time.perf_counter() - t0, len(out))
         return out
-    except Exception:
+    except Exception as e:
+        record_epss("api", len(cves), time.perf_counter() - t0, error=e)
+        if raise_errors:
+            raise
         return {}
 
 def epss_to_E(epss: float) -> int:
@@ -97,9 +76,11 @@ def index_tech(objects):
       name2tid: {lower(name)->TID}
       name2phase: {lower(name)->첫번째 phase_name}
       names_sorted: [기술명 원문] (출력/제안용)
+      name2phases: {lower(name)->[phase_name, ...]} (L/I 'tactic' 정책용)
     """
     name2tid = {}
     name2phase = {}
+    name2phases = {}
     names_sorted = []
     for o in objects:
         if o.get("type") != "attack-pattern":
@@ -114,19 +95,20 @@ def index_tech(objects):
             if ref.get("source_name") in ("mitre-attack", "mitre-mobile-attack", "mitre-ics-attack"):
                 tid = (ref.get("external_id") or "").strip()
                 break
-        phase = None
+        phases = []
         for ph in o.get("kill_chain_phases", []) or []:
             if ph.get("kill_chain_name") in ["mitre-attack", "mitre-mobile-attack", "mitre-ics-attack"]:
-                phase = ph.get("phase_name")
-                break
+                phases.append(ph.get("phase_name"))
+        phase = phases[0] if phases else None
         if name and tid:
             key = name.lower()
             name2tid[key] = tid
             if phase:
                 name2phase[key] = phase
+            name2phases[key] = phases
             names_sorted.append(name)
     names_sorted.sort()
-    return name2tid, name2phase, names_sorted
+    return name2tid, name2phase, names_sorted, name2phases
 
 # =========================
 # 매핑 CSV 로드 (TID -> [CVE])
@@ -156,31 +138,26 @@ def read_mapping(mapping_csv):
     return inv
 
 # =========================
-# L/I 자동 결정 (phase 휴리스틱)
+# L/I 자동 결정 (li_engine.py)
 # =========================
-PHASE_LI = {
-    "exfiltration":       (2, 5),
-    "impact":             (2, 5),
-    "credential-access":  (3, 4),
-    "lateral-movement":   (3, 4),
-    "privilege-escalation": (3, 4),
-    "discovery":          (3, 2),
-    # 기본값 그룹
-    "initial-access":     (3, 3),
-    "execution":          (3, 3),
-    "persistence":        (3, 3),
-    "defense-evasion":    (3, 3),
-    "collection":         (3, 3),
-    "command-and-control":(3, 3),
-    "resource-development": (3, 3),
-    "reconnaissance":     (3, 3),
-}
-
-def auto_LI(phase_name: str | None):
-    if not phase_name:
-        return 3, 3
-    p = phase_name.strip().lower()
-    return PHASE_LI.get(p, (3, 3))
+LI_POLICY = "phase"  # "phase": 첫 전술 하나로 PHASE_LI 조회 / "tactic": S_* 방식(모든 전술의 I 최대·L 최소)
+LI_USE_CSV = False   # True면 tid_l_score.csv / tid_i_score.csv 값을 휴리스틱보다 우선
+LI_L_CANDIDATES = [
+    r"tid_l_score*.csv",
+    r"*tid_l_score*.csv",
+]
+LI_I_CANDIDATES = [
+    r"tid_i_score*.csv",
+    r"*tid_i_score*.csv",
+]
+
+def load_li_table(name2tid, name2phases):
+    """번들의 모든 기술에 대해 L/I를 한 번에 계산"""
+    l_map = i_map = None
+    if LI_USE_CSV:
+        l_map = load_tid_score_csv(find_artifact("li_l", LI_L_CANDIDATES), col_tid="tid", col_val="l")
+        i_map = load_tid_score_csv(find_artifact("li_i", LI_I_CANDIDATES), col_tid="tid", col_val="i")
+    return build_li_table(name2tid, name2phases, policy=LI_POLICY, l_map=l_map, i_map=i_map)
 
 # =========================
 # 입력 & 계산
@@ -205,67 +182,90 @@ def choose_from_candidates(query, names_sorted):
     k = max(1, min(k, len(cand)))
     return cand[k-1]
 
-def main():
-    # 1) 필수 파일 찾기
-    bundle_path = find_file(BUNDLE_CANDIDATES)
-    mapping_csv = find_file(MAPPING_CANDIDATES)
+RECORD_HISTORY = True  # 실행 결과를 risk_store 이력에 추가
+DATA_SOURCES_FILE = None  # 운영 중인 데이터 소스 목록 파일 → 단계별 탐지 커버리지(Detect) 표시
+DETECT_DISCOUNT = 0.0     # 탐지되는 단계의 NormRisk 할인율 (NormRisk *= 1 - DETECT_DISCOUNT * 커버리지)
+CVE_FALLBACK = None       # 하위 기술에 매핑된 CVE가 없을 때 대체: None | "parent" | "family"(부모+형제) (tid_hierarchy.py)
+EPSS_MODE = None          # None이면 EPSS API 최신값, "asof" | "max" | "trend"면 일별 스냅샷 저장소 사용 (epss_history.py)
+EPSS_AS_OF = None         # 스냅샷 기준일 "YYYY-MM-DD" (None이면 저장된 가장 최근 날짜)
+CVE_PICK = "epss"         # 단계 대표 CVE 선택: "epss" | "kev"(KEV 우선) | "weighted"(EPSS+CVSS+KEV) (cve_intel.py)
+JSONL_BATCH = 256         # --jsonl 모드: 한 번에 모아 EPSS를 조회할 최대 줄 수 (입력이 더 없으면 바로 처리)
 
-    missing = []
-    if not bundle_path:  missing.append("enterprise-attack*.json")
-    if not mapping_csv:  missing.append("Att&ckToCveMappings*.csv")
-    if missing:
-        print("[필수 파일을 찾지 못함]")
-        for m in missing:
-            print(f"- {m}")
-        print("\n해결: 파일을 현재 폴더/바탕 화면/OneDrive 바탕 화면으로 옮기거나, 코드 상단의 *_CANDIDATES에 정확 경로를 추가")
-        sys.exit(1)
+class EpssPrefetch:
+    """
+    단계가 입력되는 즉시 그 단계 CVE의 EPSS를 백그라운드 스레드로 조회
+    이미 받았거나 조회 중인 CVE는 다시 요청하지 않음 (세션 동안 캐시 유지)
+    조회가 실패한 CVE는 캐시하지 않음 → 다음 submit에서 다시 요청
+    """
+    def __init__(self, lookup, workers=2):
+        from concurrent.futures import ThreadPoolExecutor
+        self.lookup = lookup
+        self.ex = ThreadPoolExecutor(max_workers=workers)
+        self.cache = {}      # CVE → EPSS dict (조회했지만 값이 없으면 None)
+        self.pending = set()
+        self.jobs = []       # [(future, [CVE, ...])]
 
-    # 2) 번들 인덱싱
-    objs = load_bundle(bundle_path)
-    name2tid, name2phase, names_sorted = index_tech(objs)
-    if not name2tid:
-        sys.exit("번들에서 기술을 찾지 못함")
+    def submit(self, cves):
+        uniq = list(dict.fromkeys(cves))
+        todo = [c for c in uniq if c not in self.cache and c not in self.pending]
+        record_cache("epss", hits=len(uniq) - len(todo), misses=len(todo))
+        if todo:
+            self.pending.update(todo)
+            self.jobs.append((self.ex.submit(self.lookup, todo), todo))
 
-    # 3) 시나리오 기술명 입력 (END로 종료)
-    print("\n[시나리오 입력]  기술명을 한 줄씩 입력하세요. (끝내려면 END)")
-    steps = []
-    step_no = 1
-    while True:
-        raw = input(f" {step_no:02d}) 기술명: ").strip()
-        if raw.upper() == "END":
-            break
-        if not raw:
-            continue
-        # 정확 일치 우선, 없으면 후보 제안
-        key = raw.lower()
-        if key not in name2tid:
-            chosen = choose_from_candidates(raw, names_sorted)
-            if not chosen:
+    def collect(self, wait=False):
+        """끝난 조회를 캐시에 반영 (wait=True면 남은 조회를 모두 기다림) → attach_epss용 {CVE: EPSS dict}"""
+        left = []
+        for fut, todo in self.jobs:
+            if not (wait or fut.done()):
+                left.append((fut, todo))
                 continue
-            steps.append(chosen)
-        else:
-            # 원문명을 리스트에서 찾아 표시용으로 사용
-            # (대소문자 보존을 위해 closest match)
-            chosen = difflib.get_close_matches(raw, names_sorted, n=1, cutoff=0.0)
-            steps.append(chosen[0] if chosen else raw)
-        step_no += 1
-
-    if not steps:
-        print("입력된 기술이 없습니다. 종료합니다.")
-        return
+            failed = ()
+            try:
+                got = fut.result() or {}
+            except EpssLookupError as e:
+                got, failed = e.partial, set(e.failed)
+            except Exception:
+                got, failed = {}, set(todo)
+            for c in todo:
+                if c not in failed:
+                    self.cache[c] = got.get(c)
+            self.pending.difference_update(todo)
+        self.jobs = left
+        return {c: v for c, v in self.cache.items() if v}
 
-    # 4) 매핑 로드 & EPSS 벌크 조회
-    mapping_inv = read_mapping(mapping_csv)
+    def close(self):
+        self.ex.shutdown(wait=False, cancel_futures=True)
 
-    # 후보 CVE 수집
-    all_cves = []
-    for nm in steps:
-        tid = name2tid.get(nm.lower(), "")
-        cves = mapping_inv.get(tid, []) if tid else []
-        all_cves.extend(cves)
-    epss_map = fetch_epss_bulk(all_cves)
+def read_step(step_no, name2tid, names_sorted):
+    """
+    기술명 한 줄 입력 → (명령, 기술명)
+    명령: "step"(기술 선택됨) | "end"(시나리오 끝) | "undo"(마지막 단계 취소) | "quit"(세션 종료) | "skip"
+    """
+    try:
+        raw = input(f" {step_no:02d}) 기술명: ").strip()
+    except EOFError:
+        return "quit", None
+    cmd = raw.upper()
+    if cmd == "END":
+        return "end", None
+    if cmd in ("QUIT", "Q", "EXIT"):
+        return "quit", None
+    if cmd == "UNDO":
+        return "undo", None
+    if not raw:
+        return "skip", None
+    # 정확 일치 우선, 없으면 후보 제안
+    if raw.lower() not in name2tid:
+        chosen = choose_from_candidates(raw, names_sorted)
+        return ("step", chosen) if chosen else ("skip", None)
+    # 원문명을 리스트에서 찾아 표시용으로 사용
+    # (대소문자 보존을 위해 closest match)
+    chosen = difflib.get_close_matches(raw, names_sorted, n=1, cutoff=0.0)
+    return "step", (chosen[0] if chosen else raw)
 
-    # 5) 점수 계산
+def score_steps(steps, name2tid, name2phase, li_table, hier, intel):
+    """단계별 점수 행 (attach_epss가 끝난 hier 기준)"""
     rows = []
     for idx, nm in enumerate(steps, 1):
         key = nm.lower()
@@ -273,17 +273,10 @@ def main():
         phase = name2phase.get(key)  # 없을 수도 있음
 
         # 자동 L/I
-        L, I = auto_LI(phase)
-
-        # 대표 CVE = EPSS 최고
-        cves = mapping_inv.get(tid, []) if tid else []
-        best_cve, best_epss, best_pct, best_date = None, 0.0, None, None
-        for c in cves:
-            m = epss_map.get(c)
-            e = m["epss"] if m else 0.0
-            if m and e >= best_epss:
-                best_cve, best_epss = c, e
-                best_pct, best_date = m["percentile"], m["date"]
+        L, I = li_lookup(li_table, tid, nm)
+
+        # 대표 CVE = EPSS 최고 (CVE_FALLBACK이면 부모/형제 기술로 대체)
+        best_cve, best_epss, best_pct, best_date, via = lookup_cve(hier, tid, CVE_FALLBACK)
 
         E = epss_to_E(best_epss if best_cve else 0.0)
         pii_risk = E * (5 - L) * I
@@ -297,25 +290,46 @@ def main():
             "technique": nm,
             "TID": tid,
             "CVE": best_cve or "",
+            "CVE_via": via,
             "EPSS": round(best_epss,4) if best_cve else "",
             "E(1~5)": E,
             "L": L, "I": I,
             "PII_Risk(0~125)": pii_risk,
             "NormRisk(0~1)": round(norm,6)
         })
+        if intel:
+            rows[-1].update(intel_cols(intel, best_cve))
+    return rows
 
-    df = pd.DataFrame(rows)
-
-    # 6) 시나리오 요약(연쇄 결합)
+def series_of(rows):
     series_norm = 1.0
-    for r in df["NormRisk(0~1)"]:
-        x = float(r) if str(r) != "" else 0.0
+    for r in rows:
+        x = float(r["NormRisk(0~1)"]) if str(r["NormRisk(0~1)"]) != "" else 0.0
         series_norm *= (1.0 - x)
-    series_norm = 1.0 - series_norm
+    return 1.0 - series_norm
+
+def print_running(rows, waiting):
+    """입력 중 표: EPSS 조회가 아직 안 끝난 단계는 '...'"""
+    lines = []
+    for r, w in zip(rows, waiting):
+        cve, epss, norm = ("...", "...", "...") if w else (r["CVE"] or "-", r["EPSS"] if r["EPSS"] != "" else "-", r["NormRisk(0~1)"])
+        lines.append(f"     {r['step']:>2}  {r['technique'][:40]:<40} {r['TID']:<10} {cve:<16} EPSS {epss:<7} Norm {norm}")
+    print("\n".join(lines))
+    if not any(waiting):
+        print(f"     → Series Norm(0~1): {round(series_of(rows), 6)}")
+
+def print_result(rows, undetected, intel):
+    df = pd.DataFrame(rows)
+    series_norm = series_of(rows)
 
-    # 7) 출력
     print("\n[단계별 결과]")
     cols = ["step","phase","technique","TID","CVE","EPSS","E(1~5)","L","I","PII_Risk(0~125)","NormRisk(0~1)"]
+    if CVE_FALLBACK:
+        cols.append("CVE_via")
+    if intel:
+        cols += ["CVSS", "KEV"]
+    if undetected is not None:
+        cols.append("Detect(0~1)")
     print(df[cols].to_string(index=False))
 
     print("\n[시나리오 요약]")
@@ -324,6 +338,280 @@ def main():
     print(f"- Avg Norm(0~1): {round(float(df['NormRisk(0~1)'].replace('',0).astype(float).mean()),6)}")
     print(f"- Max Norm(0~1): {round(float(df['NormRisk(0~1)'].replace('',0).astype(float).max()),6)}")
     print(f"- Series Norm(0~1): {round(series_norm,6)}  (~ {round(series_norm*100,2)}%)")
+    if undetected:
+        print(f"- Undetected steps: {len(undetected)} ({', '.join(undetected)})")
+
+# =========================
+# JSONL 스트리밍 (--jsonl)
+# =========================
+def make_resolver(name2tid, names_sorted, cache_size=65536):
+    """
+    기술명 / TID → 기술명 원문 (없으면 None)
+    정확 일치(대소문자 무시) → TID → difflib 후보 1순위 (대화형과 같은 cutoff), 결과는 LRU 캐시
+    """
+    from functools import lru_cache
+    by_lower = {nm.lower(): nm for nm in names_sorted}
+    by_tid = {}
+    for nm in names_sorted:
+        by_tid.setdefault(name2tid[nm.lower()].upper(), nm)
+
+    @lru_cache(maxsize=cache_size)
+    def resolve(q):
+        q = q.strip()
+        if not q:
+            return None
+        hit = by_lower.get(q.lower()) or by_tid.get(q.upper())
+        if hit:
+            return hit
+        cand = difflib.get_close_matches(q, names_sorted, n=1, cutoff=0.5)
+        return cand[0] if cand else None
+    return resolve
+
+def _iter_batches(f, size):
+    """
+    입력 줄을 별도 스레드로 읽어 (줄 번호, 줄) 묶음으로: 최소 1줄, 이미 도착한 줄만 최대 size개까지
+    읽기 중 예외(잘못된 UTF-8 등)는 앞 줄들을 내보낸 뒤 메인 스레드에서 그대로 다시 발생
+    """
+    import queue, threading
+    q = queue.Queue(maxsize=size * 4)  # 읽기가 앞서가도 메모리는 묶음 몇 개 분량까지만
+
+    def pump():
+        err = None
+        try:
+            for k, line in enumerate(f, 1):
+                q.put((k, line))
+        except Exception as e:
+            err = e
+        finally:
+            q.put(err)  # 끝 표시: None(정상 종료) 또는 예외 → 메인 스레드가 멈추지 않음
+    threading.Thread(target=pump, daemon=True).start()
+
+    while True:
+        item = q.get()
+        if not isinstance(item, tuple):
+            break
+        batch = [item]
+        while len(batch) < size:
+            try:
+                item = q.get_nowait()
+            except queue.Empty:
+                break
+            if not isinstance(item, tuple):
+                break
+            batch.append(item)
+        yield batch
+        if not isinstance(item, tuple):
+            break
+    if item is not None:
+        raise item
+
+def _parse_scenario(line, k):
+    """JSONL 한 줄 → (id, [기술명/TID, ...]); ["A", "B"] 또는 {"id": ..., "steps"|"techniques": [...]}"""
+    obj = json.loads(line)
+    if isinstance(obj, dict):
+        sid = obj.get("id", k)
+        items = obj.get("steps", obj.get("techniques"))
+    else:
+        sid, items = k, obj
+    if not isinstance(items, list):
+        raise ValueError("기술 목록(list)이 없음")
+    return sid, [str(x) for x in items]
+
+def run_jsonl(src, out, resolve, name2tid, name2phase, li_table, hier, intel, key, epss_lookup, cov=None, batch=JSONL_BATCH):
+    """
+    JSONL 시나리오를 줄 단위로 채점해서 줄마다 결과 JSONL 한 줄 (입력 순서 그대로, 묶음마다 flush)
+    EPSS는 묶음 안에서 처음 보는 CVE만 한 번에 조회 → 캐시 크기는 매핑 CVE 수를 넘지 않음
+    조회가 실패한 CVE는 캐시하지 않음 → 그 CVE가 다시 나오는 묶음에서 재조회
+    """
+    from result_writer import STEP_COLUMNS, normalize_row, summarize_rows
+    if cov is not None:
+        from make_scenario import apply_detection
+    # score_steps 행에 있는 컬럼만 (이 러너는 percentile/date를 행에 넣지 않음, 선택 컬럼은 켜진 것만)
+    enabled = {"CVE_via": bool(CVE_FALLBACK), "CVSS": bool(intel), "KEV": bool(intel), "Detect(0~1)": cov is not None}
+    step_cols = [c for c in STEP_COLUMNS
+                 if c[0] not in ("scenario", "EPSS_percentile(%)", "EPSS_date") and enabled.get(c[0], True)]
+
+    epss_cache = {}
+    n_in = n_err = 0
+    for lines in _iter_batches(src, batch):
+        parsed = []
+        need = []
+        n_cand = 0
+        for k, line in lines:
+            if not line.strip():
+                continue
+            n_in += 1
+            try:
+                sid, items = _parse_scenario(line, k)
+            except ValueError as e:  # json.JSONDecodeError 포함
+                parsed.append((k, None, None, None, str(e)))
+                continue
+            steps = []
+            unresolved = []
+            for q in items:
+                nm = resolve(q)
+                if nm:
+                    steps.append(nm)
+                else:
+                    unresolved.append(q)
+            for nm in steps:
+                cs = step_cves(hier, name2tid.get(nm.lower(), ""), CVE_FALLBACK)
+                n_cand += len(cs)
+                need.extend(c for c in cs if c not in epss_cache)
+            parsed.append((k, sid, steps, unresolved, None))
+
+        need = list(dict.fromkeys(need))
+        record_cache("epss", hits=n_cand - len(need), misses=len(need))
+        if need:
+            failed = ()
+            try:
+                fetched = epss_lookup(need)
+            except EpssLookupError as e:
+                fetched, failed = e.partial, set(e.failed)
+            for c in need:
+                if c not in failed:
+                    epss_cache[c] = fetched.get(c)
+            attach_epss(hier, {c: v for c, v in epss_cache.items() if v}, key)
+
+        for k, sid, steps, unresolved, err in parsed:
+            if err is not None:
+                n_err += 1
+                rec = {"line": k, "error": err}
+            else:
+                rows = score_steps(steps, name2tid, name2phase, li_table, hier, intel)
+                record_steps(rows)
+                if cov is not None:
+                    apply_detection(rows, cov, discount=DETECT_DISCOUNT)
+                summary = summarize_rows(rows)
+                del summary["scenario"], summary["start"]
+                rec = {"id": sid, "line": k, "summary": summary, "unresolved": unresolved,
+                       "steps": [normalize_row(r, step_cols) for r in rows]}
+            out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        out.flush()
+    return n_in, n_err
+
+def main():
+    p = argparse.ArgumentParser(description="수동 시나리오 위험도 (대화형 입력 / JSONL 스트리밍)")
+    p.add_argument("--jsonl", metavar="FILE", help="JSONL 시나리오 파일 ('-'=stdin) → 줄마다 결과 JSONL (대화형 입력·이력 저장 없음)")
+    p.add_argument("--out", help="--jsonl 결과 파일 (기본: stdout)")
+    p.add_argument("--batch", type=int, default=JSONL_BATCH, help=f"EPSS 묶음 조회 최대 줄 수 (기본 {JSONL_BATCH})")
+    args = p.parse_args()
+    # JSONL 모드에서는 stdout을 결과 전용으로 두고 안내 메시지는 stderr로
+    log = sys.stderr if args.jsonl else sys.stdout
+
+    # 1) 필수 파일 찾기
+    bundle_path = find_artifact("bundle", BUNDLE_CANDIDATES)
+    mapping_csv = find_artifact("mapping", MAPPING_CANDIDATES)
+
+    missing = []
+    if not bundle_path:  missing.append("enterprise-attack*.json")
+    if not mapping_csv:  missing.append("Att&ckToCveMappings*.csv")
+    if missing:
+        print("[필수 파일을 찾지 못함]", file=log)
+        for m in missing:
+            print(f"- {m}", file=log)
+        print("\n해결: 파일을 현재 폴더/바탕 화면/OneDrive 바탕 화면으로 옮기거나, 코드 상단의 *_CANDIDATES에 정확 경로를 추가", file=log)
+        sys.exit(1)
+
+    # 2) 번들 인덱싱 + 매핑/탐지 커버리지 (세션 동안 한 번만)
+    with stage("bundle_load"):
+        objs = load_bundle(bundle_path)
+        name2tid, name2phase, names_sorted, name2phases = index_tech(objs)
+    li_table = load_li_table(name2tid, name2phases)
+    if not name2tid:
+        sys.exit("번들에서 기술을 찾지 못함")
+
+    with stage("mapping_load"):
+        mapping_inv = read_mapping(mapping_csv)
+        hier = build_tid_hierarchy(name2tid.values(), mapping_inv)
+    intel = load_intel() if CVE_PICK != "epss" else {}
+    key = pick_key(CVE_PICK, intel)
+
+    cov = None
+    if DATA_SOURCES_FILE:
+        from make_scenario import read_data_sources, detection_coverage_by_tid, apply_detection
+        cov = detection_coverage_by_tid(objs, read_data_sources(DATA_SOURCES_FILE))
+
+    if EPSS_MODE:
+        from epss_history import epss_scores
+        epss_lookup = lambda cves: epss_scores(cves, mode=EPSS_MODE, day=EPSS_AS_OF)
+    else:
+        # API URL 길이 때문에 100개씩 나눠 조회 (실패한 묶음은 EpssLookupError → 캐시하지 않음)
+        epss_lookup = lambda cves: batched_lookup(lambda b: fetch_epss_bulk(b, raise_errors=True), cves)
+
+    if args.jsonl:
+        src = sys.stdin if args.jsonl == "-" else open(args.jsonl, "r", encoding="utf-8")
+        out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+        resolve = make_resolver(name2tid, names_sorted)
+        try:
+            with stage("jsonl"):
+                n_in, n_err = run_jsonl(src, out, resolve, name2tid, name2phase,
+                                        li_table, hier, intel, key, epss_lookup, cov=cov, batch=max(1, args.batch))
+        finally:
+            info = resolve.cache_info()
+            record_cache("resolver", hits=info.hits, misses=info.misses)
+            if src is not sys.stdin:
+                src.close()
+            if out is not sys.stdout:
+                out.close()
+        print(f"[jsonl] {n_in:,}개 시나리오 처리 (오류 {n_err:,})", file=log)
+        return
+
+    # EPSS는 단계를 받는 즉시 백그라운드 조회
+    prefetch = EpssPrefetch(epss_lookup)
+
+    n_scenario = 0
+    try:
+        while True:
+            # 3) 시나리오 기술명 입력 (END로 채점, QUIT로 세션 종료)
+            n_scenario += 1
+            print(f"\n[시나리오 {n_scenario} 입력]  기술명을 한 줄씩 입력하세요. (END=채점, UNDO=마지막 단계 취소, QUIT=종료)")
+            steps = []
+            quit_after = False
+            while True:
+                cmd, nm = read_step(len(steps) + 1, name2tid, names_sorted)
+                if cmd == "skip":
+                    continue
+                if cmd in ("end", "quit"):
+                    quit_after = cmd == "quit"
+                    break
+                if cmd == "undo":
+                    if steps:
+                        print(f"  → 취소: {steps.pop()}")
+                else:
+                    steps.append(nm)
+                    prefetch.submit(step_cves(hier, name2tid.get(nm.lower(), ""), CVE_FALLBACK))
+                if steps:
+                    attach_epss(hier, prefetch.collect(), key)
+                    waiting = [any(c in prefetch.pending for c in step_cves(hier, name2tid.get(s.lower(), ""), CVE_FALLBACK))
+                               for s in steps]
+                    print_running(score_steps(steps, name2tid, name2phase, li_table, hier, intel), waiting)
+
+            if not steps:
+                if quit_after:
+                    break
+                print("입력된 기술이 없습니다.")
+                continue
+
+            # 4) 남은 EPSS 조회를 기다리고 최종 점수 (보통 입력 중에 이미 끝나 있음)
+            attach_epss(hier, prefetch.collect(wait=True), key)
+            rows = score_steps(steps, name2tid, name2phase, li_table, hier, intel)
+            record_steps(rows)
+            undetected = apply_detection(rows, cov, discount=DETECT_DISCOUNT) if cov is not None else None
+            print_result(rows, undetected, intel)
+
+            # 이력 저장 (risk_store.py, pyarrow 필요)
+            if RECORD_HISTORY:
+                try:
+                    from risk_store import record_run
+                    record_run(rows, "manual")
+                except ImportError as e:
+                    print(f"[이력 저장 생략] {e}")
+
+            if quit_after:
+                break
+    finally:
+        prefetch.close()
 
 if __name__ == "__main__":
     main()
@@ -1,14 +1,26 @@
 # S_1.py  —  FIN7-style: spearphish → creds → email/cloud exfil
-import json, os
-from pathlib import Path
+import json
+import time
 import pandas as pd
 import requests
+from artifact_manifest import find_artifact
+from run_metrics import stage, record_epss, record_steps
+from tid_hierarchy import build_tid_hierarchy, step_cves, attach_epss, lookup_cve
+from cve_intel import load_intel, pick_key, intel_cols
+from li_engine import build_li_table, li_lookup, load_tid_score_csv
 
 # =========================
-# 설정(기본값은 자동 L/I가 없을 때만 사용)
+# 설정
 # =========================
-L_DEFAULT = 3
-I_DEFAULT = 4
+LI_POLICY = "tactic"  # 자동 L/I 휴리스틱 정책 (li_engine.py: tactic | phase)
+RECORD_HISTORY = True  # 실행 결과를 risk_store 이력에 추가
+DATA_SOURCES_FILE = None  # 운영 중인 데이터 소스 목록 파일 → 단계별 탐지 커버리지(Detect) 표시
+DETECT_DISCOUNT = 0.0     # 탐지되는 단계의 NormRisk 할인율 (NormRisk *= 1 - DETECT_DISCOUNT * 커버리지)
+SENSITIVITY = False    # True면 단계별 L/I/EPSS 변경 what-if 민감도 순위 출력 (sensitivity.py)
+CVE_FALLBACK = None   # 하위 기술에 매핑된 CVE가 없을 때 대체: None | "parent" | "family"(부모+형제) (tid_hierarchy.py)
+EPSS_MODE = None      # None이면 EPSS API 최신값, "asof" | "max" | "trend"면 일별 스냅샷 저장소 사용 (epss_history.py)
+EPSS_AS_OF = None     # 스냅샷 기준일 "YYYY-MM-DD" (None이면 저장된 가장 최근 날짜)
+CVE_PICK = "epss"     # 단계 대표 CVE 선택: "epss" | "kev"(KEV 우선) | "weighted"(EPSS+CVSS+KEV) (cve_intel.py)
 
 # 파일 자동 탐색 후보
 BUNDLE_CANDIDATES = [
@@ -38,31 +50,6 @@ SCENARIO_TECHNIQUES = [
 # =========================
 # 공통 유틸
 # =========================
-def find_file(candidates):
-    here = Path(__file__).resolve().parent
-    cwd = Path.cwd()
-    search_dirs = {here, cwd}
-    up = os.environ.get("USERPROFILE")
-    if up:
-        search_dirs.update({Path(up) / "Desktop", Path(up) / "바탕 화면"})
-    one = os.environ.get("OneDrive")
-    if one:
-        search_dirs.update({Path(one) / "Desktop", Path(one) / "바탕 화면"})
-
-    # 정확 경로
-    for c in candidates:
-        p = Path(c)
-        if p.exists():
-            return str(p)
-    # 글롭 탐색
-    for base in list(search_dirs):
-        for c in candidates:
-            pat = c if any(ch in c for ch in "*?[]") else Path(c).name
-            hits = sorted(base.glob(pat))
-            if hits:
-                return str(hits[-1])
-    return None
-
 def load_bundle(bundle_path):
     with open(bundle_path, "r", encoding="utf-8") as f:
         data = json.load(f)
@@ -127,6 +114,7 @@ def fetch_epss_bulk(cves):
     if not cves:
         return {}
     url = f"https://api.first.org/data/v1/epss?cve={','.join(cves)}"
+    t0 = time.perf_counter()
     try:
         r = requests.get(url, timeout=15)
         r.raise_for_status()
@@ -137,8 +125,10 @@ def fetch_epss_bulk(cves):
             epss = float(row.get("epss", 0.0))
             pct = float(row.get("percentile", 0.0)) * 100
             out[cve] = {"epss": round(epss, 4), "percentile": round(pct, 2), "date": row.get("date")}
+        record_epss("api", len(cves), time.perf_counter() - t0, len(out))
         return out
-    except Exception:
+    except Exception as e:
+        record_epss("api", len(cves), time.perf_counter() - t0, error=e)
         return {}
 
 def epss_to_E(epss: float) -> int:
@@ -162,121 +152,32 @@ LI_I_CANDIDATES = [
     "tid_i_score*.csv", "*tid_i_score*.csv",
 ]
 
-def try_load_tid_score_map(candidates, col_tid="tid", col_val="score"):
-    path = find_file(candidates)
-    if not path:
-        return {}
-    try:
-        df = pd.read_csv(path)
-        df.columns = df.columns.str.strip().str.lower()
-        if col_tid not in df.columns:
-            for c in df.columns:
-                if c in ("tid", "technique_id", "external_id"):
-                    col_tid = c; break
-        if col_val not in df.columns:
-            for c in df.columns:
-                if c in ("score", "value", "l", "i"):
-                    col_val = c; break
-        mp = {}
-        for _, r in df.iterrows():
-            tid = str(r.get(col_tid, "")).strip().upper()
-            try:
-                val = int(float(r.get(col_val, "")))
-            except:
-                continue
-            if tid and 1 <= val <= 5:
-                mp[tid] = val
-        return mp
-    except Exception:
-        return {}
-
-_TID_L_MAP = None
-_TID_I_MAP = None
-def load_li_maps_once():
-    global _TID_L_MAP, _TID_I_MAP
-    if _TID_L_MAP is None:
-        _TID_L_MAP = try_load_tid_score_map(LI_L_CANDIDATES, col_tid="tid", col_val="l")
-    if _TID_I_MAP is None:
-        _TID_I_MAP = try_load_tid_score_map(LI_I_CANDIDATES, col_tid="tid", col_val="i")
-
-I_BASE_BY_TACTIC = {
-    "exfiltration": 5,
-    "collection": 4,
-    "credential-access": 4,
-    "lateral-movement": 3,
-    "privilege-escalation": 3,
-    "defense-evasion": 3,
-    "execution": 3,
-    "initial-access": 3,
-    "command-and-control": 3,
-    "persistence": 3,
-    "discovery": 2,
-    "resource-development": 2,
-    "reconnaissance": 2,
-}
-L_BASE_BY_TACTIC = {
-    "exfiltration": 2,
-    "collection": 2,
-    "credential-access": 2,
-    "defense-evasion": 2,
-    "privilege-escalation": 2,
-    "lateral-movement": 3,
-    "initial-access": 3,
-    "execution": 3,
-    "command-and-control": 3,
-    "persistence": 3,
-    "discovery": 4,
-    "resource-development": 4,
-    "reconnaissance": 4,
-}
-
-def phases_for_name(tech_name: str, name2phases: dict):
-    return [p.lower() for p in name2phases.get(tech_name.lower(), [])]
-
-def li_from_tactics(tactics: list):
-    if not tactics:
-        return (L_DEFAULT, I_DEFAULT)
-    I_vals = [I_BASE_BY_TACTIC.get(t, I_DEFAULT) for t in tactics]
-    L_vals = [L_BASE_BY_TACTIC.get(t, L_DEFAULT) for t in tactics]
-    I = max(I_vals) if I_vals else I_DEFAULT
-    L = min(L_vals) if L_vals else L_DEFAULT
-    I = max(1, min(5, int(I)))
-    L = max(1, min(5, int(L)))
-    return (L, I)
-
-def get_LI_auto(tid: str, name2phases: dict, tech_name: str = ""):
-    load_li_maps_once()
-    # 1) CSV 우선
-    if tid:
-        if tid in _TID_L_MAP and tid in _TID_I_MAP:
-            return (_TID_L_MAP[tid], _TID_I_MAP[tid])
-        if tid in _TID_L_MAP:
-            tactics = phases_for_name(tech_name, name2phases)
-            _, I_auto = li_from_tactics(tactics)
-            return (_TID_L_MAP[tid], I_auto)
-        if tid in _TID_I_MAP:
-            tactics = phases_for_name(tech_name, name2phases)
-            L_auto, _ = li_from_tactics(tactics)
-            return (L_auto, _TID_I_MAP[tid])
-    # 2) 전술 휴리스틱
-    tactics = phases_for_name(tech_name, name2phases)
-    return li_from_tactics(tactics)
+def load_li_table(name2tid, name2phases):
+    """번들의 모든 기술에 대해 L/I를 한 번에 계산 (CSV 우선 + LI_POLICY 휴리스틱, li_engine.py)"""
+    l_map = load_tid_score_csv(find_artifact("li_l", LI_L_CANDIDATES), col_tid="tid", col_val="l")
+    i_map = load_tid_score_csv(find_artifact("li_i", LI_I_CANDIDATES), col_tid="tid", col_val="i")
+    return build_li_table(name2tid, name2phases, policy=LI_POLICY, l_map=l_map, i_map=i_map)
 
 # =========================
 # 메인
 # =========================
 def main():
-    bundle_path = find_file(BUNDLE_CANDIDATES)
-    mapping_csv = find_file(MAPPING_CANDIDATES)
+    bundle_path = find_artifact("bundle", BUNDLE_CANDIDATES)
+    mapping_csv = find_artifact("mapping", MAPPING_CANDIDATES)
     if not bundle_path or not mapping_csv:
         print("[필수 파일을 찾지 못함]")
         if not bundle_path: print("- enterprise-attack*.json")
         if not mapping_csv: print("- Att&ckToCveMappings*.csv")
         return
 
-    objs = load_bundle(bundle_path)
-    name2tid, name2phases = index_tech(objs)
-    mapping_inv = read_mapping(mapping_csv)
+    with stage("bundle_load"):
+        objs = load_bundle(bundle_path)
+        name2tid, name2phases = index_tech(objs)
+    li_table = load_li_table(name2tid, name2phases)
+    with stage("mapping_load"):
+        mapping_inv = read_mapping(mapping_csv)
+        hier = build_tid_hierarchy(name2tid.values(), mapping_inv)
+    intel = load_intel() if CVE_PICK != "epss" else {}
 
     rows = []
     all_cve_candidates = []
@@ -284,24 +185,22 @@ def main():
     for nm in SCENARIO_TECHNIQUES:
         tid = name2tid.get(nm.lower(), "")
         tech_list.append((nm, tid))
-        if tid and tid in mapping_inv:
-            all_cve_candidates.extend(mapping_inv[tid])
+        all_cve_candidates.extend(step_cves(hier, tid, CVE_FALLBACK))
 
     # 단계에 필요한 CVE EPSS를 한 번에 조회
-    epss_map = fetch_epss_bulk(all_cve_candidates)
+    with stage("epss"):
+        if EPSS_MODE:
+            from epss_history import epss_scores
+            epss_map = epss_scores(all_cve_candidates, mode=EPSS_MODE, day=EPSS_AS_OF)
+        else:
+            epss_map = fetch_epss_bulk(all_cve_candidates)
+    attach_epss(hier, epss_map, pick_key(CVE_PICK, intel))
 
     for i, (tech_name, tid) in enumerate(tech_list, start=1):
-        cves = mapping_inv.get(tid, []) if tid else []
-        best_cve, best_epss, best_pct, best_date = "", 0.0, "", ""
-        for c in cves:
-            m = epss_map.get(c)
-            e = m["epss"] if m else 0.0
-            if m and e >= best_epss:
-                best_cve, best_epss = c, e
-                best_pct, best_date = m["percentile"], m["date"]
+        best_cve, best_epss, best_pct, best_date, via = lookup_cve(hier, tid, CVE_FALLBACK)
 
         # ← 여기! 자동 L/I
-        L, I = get_LI_auto(tid, name2phases, tech_name=tech_name)
+        L, I = li_lookup(li_table, tid, tech_name)
 
         E = epss_to_E(best_epss if best_cve else 0.0)
         pii_risk = E * (5 - L) * I
@@ -313,7 +212,7 @@ def main():
             "step": i,
             "technique": tech_name,
             "TID": tid,
-            "CVE": best_cve,
+            "CVE": best_cve, "CVE_via": via,
             "EPSS": round(best_epss, 4) if best_cve else "",
             "EPSS_percentile(%)": best_pct if best_cve else "",
             "EPSS_date": best_date if best_cve else "",
@@ -321,6 +220,16 @@ def main():
             "PII_Risk(0~125)": pii_risk,
             "NormRisk(0~1)": round(norm, 6),
         })
+        if intel:
+            rows[-1].update(intel_cols(intel, best_cve))
+    record_steps(rows)
+
+    # 탐지 커버리지 (DATA_SOURCES_FILE 지정 시)
+    undetected = None
+    if DATA_SOURCES_FILE:
+        from make_scenario import read_data_sources, detection_coverage_by_tid, apply_detection
+        cov = detection_coverage_by_tid(objs, read_data_sources(DATA_SOURCES_FILE))
+        undetected = apply_detection(rows, cov, discount=DETECT_DISCOUNT)
 
     df = pd.DataFrame(rows)
 
@@ -332,6 +241,12 @@ def main():
     series_norm = 1.0 - series_norm
 
     show_cols = ["step","technique","TID","CVE","EPSS","E(1~5)","L","I","PII_Risk(0~125)","NormRisk(0~1)"]
+    if CVE_FALLBACK:
+        show_cols.append("CVE_via")
+    if intel:
+        show_cols += ["CVSS", "KEV"]
+    if undetected is not None:
+        show_cols.append("Detect(0~1)")
     print("\n[Scenario] FIN7-style: spearphish → creds → email/cloud exfil")
     print(df[show_cols].to_string(index=False))
     print("\n[Summary]")
@@ -340,6 +255,21 @@ def main():
     print(f"- Avg Norm: {round(float(df['NormRisk(0~1)'].replace('',0).astype(float).mean()),6)}")
     print(f"- Max Norm: {round(float(df['NormRisk(0~1)'].replace('',0).astype(float).max()),6)}")
     print(f"- Series Norm: {round(series_norm,6)} (~ {round(series_norm*100,2)}%)")
+    if undetected:
+        print(f"- Undetected steps: {len(undetected)} ({', '.join(undetected)})")
+
+    # 이력 저장 (risk_store.py, pyarrow 필요)
+    if RECORD_HISTORY:
+        try:
+            from risk_store import record_run
+            record_run(rows, "S_1")
+        except ImportError as e:
+            print(f"[이력 저장 생략] {e}")
+
+    if SENSITIVITY:
+        from sensitivity import analyze, print_report
+        print("\n[Sensitivity]")
+        print_report(analyze({"S_1": rows}))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,231 @@
+# artifact_manifest.py — 데이터 파일(번들, CVE 매핑, L/I CSV, EPSS 스냅샷 등) 위치·내용 해시 기록
+#
+# 예전 find_file()은 후보 폴더 6곳 × 패턴을 글롭하고 sorted(...)[-1](사전순 마지막)을 골라서
+# 오래된 파일이 이길 수 있었음. 여기서는
+#   1) 정확 경로 후보가 있으면 그대로 사용 (stat 한 번)
+#   2) 매니페스트에 (종류, 후보 목록)으로 기록된 파일이 크기·mtime 그대로 있으면 글롭 없이 바로 사용
+#   3) 없거나 바뀌었으면 글롭 → 수정 시각(mtime)이 가장 최근인 파일 선택
+# 고른 파일은 경로/크기/mtime/sha256을 매니페스트(JSON)에 기록하고, 크기·mtime이 그대로면 기록된 해시를 재사용함.
+# 새 파일을 받아 두기만 하고 예전 파일도 그대로 있으면 2)가 예전 파일을 돌려주므로 refresh로 다시 탐색.
+# 인덱스/캐시 레이어는 content_hash()/cache_key()를 무효화 키로 쓰면 됨.
+#
+# 사용 예)
+#   python artifact_manifest.py show
+#   python artifact_manifest.py refresh        # 기록 무시하고 다시 탐색·해시 (새 파일을 받은 뒤)
+import argparse, hashlib, json, os
+from datetime import datetime
+from pathlib import Path
+
+from run_metrics import record_cache
+
+MANIFEST_PATH = Path(os.environ.get("ARTIFACT_MANIFEST") or Path(__file__).resolve().parent / "artifact_manifest.json")
+
+# 종류별 기본 후보 (각 스크립트가 자기 후보 목록을 넘기지 않을 때 / refresh 명령용)
+DEFAULT_CANDIDATES = {
+    "bundle": ["enterprise-attack*.json", "*enterprise-attack*.json"],
+    "mapping": ["Att&ckToCveMappings*.csv", "*Att&ckToCveMappings*.csv"],
+    "li_l": ["tid_l_score*.csv", "*tid_l_score*.csv"],
+    "li_i": ["tid_i_score*.csv", "*tid_i_score*.csv"],
+    "make_scenario": ["make_scenario.py"],
+}
+
+_loaded = {}  # {manifest 경로: dict} — 한 프로세스 안에서는 한 번만 읽음
+
+# =========================
+# 매니페스트 읽기/쓰기
+# =========================
+def _manifest_path(path):
+    return Path(path) if path else MANIFEST_PATH
+
+def load_manifest(path=None):
+    p = _manifest_path(path)
+    key = str(p)
+    if key not in _loaded:
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                _loaded[key] = json.load(f)
+        except (OSError, ValueError):
+            _loaded[key] = {}
+    return _loaded[key]
+
+def save_manifest(data, path=None):
+    p = _manifest_path(path)
+    tmp = p.with_name(p.name + ".tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, p)
+    except OSError:
+        pass  # 읽기 전용 폴더 등 → 기록만 못 할 뿐 탐색 결과는 그대로 사용
+    _loaded[str(p)] = data
+
+# =========================
+# 탐색
+# =========================
+def search_dirs():
+    """스크립트 폴더, 현재 폴더, USERPROFILE/OneDrive의 Desktop·바탕 화면 (순서 고정)"""
+    dirs = [Path(__file__).resolve().parent, Path.cwd()]
+    for env in ("USERPROFILE", "OneDrive"):
+        root = os.environ.get(env)
+        if root:
+            dirs += [Path(root) / "Desktop", Path(root) / "바탕 화면"]
+    out = []
+    for d in dirs:
+        if d not in out:
+            out.append(d)
+    return out
+
+def _is_pattern(c):
+    return any(ch in c for ch in "*?[]")
+
+def _patterns(candidates):
+    return [c if _is_pattern(c) else Path(c).name for c in candidates]
+
+def scan(candidates):
+    """후보 폴더 전체를 글롭해서 일치하는 파일 목록 (mtime 최신순)"""
+    hits = set()
+    for base in search_dirs():
+        for pat in _patterns(candidates):
+            hits.update(str(p.resolve()) for p in base.glob(pat) if p.is_file())
+    return sorted(hits, key=lambda p: (os.path.getmtime(p), p), reverse=True)
+
+# =========================
+# 기록
+# =========================
+def file_hash(path, chunk=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def entry_key(kind, candidates=None):
+    """매니페스트 항목 키: 후보 목록 없이 직접 등록한 파일은 kind, 탐색한 파일은 kind + 후보 목록"""
+    if not candidates:
+        return kind
+    return kind + " " + json.dumps(list(candidates), ensure_ascii=False)
+
+def _known_hash(data, p, st):
+    """같은 경로·크기·mtime으로 기록된 해시가 있으면 반환 (다른 키에 기록된 것도 재사용)"""
+    for e in data.values():
+        if e.get("path") == p and e.get("size") == st.st_size and e.get("mtime") == st.st_mtime and e.get("sha256"):
+            return e["sha256"]
+    return None
+
+def record_artifact(kind, path, manifest=None, candidates=None, rehash=False):
+    """
+    (kind, candidates) 항목을 path로 기록 (경로·크기·mtime이 그대로면 기존 해시 재사용)
+    EPSS 스냅샷처럼 스크립트가 직접 만든 파일도 이 함수로 등록 (candidates 없음)
+    반환: 기록된 항목 dict
+    """
+    data = load_manifest(manifest)
+    key = entry_key(kind, candidates)
+    p = str(Path(path).resolve())
+    st = os.stat(p)
+    digest = None if rehash else _known_hash(data, p, st)
+    record_cache("artifact_hash", hits=int(digest is not None), misses=int(digest is None))
+    old = data.get(key) or {}
+    if digest is not None and old.get("path") == p and old.get("sha256") == digest and old.get("mtime") == st.st_mtime:
+        return old
+    entry = {
+        "kind": kind,
+        "candidates": list(candidates or []),
+        "path": p,
+        "size": st.st_size,
+        "mtime": st.st_mtime,
+        "sha256": digest or file_hash(p),
+        "recorded": datetime.now().isoformat(timespec="seconds"),
+    }
+    data = dict(data, **{key: entry})
+    save_manifest(data, manifest)
+    return entry
+
+def _unchanged(entry):
+    """기록된 파일이 같은 크기·mtime으로 아직 있는지"""
+    try:
+        st = os.stat(entry["path"])
+    except (KeyError, OSError):
+        return False
+    return st.st_size == entry.get("size") and st.st_mtime == entry.get("mtime")
+
+def find_artifact(kind, candidates=None, manifest=None, refresh=False):
+    """
+    kind: "bundle", "mapping", "li_l", "li_i", "make_scenario", "epss" ...
+    candidates: [정확 경로 or 글롭 패턴] (생략 시 DEFAULT_CANDIDATES[kind])
+    refresh: 매니페스트 기록을 무시하고 다시 글롭·해시
+    반환: 찾으면 str 경로, 못 찾으면 None
+    """
+    candidates = list(candidates or DEFAULT_CANDIDATES.get(kind, []))
+    path = None
+
+    # 1) 정확 경로
+    for c in candidates:
+        if not _is_pattern(c) and Path(c).is_file():
+            path = c
+            break
+
+    # 2) 매니페스트 기록 (파일이 그대로면 글롭·해시 없음)
+    if path is None and not refresh:
+        entry = load_manifest(manifest).get(entry_key(kind, candidates)) or {}
+        if _unchanged(entry):
+            record_cache("artifact_path", hits=1)
+            return entry["path"]
+
+    # 3) 글롭 (mtime 최신)
+    if path is None:
+        record_cache("artifact_path", misses=1)
+        hits = scan(candidates)
+        path = hits[0] if hits else None
+
+    if path is None:
+        return None
+    record_artifact(kind, path, manifest, candidates=candidates, rehash=refresh)
+    return str(path)
+
+# =========================
+# 무효화 키
+# =========================
+def content_hash(kind, manifest=None, candidates=None):
+    """(kind, candidates)로 기록된 파일의 sha256 (없으면 None). 파일이 바뀌었으면 다시 해시해서 반환"""
+    entry = load_manifest(manifest).get(entry_key(kind, candidates))
+    if not entry or not os.path.isfile(entry.get("path", "")):
+        return None
+    return record_artifact(kind, entry["path"], manifest, candidates=candidates)["sha256"]
+
+def cache_key(*kinds, manifest=None):
+    """여러 데이터 파일 해시를 묶은 짧은 키 (인덱스/캐시 파일 이름·무효화용, 직접 등록한 kind 기준)"""
+    h = hashlib.sha256()
+    for kind in kinds:
+        h.update(f"{kind}={content_hash(kind, manifest) or '-'};".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+# =========================
+# 메인
+# =========================
+def main():
+    p = argparse.ArgumentParser(description="데이터 파일 매니페스트 조회/갱신")
+    p.add_argument("--manifest", help=f"매니페스트 경로 (기본: {MANIFEST_PATH.name}, 환경변수 ARTIFACT_MANIFEST)")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("show", help="기록된 파일 목록")
+    r = sub.add_parser("refresh", help="기록을 무시하고 다시 탐색·해시")
+    r.add_argument("kinds", nargs="*", help=f"종류 (기본: {', '.join(DEFAULT_CANDIDATES)})")
+    args = p.parse_args()
+
+    if args.cmd == "refresh":
+        for kind in args.kinds or list(DEFAULT_CANDIDATES):
+            path = find_artifact(kind, manifest=args.manifest, refresh=True)
+            print(f"{kind:<14} {path or '(없음)'}")
+        return
+
+    data = load_manifest(args.manifest)
+    if not data:
+        print("기록 없음.")
+        return
+    for key, e in sorted(data.items()):
+        ok = "" if os.path.isfile(e.get("path", "")) else "  (파일 없음)"
+        print(f"{e.get('kind', key):<14} {e.get('sha256', '')[:12]}  {e.get('size', 0):>12,d}  {e.get('path')}{ok}")
+        if e.get("candidates"):
+            print(f"{'':<14} 후보: {', '.join(e['candidates'])}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# coverage_sampler.py — 랜덤 러너용 층화(stratified) · 커버리지 기반 시작 기술 추출
+#
+# random.choice(name2tid)는 시작 기술을 균등하게 뽑아서, 시나리오를 많이 돌려도 간선이 많은 구간만
+# 반복해서 지나가고 드문 기술/전술은 잘 안 나옴. 여기서는
+#   1) 시작 후보를 전술(phase) 또는 TID 계열(T1555 ← T1555.003)로 층을 나누고
+#   2) 지금까지 경로에 나온 기술/간선을 기록해서, 커버리지가 가장 낮은 층의 아직 안 나온 기술부터 시작
+#   3) 기술 커버리지가 목표에 닿거나, Series Norm 평균의 95% 신뢰구간 반폭이 tol 이하로 줄면 멈춤
+#
+# 시작을 커버리지 순으로 뽑으므로 층마다 뽑히는 비율이 층 크기와 다름 → 단순 표본평균은 편향.
+# Series Norm 평균은 시작 기술의 층별 평균을 층 크기 비율 |층|/N 으로 가중한 사후 층화(post-stratified) 추정치,
+# 분산은 Σ (|층|/N)² · 층 분산 / 층 표본 수
+#
+# 층(by)
+#   "phase"  : 첫 번째 전술 (없으면 unknown)
+#   "family" : 부모 TID (하위 기술은 부모와 같은 층)
+import math, random
+
+from tid_hierarchy import parent_tid
+
+STRATA = ("phase", "family")
+
+class CoverageSampler:
+    def __init__(self, name2tid, name2phases, by="phase", target=0.9, tol=0.005, min_runs=30, seed=None):
+        """
+        name2tid: {lower(name): TID}, name2phases: {lower(name): [phase, ...]}
+        target: 기술 커버리지 목표 (0~1, None이면 사용 안 함)
+        tol: Series Norm 사후 층화 평균의 95% 신뢰구간 반폭 기준 (None이면 사용 안 함), min_runs개 이상부터 판단
+        """
+        if by not in STRATA:
+            raise ValueError(f"알 수 없는 층 기준: {by} (가능: {', '.join(STRATA)})")
+        self.rng = random.Random(seed)
+        self.target, self.tol, self.min_runs = target, tol, min_runs
+
+        self.strata = {}
+        self.stratum_of = {}
+        for nm in sorted(name2tid):
+            if by == "phase":
+                ph = name2phases.get(nm) or []
+                key = ph[0] if ph else "unknown"
+            else:
+                key = parent_tid(name2tid[nm]) or name2tid[nm]
+            self.strata.setdefault(key, []).append(nm)
+            self.stratum_of[nm] = key
+
+        self.covered = set()      # 경로에 한 번이라도 나온 기술 (lower)
+        self.edges = set()        # 경로에 나온 (from, to) 간선
+        self.picked = {}          # 시작으로 뽑힌 횟수 (lower → 횟수)
+        self.cov_by = {k: 0 for k in self.strata}
+        self.pick_by = {k: 0 for k in self.strata}
+        # Series Norm 온라인 평균/분산 (Welford) — 전체, 시작 기술의 층별
+        self.n, self.mean, self.m2 = 0, 0.0, 0.0
+        self.n_by = {k: 0 for k in self.strata}
+        self.mean_by = {k: 0.0 for k in self.strata}
+        self.m2_by = {k: 0.0 for k in self.strata}
+
+    # ---------- 추출 ----------
+    def next_start(self):
+        """커버리지(다음으로 시작 횟수)가 가장 낮은 층에서, 아직 안 나온 기술 우선으로 시작 기술 하나 (lower)"""
+        best = min(
+            (self.cov_by[k] / len(m), self.pick_by[k] / len(m), self.rng.random(), k)
+            for k, m in self.strata.items()
+        )
+        members = self.strata[best[3]]
+        fresh = [nm for nm in members if nm not in self.covered and nm not in self.picked]
+        if not fresh:
+            low = min(self.picked.get(nm, 0) for nm in members)
+            fresh = [nm for nm in members if self.picked.get(nm, 0) == low]
+        nm = self.rng.choice(fresh)
+        self.picked[nm] = self.picked.get(nm, 0) + 1
+        self.pick_by[best[3]] += 1
+        return nm
+
+    # ---------- 관측 ----------
+    def observe(self, path, series_norm, start=None):
+        """
+        채점이 끝난 시나리오: path = 단계 기술명 목록 (순서대로), series_norm = Series Norm(0~1)
+        start: 시작 기술 (생략하면 path 첫 단계) — 이 기술의 층으로 사후 층화
+        """
+        names = [nm.lower() for nm in path]
+        for nm in names:
+            if nm in self.stratum_of and nm not in self.covered:
+                self.covered.add(nm)
+                self.cov_by[self.stratum_of[nm]] += 1
+        self.edges.update(zip(names, names[1:]))
+
+        self.n += 1
+        d = series_norm - self.mean
+        self.mean += d / self.n
+        self.m2 += d * (series_norm - self.mean)
+
+        h = self.stratum_of.get((start or (names[0] if names else "")).lower())
+        if h is not None:
+            self.n_by[h] += 1
+            d = series_norm - self.mean_by[h]
+            self.mean_by[h] += d / self.n_by[h]
+            self.m2_by[h] += d * (series_norm - self.mean_by[h])
+
+    # ---------- 추정 ----------
+    def estimate(self):
+        """사후 층화 평균 Σ W_h · 층 평균, W_h = |층|/N (관측 없는 층은 빼고 나머지 가중치를 다시 합 1로)"""
+        seen = [k for k in self.strata if self.n_by[k]]
+        if not seen:
+            return self.mean
+        total = sum(len(self.strata[k]) for k in seen)
+        return sum(len(self.strata[k]) / total * self.mean_by[k] for k in seen)
+
+    # ---------- 중단 조건 ----------
+    def coverage(self):
+        return len(self.covered) / max(1, len(self.stratum_of))
+
+    def ci_halfwidth(self):
+        """
+        사후 층화 평균의 95% 신뢰구간 반폭 1.96 · sqrt(Σ W_h² s_h² / n_h)
+        관측 없는 층이 있으면 inf, 한 번만 관측된 층의 s_h²는 전체 표본분산으로 대신
+        """
+        if self.n < 2 or not all(self.n_by.values()):
+            return float("inf")
+        pooled = self.m2 / (self.n - 1)
+        total = len(self.stratum_of)
+        var = 0.0
+        for k, members in self.strata.items():
+            nh = self.n_by[k]
+            s2 = self.m2_by[k] / (nh - 1) if nh >= 2 else pooled
+            var += (len(members) / total) ** 2 * s2 / nh
+        return 1.96 * math.sqrt(var)
+
+    def done(self):
+        """기술 커버리지 목표 도달 또는 Series Norm 평균 수렴 → (True, 이유)"""
+        if self.target is not None and self.coverage() >= self.target:
+            return True, f"기술 커버리지 {self.coverage() * 100:.1f}% ≥ 목표 {self.target * 100:.0f}%"
+        if self.tol is not None and self.n >= self.min_runs and self.ci_halfwidth() <= self.tol:
+            return True, f"Series Norm 평균(사후 층화) {self.estimate():.4f} ± {self.ci_halfwidth():.4f} (95% CI) 수렴"
+        return False, ""
+
+    def report(self):
+        low = min(self.strata, key=lambda k: self.cov_by[k] / len(self.strata[k]))
+        return {
+            "scenarios": self.n,
+            "tech_coverage": round(self.coverage(), 4),
+            "edges_seen": len(self.edges),
+            "strata": len(self.strata),
+            "least_covered": f"{low} ({self.cov_by[low]}/{len(self.strata[low])})",
+            "series_mean": round(self.estimate(), 6),
+            "series_ci95": round(self.ci_halfwidth(), 6) if math.isfinite(self.ci_halfwidth()) else None,
+            "series_mean_raw": round(self.mean, 6),
+            "strata_observed": sum(1 for v in self.n_by.values() if v),
+        }
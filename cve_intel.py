@@ -0,0 +1,251 @@
+# cve_intel.py — NVD(CVSS) / CISA KEV 로컬 인덱스와 대표 CVE 선택 규칙
+#
+# 단계의 대표 CVE는 지금까지 EPSS 최고값 하나로만 골랐음. 여기서는 NVD JSON 피드(연도별 .json.gz,
+# 1.1 "CVE_Items" / 2.0 "vulnerabilities" 둘 다)와 CISA KEV JSON을 레코드 단위로 스트리밍 파싱해서
+# (피드 전체를 메모리에 올리지 않음) CVE별 작은 표 하나(Parquet)로 만들어 두고,
+# 채점할 때는 {CVE: (CVSS, KEV, ...)} dict로 읽어 O(1) 조회함.
+#
+# 대표 CVE 선택(pick) — EPSS가 있는 CVE 중에서 고르는 것은 그대로, 순서만 바뀜
+#   "epss"     : EPSS 최고 (기존 동작)
+#   "kev"      : KEV 등재 CVE 우선, 그 안에서 EPSS 최고
+#   "weighted" : w_epss*EPSS + w_cvss*CVSS/10 + w_kev*KEV 최고 (PICK_WEIGHTS)
+#
+# 사용 예)
+#   python cve_intel.py build --nvd nvdcve-1.1-2023.json.gz nvdcve-1.1-2024.json.gz --kev known_exploited_vulnerabilities.json
+#   python cve_intel.py build --kev known_exploited_vulnerabilities.json      # 기존 인덱스에 KEV만 갱신
+#   python cve_intel.py show CVE-2023-4863 CVE-2021-44228
+import argparse, gzip, json, math, os, re
+from pathlib import Path
+
+DEFAULT_PATH = Path(os.environ.get("CVE_INTEL_PATH") or Path(__file__).resolve().parent / "cve_intel.parquet")
+PICKS = ("epss", "kev", "weighted")
+PICK_WEIGHTS = {"epss": 0.5, "cvss": 0.2, "kev": 0.3}
+
+NO_INTEL = (None, False, "", False)  # (CVSS, KEV, KEV 등재일, 랜섬웨어 사용)
+
+_loaded = {}  # {인덱스 경로: dict} — 한 프로세스 안에서는 한 번만 읽음
+
+# =========================
+# 스트리밍 JSON
+# =========================
+def _open_text(path):
+    return gzip.open(path, "rt", encoding="utf-8") if str(path).endswith(".gz") else open(path, "r", encoding="utf-8")
+
+def iter_json_array(f, keys, chunk=1 << 16):
+    """
+    파일 객체 f에서 "key": [ ... ] 배열 원소를 하나씩 dict로 (keys 중 처음 나오는 키)
+    버퍼에는 원소 하나 + chunk 정도만 남김
+    """
+    dec = json.JSONDecoder()
+    head = re.compile(r'"(?:%s)"\s*:\s*\[' % "|".join(map(re.escape, keys)))
+    buf = ""
+    while True:
+        m = head.search(buf)
+        if m:
+            buf = buf[m.end():]
+            break
+        more = f.read(chunk)
+        if not more:
+            return
+        buf = buf[-128:] + more  # 청크 경계에 걸친 키 대비
+
+    pos = 0
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(buf):
+            more = f.read(chunk)
+            if not more:
+                return
+            buf, pos = more, 0
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            obj, end = dec.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            # 원소가 청크 경계에서 잘림 → 더 읽어서 다시 (큰 원소면 읽는 양을 늘림)
+            more = f.read(max(chunk, len(buf) - pos))
+            if not more:
+                raise
+            buf, pos = buf[pos:] + more, 0
+            continue
+        yield obj
+        pos = end
+        if pos > chunk:
+            buf, pos = buf[pos:], 0
+
+# =========================
+# 피드 파싱
+# =========================
+def _nvd11(item):
+    cve = item.get("cve", {}).get("CVE_data_meta", {}).get("ID", "")
+    imp = item.get("impact", {})
+    v3 = imp.get("baseMetricV3", {}).get("cvssV3", {})
+    v2 = imp.get("baseMetricV2", {}).get("cvssV2", {})
+    score = v3.get("baseScore", v2.get("baseScore"))
+    sev = v3.get("baseSeverity") or imp.get("baseMetricV2", {}).get("severity", "")
+    return cve, score, sev
+
+def _nvd20(item):
+    c = item.get("cve", item)
+    metrics = c.get("metrics", {})
+    for key in ("cvssMetricV40", "cvssMetricV31", "cvssMetricV30", "cvssMetricV2"):
+        arr = metrics.get(key) or []
+        if not arr:
+            continue
+        # Primary(NVD) 평가 우선
+        m = next((x for x in arr if x.get("type") == "Primary"), arr[0])
+        data = m.get("cvssData", {})
+        return c.get("id", ""), data.get("baseScore"), data.get("baseSeverity") or m.get("baseSeverity", "")
+    return c.get("id", ""), None, ""
+
+def iter_nvd(path):
+    """NVD 피드 → (CVE, CVSS 기본 점수 or None, 심각도) 레코드 단위"""
+    with _open_text(path) as f:
+        for item in iter_json_array(f, ("CVE_Items", "vulnerabilities")):
+            cve, score, sev = _nvd11(item) if "impact" in item or "CVE_data_meta" in item.get("cve", {}) else _nvd20(item)
+            if cve:
+                yield cve.strip().upper(), (float(score) if score is not None else None), (sev or "").upper()
+
+def iter_kev(path):
+    """CISA KEV JSON → (CVE, 등재일, 랜섬웨어 사용 여부) 레코드 단위"""
+    with _open_text(path) as f:
+        for item in iter_json_array(f, ("vulnerabilities",)):
+            cve = (item.get("cveID") or "").strip().upper()
+            if cve:
+                ransom = str(item.get("knownRansomwareCampaignUse", "")).strip().lower() == "known"
+                yield cve, item.get("dateAdded", ""), ransom
+
+# =========================
+# 인덱스 저장/조회
+# =========================
+def _read_table(path):
+    import pyarrow.parquet as pq
+    d = pq.read_table(str(path)).to_pydict()
+    return {
+        c: [d["cvss"][k], d["severity"][k], d["kev"][k], d["kev_date"][k], d["ransomware"][k]]
+        for k, c in enumerate(d["cve"])
+    }
+
+def build_index(nvd_files=(), kev_files=(), path=None, update=True):
+    """
+    NVD/KEV 파일 → Parquet 인덱스 (cve, cvss, severity, kev, kev_date, ransomware)
+    update=True면 기존 인덱스에 덮어씀 (KEV 파일을 주면 KEV 표시는 새 목록으로 교체)
+    반환: (CVE 수, CVSS 있는 수, KEV 수)
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = Path(path or DEFAULT_PATH)
+    recs = _read_table(path) if update and path.exists() else {}
+
+    for f in nvd_files:
+        for cve, score, sev in iter_nvd(f):
+            r = recs.setdefault(cve, [None, "", False, "", False])
+            r[0], r[1] = score, sev
+
+    if kev_files:
+        for r in recs.values():
+            r[2], r[3], r[4] = False, "", False
+        for f in kev_files:
+            for cve, added, ransom in iter_kev(f):
+                r = recs.setdefault(cve, [None, "", False, "", False])
+                r[2], r[3], r[4] = True, added, ransom
+
+    cves = sorted(recs)
+    tbl = pa.table({
+        "cve": pa.array(cves, pa.string()),
+        "cvss": pa.array([recs[c][0] for c in cves], pa.float32()),
+        "severity": pa.array([recs[c][1] for c in cves], pa.string()),
+        "kev": pa.array([recs[c][2] for c in cves], pa.bool_()),
+        "kev_date": pa.array([recs[c][3] for c in cves], pa.string()),
+        "ransomware": pa.array([recs[c][4] for c in cves], pa.bool_()),
+    })
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    pq.write_table(tbl, str(tmp))
+    os.replace(tmp, path)
+    _loaded.pop(str(path), None)
+    return len(cves), sum(1 for c in cves if recs[c][0] is not None), sum(1 for c in cves if recs[c][2])
+
+def load_intel(path=None):
+    """인덱스 → {CVE: (CVSS or None, KEV, KEV 등재일, 랜섬웨어)}, 인덱스가 없으면 {}"""
+    path = Path(path or DEFAULT_PATH)
+    key = str(path)
+    if key not in _loaded:
+        if not path.exists():
+            _loaded[key] = {}
+        else:
+            from artifact_manifest import record_artifact
+            record_artifact("cve_intel", path)
+            _loaded[key] = {
+                c: ((None if v[0] is None or math.isnan(v[0]) else round(v[0], 1)), bool(v[2]), v[3] or "", bool(v[4]))
+                for c, v in _read_table(path).items()
+            }
+    return _loaded[key]
+
+def intel_lookup(intel, cve):
+    """(CVSS or None, KEV, KEV 등재일, 랜섬웨어) — 없으면 NO_INTEL"""
+    return intel.get(cve, NO_INTEL) if cve else NO_INTEL
+
+def intel_cols(intel, cve):
+    """결과 행에 붙일 CVSS/KEV 컬럼"""
+    cvss, kev, _, _ = intel_lookup(intel, cve)
+    return {"CVSS": cvss if cvss is not None else "", "KEV": "Y" if kev else ""}
+
+# =========================
+# 대표 CVE 선택 키
+# =========================
+def pick_key(pick="epss", intel=None, weights=None):
+    """
+    (CVE, EPSS) → 비교 키 함수 (클수록 대표). tid_hierarchy.attach_epss()가 사용
+    intel이 없으면 CVSS/KEV는 0으로 봄
+    """
+    if pick not in PICKS:
+        raise ValueError(f"알 수 없는 CVE 선택 방식: {pick} (가능: {', '.join(PICKS)})")
+    intel = intel or {}
+    if pick == "epss":
+        return lambda cve, epss: epss
+    if pick == "kev":
+        return lambda cve, epss: (intel.get(cve, NO_INTEL)[1], epss)
+    w = dict(PICK_WEIGHTS, **(weights or {}))
+
+    def key(cve, epss):
+        cvss, kev, _, _ = intel.get(cve, NO_INTEL)
+        return w["epss"] * epss + w["cvss"] * ((cvss or 0.0) / 10.0) + w["kev"] * (1.0 if kev else 0.0)
+    return key
+
+# =========================
+# 메인
+# =========================
+def main():
+    p = argparse.ArgumentParser(description="NVD/KEV 로컬 인덱스")
+    p.add_argument("--path", help=f"인덱스 경로 (기본: {DEFAULT_PATH.name}, 환경변수 CVE_INTEL_PATH)")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="NVD 피드 / KEV JSON 적재")
+    b.add_argument("--nvd", nargs="*", default=[], help="NVD JSON 피드 (.json / .json.gz, 1.1 또는 2.0)")
+    b.add_argument("--kev", nargs="*", default=[], help="CISA known_exploited_vulnerabilities.json")
+    b.add_argument("--fresh", action="store_true", help="기존 인덱스를 버리고 새로 만듦")
+    s = sub.add_parser("show", help="CVE 조회")
+    s.add_argument("cves", nargs="+")
+    args = p.parse_args()
+
+    if args.cmd == "build":
+        if not args.nvd and not args.kev:
+            p.error("--nvd 또는 --kev 파일이 필요합니다.")
+        n, n_cvss, n_kev = build_index(args.nvd, args.kev, path=args.path, update=not args.fresh)
+        print(f"[+] {args.path or DEFAULT_PATH}  CVE {n:,}  (CVSS {n_cvss:,}, KEV {n_kev:,})")
+        return
+
+    intel = load_intel(args.path)
+    if not intel:
+        print("인덱스 없음. 먼저 build 하세요.")
+        return
+    for c in args.cves:
+        cvss, kev, added, ransom = intel_lookup(intel, c.strip().upper())
+        flags = f"KEV {added}" + (" (ransomware)" if ransom else "") if kev else ""
+        print(f"{c.upper():<18} CVSS {cvss if cvss is not None else '-':<5} {flags}")
+
+if __name__ == "__main__":
+    main()
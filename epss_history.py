@@ -0,0 +1,312 @@
+# epss_history.py — EPSS 일별 스냅샷 시계열 저장소 (CVE × 날짜, Parquet 컬럼 저장)
+#
+# fetch_epss_bulk()는 API의 최신값만 받아서 날짜 하나만 남김. 여기서는 FIRST의 일별 전체 스냅샷
+# (epss_scores-YYYY-MM-DD.csv.gz)을 받아 두거나 내려받아서 날짜 파티션으로 쌓아 두고,
+# 날짜 범위 × CVE 목록을 한 번에 (날짜, CVE) 행렬로 읽어 벡터 연산으로 점수를 만듦.
+#
+# 레이아웃:
+#   <root>/date=YYYY-MM-DD/epss.parquet   (cve, epss, percentile)  — 같은 날짜를 다시 넣으면 교체
+#
+# 점수 방식(mode)
+#   "asof"  : 기준일(day) 또는 그 이전 가장 최근 값
+#   "max"   : 기준일까지 window일 동안의 최댓값
+#   "trend" : 기준일 값 + window일 동안 오른 만큼 (오른 CVE만 가산, 내린 CVE는 기준일 값 그대로, 최대 1)
+#
+# 사용 예)
+#   python epss_history.py ingest epss_scores-2026-10-01.csv.gz epss_scores-2026-10-02.csv.gz
+#   python epss_history.py fetch --end 2026-10-18 --days 30
+#   python epss_history.py show CVE-2023-4863 --days 60
+import argparse, os, re, time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from run_metrics import record_epss
+
+DEFAULT_ROOT = Path(os.environ.get("EPSS_HISTORY_DIR") or Path(__file__).resolve().parent / "epss_history")
+SNAPSHOT_URL = "https://epss.cyentia.com/epss_scores-{day}.csv.gz"
+MODES = ("asof", "max", "trend")
+
+def _root(root):
+    return Path(root) if root else DEFAULT_ROOT
+
+def _day(v):
+    return v if isinstance(v, date) else date.fromisoformat(str(v)[:10])
+
+# =========================
+# 적재
+# =========================
+def _score_date(path):
+    """스냅샷 첫 줄 '#model_version:...,score_date:2026-10-01T...' 또는 파일 이름에서 날짜"""
+    import gzip
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        head = f.readline()
+    m = re.search(r"score_date:(\d{4}-\d{2}-\d{2})", head) or re.search(r"(\d{4}-\d{2}-\d{2})", Path(path).name)
+    return date.fromisoformat(m.group(1)) if m else None
+
+def ingest_file(path, day=None, root=None):
+    """
+    일별 스냅샷 CSV(.gz) 하나 → date=YYYY-MM-DD 파티션
+    반환: (날짜, 행 수)
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    day = _day(day) if day else _score_date(path)
+    if day is None:
+        raise ValueError(f"스냅샷 날짜를 알 수 없음: {path} (--day로 지정)")
+    df = pd.read_csv(path, comment="#", usecols=["cve", "epss", "percentile"],
+                     dtype={"cve": "string", "epss": "float32", "percentile": "float32"})
+    df["cve"] = df["cve"].str.strip().str.upper()
+    df = df.dropna(subset=["cve"]).drop_duplicates("cve", keep="last")
+
+    part_dir = _root(root) / f"date={day.isoformat()}"
+    part_dir.mkdir(parents=True, exist_ok=True)
+    tmp = part_dir / "epss.parquet.tmp"
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), str(tmp))
+    os.replace(tmp, part_dir / "epss.parquet")
+    return day, len(df)
+
+def fetch_snapshot(day, out_dir=None, timeout=60):
+    """FIRST 일별 전체 스냅샷 내려받기 (스트리밍 저장) → 파일 경로, 없으면 None"""
+    import requests
+
+    day = _day(day)
+    out = Path(out_dir or _root(None) / "_downloads") / f"epss_scores-{day.isoformat()}.csv.gz"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with requests.get(SNAPSHOT_URL.format(day=day.isoformat()), stream=True, timeout=timeout) as r:
+            if r.status_code != 200:
+                return None
+            with open(out, "wb") as f:
+                for chunk in r.iter_content(1 << 20):
+                    f.write(chunk)
+    except Exception:
+        return None
+    return str(out)
+
+def stored_dates(root=None):
+    base = _root(root)
+    if not base.exists():
+        return []
+    out = []
+    for d in os.listdir(base):
+        if d.startswith("date=") and (base / d / "epss.parquet").exists():
+            try:
+                out.append(date.fromisoformat(d.split("=", 1)[1]))
+            except ValueError:
+                pass
+    return sorted(out)
+
+# =========================
+# 조회 (날짜 × CVE 행렬)
+# =========================
+def load_matrices(cves, start, end, root=None, columns=("epss", "percentile")):
+    """
+    [start, end] 날짜 파티션에서 cves만 골라 컬럼별 (날짜, CVE) 행렬로 (파일 한 번 읽기)
+    반환: (days: DatetimeIndex(일 단위 연속), cves: list, {컬럼: float32 (D, C)}), 없는 칸은 NaN
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    start, end = _day(start), _day(end)
+    cves = list(dict.fromkeys(c.strip().upper() for c in cves if c))
+    days = pd.date_range(start, end, freq="D")
+    mats = {col: np.full((len(days), len(cves)), np.nan, dtype=np.float32) for col in columns}
+    base = _root(root)
+    if not cves or not base.exists():
+        return days, cves, mats
+
+    part = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+    dataset = ds.dataset(str(base), format="parquet", partitioning=part, exclude_invalid_files=True)
+    flt = ((ds.field("date") >= start.isoformat()) & (ds.field("date") <= end.isoformat())
+           & ds.field("cve").isin(cves))
+    tbl = dataset.to_table(columns=["date", "cve", *columns], filter=flt)
+    if tbl.num_rows == 0:
+        return days, cves, mats
+
+    df = tbl.to_pandas()
+    r = (pd.to_datetime(df["date"]) - days[0]).dt.days.to_numpy()
+    c = pd.Index(cves).get_indexer(df["cve"])
+    for col in columns:
+        mats[col][r, c] = df[col].to_numpy(dtype=np.float32)
+    return days, cves, mats
+
+def load_range(cves, start, end, root=None, column="epss"):
+    """load_matrices의 한 컬럼 버전 → (days, cves, mat)"""
+    days, cves, mats = load_matrices(cves, start, end, root=root, columns=(column,))
+    return days, cves, mats[column]
+
+def _ffill(mat):
+    """열(CVE)별 앞 값 채우기 — 기준일에 스냅샷이 없으면 그 이전 가장 최근 값"""
+    idx = np.where(~np.isnan(mat), np.arange(mat.shape[0])[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    out = mat[idx, np.arange(mat.shape[1])]
+    seen = np.maximum.accumulate(~np.isnan(mat), axis=0)
+    return np.where(seen, out, np.nan)
+
+def as_of(mat):
+    """마지막 날짜 기준 as-of 값 (C,)"""
+    return _ffill(mat)[-1] if len(mat) else np.full(mat.shape[1], np.nan, dtype=np.float32)
+
+def rolling_max(mat, window=30):
+    """마지막 window일 최댓값 (C,)"""
+    tail = mat[-window:]
+    ok = ~np.isnan(tail).all(axis=0)
+    out = np.full(mat.shape[1], np.nan, dtype=np.float32)
+    out[ok] = np.nanmax(tail[:, ok], axis=0)
+    return out
+
+def trend(mat, window=30):
+    """마지막 날 as-of 값 - window일 전 as-of 값 (C,), 비교할 값이 없으면 0"""
+    filled = _ffill(mat)
+    if len(filled) == 0:
+        return np.zeros(mat.shape[1], dtype=np.float32)
+    now = filled[-1]
+    before = filled[max(0, len(filled) - 1 - window)]
+    d = now - before
+    return np.where(np.isnan(d), 0.0, d).astype(np.float32)
+
+def resolve_day(day=None, root=None):
+    """기준일: 지정한 날짜, 없으면 저장된 가장 최근 날짜 (저장된 스냅샷이 없으면 None)"""
+    if day is not None:
+        return _day(day)
+    dates = stored_dates(root)
+    return dates[-1] if dates else None
+
+def history_tag(mode, day=None, window=30, root=None):
+    """
+    epss_scores(mode, day, window) 결과용 캐시 키 조각
+    day=None은 새 스냅샷을 넣을 때마다 바뀌므로 실제 기준일로 풀고, 창 안 파티션의 크기·mtime도 넣음 (같은 날짜 재적재)
+    """
+    import hashlib
+    end = resolve_day(day, root)
+    if end is None:
+        return f"{mode}:-"
+    h = hashlib.sha256()
+    for d in stored_dates(root):
+        if end - timedelta(days=window) <= d <= end:
+            st = os.stat(_root(root) / f"date={d.isoformat()}" / "epss.parquet")
+            h.update(f"{d}:{st.st_size}:{st.st_mtime_ns};".encode("utf-8"))
+    return f"{mode}:{end}:{h.hexdigest()[:12]}"
+
+def epss_scores(cves, mode="asof", day=None, window=30, root=None):
+    """
+    fetch_epss_bulk()와 같은 모양의 {CVE: {"epss", "percentile", "date", "trend"}} (저장소에 값이 있는 CVE만)
+    day: 기준일 (기본: 저장된 가장 최근 날짜)
+    """
+    if mode not in MODES:
+        raise ValueError(f"알 수 없는 EPSS 점수 방식: {mode} (가능: {', '.join(MODES)})")
+    end = resolve_day(day, root)
+    if end is None:
+        return {}
+    t0 = time.perf_counter()
+    start = end - timedelta(days=window)
+    _, cves, mats = load_matrices(cves, start, end, root=root)
+    mat, pct = mats["epss"], mats["percentile"]
+
+    now = as_of(mat)
+    delta = trend(mat, window)
+    if mode == "asof":
+        val = now
+    elif mode == "max":
+        val = rolling_max(mat, window + 1)
+    else:
+        val = np.minimum(now + np.maximum(delta, 0.0), 1.0)
+    p = as_of(pct)
+
+    out = {}
+    for k, cve in enumerate(cves):
+        if np.isnan(val[k]):
+            continue
+        out[cve] = {
+            "epss": round(float(val[k]), 4),
+            "percentile": round(float(p[k]) * 100, 2) if not np.isnan(p[k]) else 0.0,
+            "date": end.isoformat(),
+            "trend": round(float(delta[k]), 4),
+        }
+    record_epss("history", len(cves), time.perf_counter() - t0, len(out))
+    return out
+
+# =========================
+# API 묶음 조회
+# =========================
+class EpssLookupError(RuntimeError):
+    """EPSS 조회 묶음 일부가 실패함 — partial: 받은 값 {CVE: ...}, failed: 받지 못한 CVE 목록"""
+    def __init__(self, partial, failed, error=None):
+        super().__init__(f"EPSS 조회 실패: CVE {len(failed)}개 ({type(error).__name__ if error else '?'})")
+        self.partial, self.failed = partial, failed
+
+def batched_lookup(fetch, cves, size=100):
+    """
+    fetch(CVE 목록) (실패하면 예외)를 size개씩 나눠 호출 → {CVE: EPSS dict}
+    실패한 묶음이 있으면 나머지 묶음까지 받은 뒤 EpssLookupError (캐시에는 partial만 넣을 것)
+    """
+    cves = list(cves)
+    out, failed, last = {}, [], None
+    for i in range(0, len(cves), size):
+        chunk = cves[i:i + size]
+        try:
+            out.update(fetch(chunk))
+        except Exception as e:
+            failed.extend(chunk)
+            last = e
+    if failed:
+        raise EpssLookupError(out, failed, last)
+    return out
+
+# =========================
+# 메인
+# =========================
+def main():
+    p = argparse.ArgumentParser(description="EPSS 일별 스냅샷 시계열 저장소")
+    p.add_argument("--root", help="저장소 경로 (기본: EPSS_HISTORY_DIR 또는 스크립트 폴더/epss_history)")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    s1 = sub.add_parser("ingest", help="받아 둔 스냅샷 파일 적재")
+    s1.add_argument("files", nargs="+")
+    s1.add_argument("--day", help="파일에 날짜가 없을 때 지정 (YYYY-MM-DD)")
+
+    s2 = sub.add_parser("fetch", help="FIRST에서 날짜별 스냅샷을 내려받아 적재 (이미 있는 날짜는 건너뜀)")
+    s2.add_argument("--end", help="마지막 날짜 (기본: 어제)")
+    s2.add_argument("--days", type=int, default=30)
+
+    s3 = sub.add_parser("show", help="CVE 시계열 출력")
+    s3.add_argument("cves", nargs="+")
+    s3.add_argument("--days", type=int, default=30)
+    args = p.parse_args()
+
+    if args.cmd == "ingest":
+        from artifact_manifest import record_artifact
+        for f in args.files:
+            day, n = ingest_file(f, day=args.day, root=args.root)
+            record_artifact("epss_snapshot", f)
+            print(f"[+] {day}  {n:,} CVE  ← {f}")
+    elif args.cmd == "fetch":
+        end = _day(args.end) if args.end else date.today() - timedelta(days=1)
+        have = set(stored_dates(args.root))
+        for k in range(args.days - 1, -1, -1):
+            day = end - timedelta(days=k)
+            if day in have:
+                continue
+            path = fetch_snapshot(day, out_dir=_root(args.root) / "_downloads")
+            if not path:
+                print(f"[-] {day} 스냅샷 없음")
+                continue
+            _, n = ingest_file(path, day=day, root=args.root)
+            print(f"[+] {day}  {n:,} CVE")
+    else:
+        dates = stored_dates(args.root)
+        if not dates:
+            print("저장된 스냅샷 없음.")
+            return
+        end = dates[-1]
+        days, cves, mat = load_range(args.cves, end - timedelta(days=args.days), end, root=args.root)
+        df = pd.DataFrame(mat, index=days.date, columns=cves).dropna(how="all")
+        print(df.to_string())
+
+if __name__ == "__main__":
+    main()
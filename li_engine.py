@@ -0,0 +1,169 @@
+# li_engine.py — 기술별 L(방어 수준)/I(영향도) 사전 계산 테이블
+#
+# 번들의 모든 기술에 대해 L/I를 한 번에(벡터화) 계산해서 TID 순서에 맞춘 정수 배열 두 개로 보관
+# 우선순위: tid_l_score.csv / tid_i_score.csv 값 > 전술(phase) 휴리스틱 (L, I 각각 따로 적용)
+#
+# 휴리스틱 정책(policy)
+#   "tactic" : S_* 방식 — 기술의 모든 전술 중 I는 최대, L은 최소 (표에 없는 전술은 L_DEFAULT/I_DEFAULT)
+#   "phase"  : 수동 입력 러너 방식 — 첫 번째 전술 하나로 PHASE_LI 조회 (없으면 3, 3)
+import numpy as np
+import pandas as pd
+
+L_DEFAULT = 3
+I_DEFAULT = 4
+
+I_BASE_BY_TACTIC = {
+    "exfiltration": 5,
+    "collection": 4,
+    "credential-access": 4,
+    "lateral-movement": 3,
+    "privilege-escalation": 3,
+    "defense-evasion": 3,
+    "execution": 3,
+    "initial-access": 3,
+    "command-and-control": 3,
+    "persistence": 3,
+    "discovery": 2,
+    "resource-development": 2,
+    "reconnaissance": 2,
+}
+L_BASE_BY_TACTIC = {
+    "exfiltration": 2,
+    "collection": 2,
+    "credential-access": 2,
+    "defense-evasion": 2,
+    "privilege-escalation": 2,
+    "lateral-movement": 3,
+    "initial-access": 3,
+    "execution": 3,
+    "command-and-control": 3,
+    "persistence": 3,
+    "discovery": 4,
+    "resource-development": 4,
+    "reconnaissance": 4,
+}
+
+PHASE_LI = {
+    "exfiltration":       (2, 5),
+    "impact":             (2, 5),
+    "credential-access":  (3, 4),
+    "lateral-movement":   (3, 4),
+    "privilege-escalation": (3, 4),
+    "discovery":          (3, 2),
+    # 기본값 그룹
+    "initial-access":     (3, 3),
+    "execution":          (3, 3),
+    "persistence":        (3, 3),
+    "defense-evasion":    (3, 3),
+    "collection":         (3, 3),
+    "command-and-control":(3, 3),
+    "resource-development": (3, 3),
+    "reconnaissance":     (3, 3),
+}
+PHASE_LI_DEFAULT = (3, 3)
+
+POLICIES = ("tactic", "phase")
+
+# =========================
+# CSV (TID → 점수)
+# =========================
+def load_tid_score_csv(path, col_tid="tid", col_val="score"):
+    """tid,score CSV → {TID: 1~5 정수} (컬럼 단위 벡터 처리)"""
+    if not path:
+        return {}
+    try:
+        df = pd.read_csv(path)
+    except Exception:
+        return {}
+    df.columns = df.columns.str.strip().str.lower()
+    if col_tid not in df.columns:
+        col_tid = next((c for c in df.columns if c in ("tid", "technique_id", "external_id")), col_tid)
+    if col_val not in df.columns:
+        col_val = next((c for c in df.columns if c in ("score", "value", "l", "i")), col_val)
+    if col_tid not in df.columns or col_val not in df.columns:
+        return {}
+    tids = df[col_tid].astype("string").str.strip().str.upper()
+    vals = pd.to_numeric(df[col_val], errors="coerce")
+    ok = tids.notna() & (tids != "") & vals.notna()
+    vals = vals[ok].astype(float).astype(int)
+    tids = tids[ok]
+    keep = (vals >= 1) & (vals <= 5)
+    # 같은 TID가 여러 번 나오면 마지막 행 우선 (기존 iterrows 동작과 동일)
+    return dict(zip(tids[keep].tolist(), vals[keep].tolist()))
+
+# =========================
+# 테이블 생성
+# =========================
+def _heuristic_tactic(phase_lists):
+    tactics = sorted({t for ph in phase_lists for t in ph})
+    pos = {t: k for k, t in enumerate(tactics)}
+    n = len(phase_lists)
+    member = np.zeros((n, max(1, len(tactics))), dtype=bool)
+    for i, ph in enumerate(phase_lists):
+        for t in ph:
+            member[i, pos[t]] = True
+    l_base = np.array([L_BASE_BY_TACTIC.get(t, L_DEFAULT) for t in tactics] or [L_DEFAULT])
+    i_base = np.array([I_BASE_BY_TACTIC.get(t, I_DEFAULT) for t in tactics] or [I_DEFAULT])
+    has = member.any(axis=1)
+    L = np.where(has, np.where(member, l_base, 99).min(axis=1), L_DEFAULT)
+    I = np.where(has, np.where(member, i_base, -99).max(axis=1), I_DEFAULT)
+    return np.clip(L, 1, 5), np.clip(I, 1, 5)
+
+def _heuristic_phase(phase_lists):
+    first = [ph[0] if ph else None for ph in phase_lists]
+    li = [PHASE_LI.get(p, PHASE_LI_DEFAULT) if p else PHASE_LI_DEFAULT for p in first]
+    arr = np.array(li, dtype=np.int64).reshape(-1, 2)
+    return arr[:, 0], arr[:, 1]
+
+def build_li_table(name2tid, name2phases, policy="tactic", l_map=None, i_map=None):
+    """
+    name2tid: {lower(name): TID}, name2phases: {lower(name): [phase, ...]} (또는 phase 문자열)
+    반환 dict:
+      tids: TID 배열, L / I: int8 배열 (tids와 같은 순서)
+      pos: {TID: 행}, pos_name: {lower(name): 행}, policy
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"알 수 없는 L/I 정책: {policy} (가능: {', '.join(POLICIES)})")
+    names = list(name2tid.keys())
+    tids = [name2tid[nm] for nm in names]
+    phase_lists = []
+    for nm in names:
+        ph = name2phases.get(nm) or []
+        if isinstance(ph, str):
+            ph = [ph]
+        phase_lists.append([p.strip().lower() for p in ph if p])
+
+    if policy == "tactic":
+        L, I = _heuristic_tactic(phase_lists)
+    else:
+        L, I = _heuristic_phase(phase_lists)
+
+    # CSV 우선 (L, I 각각)
+    tid_ser = pd.Series(tids, dtype="string").str.upper()
+    if l_map:
+        csv_l = tid_ser.map(l_map)
+        L = np.where(csv_l.notna(), csv_l.fillna(0).astype(int), L)
+    if i_map:
+        csv_i = tid_ser.map(i_map)
+        I = np.where(csv_i.notna(), csv_i.fillna(0).astype(int), I)
+
+    return {
+        "tids": np.array(tids, dtype=object),
+        "L": np.asarray(L, dtype=np.int8),
+        "I": np.asarray(I, dtype=np.int8),
+        "pos": {t: k for k, t in enumerate(tids)},
+        "pos_name": {nm: k for k, nm in enumerate(names)},
+        "policy": policy,
+    }
+
+def default_li(policy):
+    return (L_DEFAULT, I_DEFAULT) if policy == "tactic" else PHASE_LI_DEFAULT
+
+def li_lookup(table, tid="", tech_name=""):
+    """(L, I) — TID 우선, 없으면 기술명, 둘 다 없으면 정책 기본값"""
+    k = table["pos"].get(tid) if tid else None
+    if k is None and tech_name:
+        k = table["pos_name"].get(tech_name.lower())
+    if k is None:
+        return default_li(table["policy"])
+    return int(table["L"][k]), int(table["I"][k])
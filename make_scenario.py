@@ -1,8 +1,7 @@
 import json
 import argparse
 import os
-import glob
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 
 # ATT&CK Enterprise 전술(킬체인) 순서
 PHASE_ORDER = [
@@ -24,9 +23,8 @@ PHASE_ORDER = [
 
 # ---------------- 유틸 ----------------
 def find_default_bundle():
-    here = os.path.dirname(os.path.abspath(__file__))
-    cands = sorted(glob.glob(os.path.join(here, "enterprise-attack*.json")))
-    return cands[-1] if cands else None
+    from artifact_manifest import find_artifact
+    return find_artifact("bundle")
 
 def load_bundle(path):
     with open(path, "r", encoding="utf-8") as f:
@@ -62,12 +60,31 @@ def read_weights_csv(path):
                     pass
     return weights
 
+def read_weight_profiles(paths):
+    """
+    여러 가중치 프로필(name,weight CSV) → {프로필 이름: {lowercased_name: weight}}
+    paths: 파일 또는 폴더(안의 *.csv 전부), 프로필 이름은 파일 이름(확장자 제외)
+    """
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files += sorted(os.path.join(p, f) for f in os.listdir(p) if f.lower().endswith(".csv"))
+        else:
+            files.append(p)
+    profiles = {}
+    for f in files:
+        name = os.path.splitext(os.path.basename(f))[0]
+        if name in profiles:
+            name = f"{os.path.basename(os.path.dirname(os.path.abspath(f)))}/{name}"
+        profiles[name] = read_weights_csv(f)
+    return profiles
+
 # ------------- STIX 인덱싱 -------------
 def index_objects(objs):
     """
     반환:
-      techniques_by_id: {stix_id: {name, phases}}
-      techniques_by_name: {lower_name: {name, phases}}
+      techniques_by_id: {stix_id: {name, phases, tid}}
+      techniques_by_name: {lower_name: {name, phases, tid}}
       actors: {actor_id: {type, name}}
       relationships: list(SRO)
     """
@@ -89,7 +106,7 @@ def index_objects(objs):
                 if ph.get("kill_chain_name") in ["mitre-attack", "mitre-mobile-attack", "mitre-ics-attack"]:
                     phases.append(ph.get("phase_name"))
 
-            rec = {"name": name, "phases": phases or []}
+            rec = {"name": name, "phases": phases or [], "tid": external_id(o)}
             techniques_by_id[o["id"]] = rec
             if name:
                 techniques_by_name[name.lower()] = rec
@@ -104,6 +121,167 @@ def index_objects(objs):
 
     return techniques_by_id, techniques_by_name, actors, relationships
 
+def external_id(o):
+    for ref in o.get("external_references", []) or []:
+        if ref.get("source_name") in ("mitre-attack", "mitre-mobile-attack", "mitre-ics-attack"):
+            return (ref.get("external_id") or "").strip()
+    return ""
+
+def index_mitigations(objs, rels, techniques_by_id):
+    """
+    course-of-action 객체 + mitigates 관계 → 기술×완화책 비트셋
+    반환:
+      mitigations: [{id, mid, name}]  (비트 번호 = 리스트 인덱스)
+      bits_by_name: {lower_name: int 비트셋}  (기술을 막는 완화책들)
+      bits_by_tid : {TID: int 비트셋}
+    """
+    mitigations = []
+    pos = {}
+    tid_by_stix = {}
+    for o in objs:
+        t = o.get("type")
+        if t == "course-of-action":
+            if o.get("x_mitre_deprecated") or o.get("revoked"):
+                continue
+            pos[o["id"]] = len(mitigations)
+            mitigations.append({"id": o["id"], "mid": external_id(o), "name": o.get("name") or ""})
+        elif t == "attack-pattern" and o["id"] in techniques_by_id:
+            tid_by_stix[o["id"]] = external_id(o)
+
+    bits_by_name = defaultdict(int)
+    bits_by_tid = defaultdict(int)
+    for r in rels:
+        if r.get("relationship_type") != "mitigates":
+            continue
+        m = pos.get(r.get("source_ref"))
+        ap = techniques_by_id.get(r.get("target_ref"))
+        if m is None or not ap or not ap.get("name"):
+            continue
+        bits_by_name[ap["name"].lower()] |= 1 << m
+        tid = tid_by_stix.get(r.get("target_ref"))
+        if tid:
+            bits_by_tid[tid] |= 1 << m
+    return mitigations, dict(bits_by_name), dict(bits_by_tid)
+
+# ------------- 탐지 커버리지 (data component) -------------
+def index_detections(objs, rels, techniques_by_id):
+    """
+    x-mitre-data-component 객체 + detects 관계 → 기술×데이터컴포넌트 비트셋
+    반환:
+      components: [{id, name, source}]  (비트 번호 = 리스트 인덱스, source = 상위 data source 이름)
+      bits_by_name: {lower_name: int 비트셋}
+      bits_by_tid : {TID: int 비트셋}
+    """
+    sources = {}
+    comps_raw = []
+    tid_by_stix = {}
+    for o in objs:
+        t = o.get("type")
+        if t == "x-mitre-data-source":
+            sources[o["id"]] = o.get("name") or ""
+        elif t == "x-mitre-data-component":
+            if o.get("x_mitre_deprecated") or o.get("revoked"):
+                continue
+            comps_raw.append(o)
+        elif t == "attack-pattern" and o["id"] in techniques_by_id:
+            tid_by_stix[o["id"]] = external_id(o)
+
+    components, pos = [], {}
+    for o in comps_raw:
+        pos[o["id"]] = len(components)
+        components.append({"id": o["id"], "name": o.get("name") or "",
+                           "source": sources.get(o.get("x_mitre_data_source_ref"), "")})
+
+    bits_by_name = defaultdict(int)
+    bits_by_tid = defaultdict(int)
+    for r in rels:
+        if r.get("relationship_type") != "detects":
+            continue
+        c = pos.get(r.get("source_ref"))
+        ap = techniques_by_id.get(r.get("target_ref"))
+        if c is None or not ap or not ap.get("name"):
+            continue
+        bits_by_name[ap["name"].lower()] |= 1 << c
+        tid = tid_by_stix.get(r.get("target_ref"))
+        if tid:
+            bits_by_tid[tid] |= 1 << c
+    return components, dict(bits_by_name), dict(bits_by_tid)
+
+def read_data_sources(path):
+    """
+    운영 중인 데이터 소스 목록 (한 줄에 하나, # 주석 허용)
+      Process                      → 그 data source의 모든 component
+      Process: Process Creation    → 특정 component
+      Process Creation             → component 이름만
+    """
+    if not path:
+        return []
+    out = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                out.append(line)
+    return out
+
+def enabled_component_mask(components, enabled):
+    """활성 데이터 소스 목록 → 활성 component 비트셋"""
+    keys = {e.strip().lower() for e in enabled}
+    mask = 0
+    for i, c in enumerate(components):
+        src, nm = c["source"].lower(), c["name"].lower()
+        if src in keys or nm in keys or f"{src}: {nm}" in keys:
+            mask |= 1 << i
+    return mask
+
+def detection_coverage(bits_by_key, enabled_mask):
+    """
+    {key: 비트셋} → {key: 커버리지(0~1)}
+    커버리지 = 기술을 탐지하는 component 중 활성인 비율 (탐지 component가 없는 기술은 0)
+    """
+    return {k: bin(b & enabled_mask).count("1") / bin(b).count("1") for k, b in bits_by_key.items() if b}
+
+def coverage_vector(names, bits_by_name, enabled_mask):
+    """tables["names"] 순서에 맞춘 커버리지 배열 (경로 배치 전체를 한 번에 조회하기 위함)"""
+    import numpy as np
+    cov = detection_coverage(bits_by_name, enabled_mask)
+    return np.array([cov.get(nm.lower(), 0.0) for nm in names], dtype=np.float64)
+
+def path_coverage(paths, cov_vec):
+    """
+    sample_walks 결과 (S, N) 경로 배열 → 한 번의 인덱싱으로 단계별 커버리지
+    반환: (단계별 커버리지 (S, N, 빈 칸은 nan), 경로별 평균 커버리지 (S,), 경로별 미탐지 단계 수 (S,))
+    """
+    import numpy as np
+    valid = paths >= 0
+    cov = np.where(valid, cov_vec[np.where(valid, paths, 0)], np.nan)
+    n = valid.sum(axis=1)
+    mean = np.divide(np.nansum(cov, axis=1), n, out=np.zeros(len(n)), where=n > 0)
+    uncovered = (valid & (np.nan_to_num(cov) <= 0)).sum(axis=1)
+    return cov, mean, uncovered
+
+def detection_coverage_by_tid(objs, enabled):
+    """S_* / runner 용: 번들 객체 + 활성 데이터 소스 목록 → {TID: 커버리지}"""
+    tech_by_id, _, _, rels = index_objects(objs)
+    components, _, bits_by_tid = index_detections(objs, rels, tech_by_id)
+    return detection_coverage(bits_by_tid, enabled_component_mask(components, enabled))
+
+def apply_detection(rows, cov_by_tid, discount=0.0):
+    """
+    점수 행에 "Detect(0~1)" 추가 (0 = 활성 데이터 소스로는 탐지 불가)
+    탐지되는 단계는 NormRisk *= (1 - discount * 커버리지)
+    반환: 탐지 불가 단계의 technique 이름 리스트
+    """
+    undetected = []
+    for r in rows:
+        c = cov_by_tid.get(r.get("TID", ""), 0.0)
+        r["Detect(0~1)"] = round(c, 3)
+        if c <= 0:
+            undetected.append(r.get("technique", ""))
+        elif discount:
+            r["NormRisk(0~1)"] = round(float(r["NormRisk(0~1)"]) * (1.0 - discount * c), 6)
+    return undetected
+
 # ------------- 진단/검색 -------------
 def print_stats(tech_by_name, tech_by_id, actors, rels, sample=10):
     print(f"[stats] attack-pattern 개수: {len(tech_by_id)}")
@@ -123,43 +301,287 @@ def find_name_like(tech_by_name, keyword):
     return hits
 
 # ------------- 액터들의 연속 사용 패턴 → 전이 그래프 -------------
-def build_transition_graph(rels, techniques_by_id, alpha=1.0):
+ACTOR_TYPES = ["intrusion-set", "malware", "tool", "campaign"]
+
+def group_uses_by_actor(rels, techniques_by_id):
+    """uses 관계 → {actor_id: [기술 stix_id, ...]} (relationship 등장 순서 유지)"""
+    actor_to_techs = defaultdict(list)
+    for r in rels:
+        if r.get("relationship_type") == "uses":
+            ap = techniques_by_id.get(r.get("target_ref"))
+            if ap and ap.get("name"):
+                actor_to_techs[r.get("source_ref")].append(r.get("target_ref"))
+    return actor_to_techs
+
+def tech_sort_table(techniques_by_id):
+    """{stix_id: (name, phase_index)} — 쌍 계산에 필요한 최소 정보"""
+    return {tid: (ap["name"], phase_index(ap["phases"])) for tid, ap in techniques_by_id.items()}
+
+def actor_pairs(tech_ids, table):
+    """한 actor의 기술 stix_id 목록 → 킬체인 순 인접 기술쌍 [(from_name, to_name), ...]"""
+    # 중복 이름 제거
+    seen = set()
+    uniq = []
+    for tid in tech_ids:
+        nm, pi = table[tid]
+        if nm not in seen:
+            uniq.append((pi, nm))
+            seen.add(nm)
+
+    # 전술 순 정렬
+    uniq.sort()
+
+    # 인접 쌍을 간선으로 (정렬 후이므로 후퇴 쌍은 생기지 않음)
+    return [(uniq[i][1], uniq[i + 1][1]) for i in range(len(uniq) - 1)]
+
+def actor_transitions(rels, techniques_by_id):
+    """
+    actor별 uses 관계를 모아 킬체인 순으로 정렬 후 인접한 기술쌍 목록
+    반환: {actor_id: [(from_name, to_name), ...]}
+    """
+    table = tech_sort_table(techniques_by_id)
+    return {actor_id: actor_pairs(ids, table) for actor_id, ids in group_uses_by_actor(rels, techniques_by_id).items()}
+
+_WORKER_TABLE = None
+
+def _init_pair_worker(table):
+    global _WORKER_TABLE
+    _WORKER_TABLE = table
+
+def count_pairs(groups, table=None):
+    """actor 그룹 묶음(shard) → {(from_name, to_name): 등장 횟수} (처음 등장 순서 유지)"""
+    table = table if table is not None else _WORKER_TABLE
+    counts = {}
+    for ids in groups:
+        for pair in actor_pairs(ids, table):
+            counts[pair] = counts.get(pair, 0) + 1
+    return counts
+
+def build_transition_graph(rels, techniques_by_id, alpha=1.0, workers=1):
     """
     actor별 uses 관계를 모아 킬체인 순으로 정렬 후,
     인접한 기술쌍 (A→B)에 대해 edges[A][B] += alpha
     키는 "기술 이름" (중복 이름이 있을 가능성은 낮지만, 필요시 stix_id로 바꿀 수 있음)
+
+    workers > 1이면 actor 그룹을 연속 구간(shard)으로 나눠 프로세스 풀에서 쌍을 세고,
+    shard 순서대로 합쳐서 직렬 빌드와 간선/삽입 순서까지 같은 결과를 만듦
+    (기술 테이블은 worker마다 한 번만 전달, shard에는 stix_id 목록만 보냄)
     """
-    actor_to_techs = defaultdict(list)
+    groups = list(group_uses_by_actor(rels, techniques_by_id).values())
+    table = tech_sort_table(techniques_by_id)
 
-    for r in rels:
-        if r.get("relationship_type") == "uses":
-            ap = techniques_by_id.get(r.get("target_ref"))
-            if ap and ap.get("name"):
-                actor_to_techs[r.get("source_ref")].append(ap)
+    if workers and workers > 1 and len(groups) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        n_shards = min(len(groups), workers * 4)
+        size = -(-len(groups) // n_shards)
+        shards = [groups[i:i + size] for i in range(0, len(groups), size)]
+        counts = {}
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_pair_worker, initargs=(table,)) as ex:
+            for part in ex.map(count_pairs, shards):
+                for pair, c in part.items():
+                    counts[pair] = counts.get(pair, 0) + c
+    else:
+        counts = count_pairs(groups, table)
 
     edges = defaultdict(lambda: defaultdict(float))  # from_name -> to_name -> weight
-    for aps in actor_to_techs.values():
-        # 중복 이름 제거
-        seen = set()
-        uniq = []
-        for ap in aps:
-            nm = ap["name"]
-            if nm not in seen:
-                uniq.append(ap)
-                seen.add(nm)
-
-        # 전술 순 정렬
-        uniq.sort(key=lambda ap: (phase_index(ap["phases"]), ap["name"]))
-
-        # 인접 쌍을 간선으로
-        for i in range(len(uniq) - 1):
-            a, b = uniq[i], uniq[i + 1]
-            pa = phase_index(a["phases"])
-            pb = phase_index(b["phases"])
-            if pb < pa:  # 후퇴 방지
-                continue
-            edges[a["name"]][b["name"]] += float(alpha)
+    for (a, b), c in counts.items():
+        edges[a][b] = float(c) * float(alpha)
+
+    return edges
+
+def bench_graph_build(rels, techniques_by_id, alpha=1.0, worker_counts=(1, 2, 4, 8)):
+    """worker 수별 build_transition_graph 소요시간 → [(workers, 초, 직렬과 동일 여부)]"""
+    import time
+
+    def as_plain(edges):
+        return [(a, list(outs.items())) for a, outs in edges.items()]
+
+    base = None
+    out = []
+    for w in worker_counts:
+        t0 = time.perf_counter()
+        edges = build_transition_graph(rels, techniques_by_id, alpha=alpha, workers=w)
+        dt = time.perf_counter() - t0
+        plain = as_plain(edges)
+        if base is None:
+            base = plain
+        out.append((w, dt, plain == base))
+    return out
+
+# ------------- 공출현 그래프 (actor × 기술 희소 행렬) -------------
+GRAPH_KINDS = ["adjacent", "cooc"]
+COOC_NORMS = ["count", "jaccard", "pmi"]
+
+def build_cooccurrence_graph(rels, techniques_by_id, alpha=1.0, norm="count", actor_ids=None):
+    """
+    build_transition_graph()는 actor 기술 목록을 (전술, 이름) 순으로 정렬한 뒤 바로 옆 쌍만 간선으로 만듦
+    (같은 전술 안에서는 사전순, 떨어진 쌍은 빠짐). 여기서는
+      X = actor × 기술 이진 행렬 (uses 관계, 이름 단위 중복 제거)
+      C = XᵀX  → C[a, b] = a와 b를 같이 쓰는 actor 수
+    로 모든 공출현 쌍을 한 번에 세고, phase_index(a) <= phase_index(b)인 쌍만 a→b 간선으로 씀 (같은 전술은 양방향)
+    norm
+      "count"   : C[a, b]
+      "jaccard" : C[a, b] / (n_a + n_b - C[a, b])      (n = 그 기술을 쓰는 actor 수)
+      "pmi"     : max(0, log(C[a, b] · N / (n_a · n_b)))  (N = actor 수, 0 이하인 쌍은 제외)
+    actor_ids: 이 actor들만 사용 (None이면 전체)
+    반환: build_transition_graph와 같은 edges[from][to] = 가중치 * alpha
+    같은 전술 안 간선이 양방향이라 DAG가 아님 → greedy/랜덤워크/Markov용. --from/--to 질의는 거부,
+    초크포인트는 (전술, 이름) 순서를 거스르는 간선을 빼고 계산
+    """
+    import numpy as np
+    from scipy import sparse
+
+    if norm not in COOC_NORMS:
+        raise ValueError(f"알 수 없는 공출현 정규화: {norm} (가능: {', '.join(COOC_NORMS)})")
+    groups = group_uses_by_actor(rels, techniques_by_id)
+    if actor_ids is not None:
+        keep = set(actor_ids)
+        groups = {a: ids for a, ids in groups.items() if a in keep}
+    table = tech_sort_table(techniques_by_id)
+
+    pos, names, pidx = {}, [], []
+    rows, cols = [], []
+    for r, ids in enumerate(groups.values()):
+        for sid in ids:
+            nm, pi = table[sid]
+            j = pos.get(nm)
+            if j is None:
+                j = pos[nm] = len(names)
+                names.append(nm)
+                pidx.append(pi)
+            rows.append(r)
+            cols.append(j)
+
+    edges = defaultdict(lambda: defaultdict(float))
+    if not names:
+        return edges
+    X = sparse.csr_matrix((np.ones(len(rows), dtype=np.float64), (rows, cols)), shape=(len(groups), len(names)))
+    X.data[:] = 1.0  # 같은 actor-기술 중복 관계는 1로
+    n = np.asarray(X.sum(axis=0)).ravel()
+    C = (X.T @ X).tocoo()
+
+    pidx = np.asarray(pidx)
+    a, b, c = C.row, C.col, C.data
+    keep = (a != b) & (pidx[a] <= pidx[b])
+    a, b, c = a[keep], b[keep], c[keep]
+    if norm == "jaccard":
+        w = c / (n[a] + n[b] - c)
+    elif norm == "pmi":
+        w = np.log(c * len(groups) / (n[a] * n[b]))
+    else:
+        w = c
+    order = np.lexsort((b, a))
+    for k in order[w[order] > 0]:
+        edges[names[a[k]]][names[b[k]]] = float(w[k]) * float(alpha)
+    return edges
+
+# ------------- actor 조건부 전이 그래프 -------------
+def build_actor_graph_index(rels, techniques_by_id, actors, cache_size=32):
+    """
+    actor별 간선 기여분을 한 번만 계산해서 저장
+      edge_pairs[e] = (from_name, to_name)
+      actor_edges[actor_id] = 그 actor가 기여하는 간선 번호 배열
+    부분집합 그래프는 subset_graph()에서 기여분 합산(bincount)으로 조립
+    """
+    import numpy as np
+
+    edge_pairs, edge_pos = [], {}
+    actor_edges = {}
+    for actor_id, pairs in actor_transitions(rels, techniques_by_id).items():
+        ids = []
+        for pair in pairs:
+            e = edge_pos.get(pair)
+            if e is None:
+                e = edge_pos[pair] = len(edge_pairs)
+                edge_pairs.append(pair)
+            ids.append(e)
+        actor_edges[actor_id] = np.asarray(ids, dtype=np.int64)
+
+    return {
+        "actors": actors,
+        "edge_pairs": edge_pairs,
+        "actor_edges": actor_edges,
+        "cache": OrderedDict(),
+        "cache_size": cache_size,
+    }
+
+def select_actors(actors, names=None, types=None):
+    """
+    이름 부분일치(대소문자 무시) / actor 타입으로 actor_id 선택
+    둘 다 주면 교집합, 이름이 없으면 타입만으로 선택
+    """
+    kws = [n.lower() for n in (names or []) if n]
+    out = []
+    for actor_id, rec in actors.items():
+        if types and rec["type"] not in types:
+            continue
+        if kws and not any(kw in rec["name"].lower() for kw in kws):
+            continue
+        out.append(actor_id)
+    return sorted(out)
+
+def subset_graph(index, actor_ids, alpha=1.0):
+    """
+    선택한 actor들의 간선 기여분만 합산한 전이 그래프 (build_transition_graph와 같은 형식)
+    한 프로세스 안에서 같은 부분집합은 LRU 캐시에서 바로 반환 (실행 사이 캐시는 graph_cache/subset-*.json)
+    """
+    import numpy as np
+
+    key = (frozenset(actor_ids), float(alpha))
+    cache = index["cache"]
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key]
+
+    parts = [index["actor_edges"][a] for a in key[0] if a in index["actor_edges"]]
+    edges = defaultdict(lambda: defaultdict(float))
+    if parts:
+        counts = np.bincount(np.concatenate(parts), minlength=len(index["edge_pairs"]))
+        for e in np.flatnonzero(counts):
+            a, b = index["edge_pairs"][e]
+            edges[a][b] = float(counts[e]) * float(alpha)
 
+    cache[key] = edges
+    if len(cache) > index["cache_size"]:
+        cache.popitem(last=False)
+    return edges
+
+SUBSET_CACHE_VERSION = 1
+
+def subset_cache_path(bundle_path, actor_ids, alpha=1.0, kind="adjacent"):
+    """
+    번들 내용 해시 + 정렬한 actor id + alpha + 그래프 종류 → graph_cache/subset-<키>.json
+    실행마다 새로 만드는 메모리 LRU와 달리 다음 실행에서도 같은 부분집합이면 바로 읽음
+    """
+    import hashlib
+    from artifact_manifest import record_artifact
+
+    digest = record_artifact("graph_bundle", bundle_path)["sha256"]
+    opts = f"{digest}|{sorted(actor_ids)}|{float(alpha)}|{kind}"
+    key = hashlib.sha256(opts.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(graph_cache_dir(), f"subset-{key}.json")
+
+def save_subset_graph(edges, out_path):
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    data = {"version": SUBSET_CACHE_VERSION, "edges": [[a, b, w] for a, outs in edges.items() for b, w in outs.items()]}
+    tmp = out_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, out_path)
+
+def load_subset_graph(path):
+    """저장된 부분 그래프 → edges (간선 순서 그대로), 없거나 버전이 다르면 None"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != SUBSET_CACHE_VERSION:
+        return None
+    edges = defaultdict(lambda: defaultdict(float))
+    for a, b, w in data["edges"]:
+        edges[a][b] = w
     return edges
 
 # ------------- 시작 기술명 해석 -------------
@@ -228,6 +650,771 @@ def best_path_from_name(start_name, edges, tech_by_name, path_len=6, beta=1.0, w
         steps.append({"phase": phase, "name": rec["name"]})
     return steps
 
+# ------------- 경로 생성 (여러 설정 greedy 한 번에) -------------
+def weight_matrix(profiles, names):
+    """프로필별 weights dict → (프로필 수, 기술 수) 행렬, 열 순서는 names"""
+    import numpy as np
+
+    W = np.zeros((len(profiles), len(names)), dtype=np.float64)
+    for r, weights in enumerate(profiles):
+        for c, nm in enumerate(names):
+            W[r, c] = float((weights or {}).get(nm.lower(), 0.0))
+    return W
+
+def greedy_candidates(edges, tech_by_name):
+    """
+    best_path_from_name()의 노드별 후보 스캔(번들에 있고 후퇴하지 않는 다음 기술)을 미리 한 번만
+    번호는 이름 사전순 → 후보 배열도 오름차순이라, 동점일 때 이름이 큰 쪽을 고르는 원래 규칙은 '마지막 최댓값'
+    반환: {"names", "pos": {name: 번호}, "nbr": [노드별 후보 번호 배열], "ew": [노드별 간선 가중치 배열]}
+    """
+    import numpy as np
+
+    names = sorted(rec["name"] for rec in tech_by_name.values())
+    pos = {nm: i for i, nm in enumerate(names)}
+    pidx = [phase_index(tech_by_name[nm.lower()]["phases"]) for nm in names]
+
+    nbr, ew = [], []
+    for i, nm in enumerate(names):
+        cands = []
+        for nxt, w in edges.get(nm, {}).items():
+            if nxt.lower() not in tech_by_name:
+                continue
+            j = pos[tech_by_name[nxt.lower()]["name"]]
+            if pidx[j] >= pidx[i]:
+                cands.append((j, float(w)))
+        cands.sort()
+        nbr.append(np.asarray([j for j, _ in cands], dtype=np.int32))
+        ew.append(np.asarray([w for _, w in cands], dtype=np.float64))
+    return {"names": names, "pos": pos, "nbr": nbr, "ew": ew}
+
+def resolve_start_multi(user_name, tech_by_name, edges, alphas, betas, profiles):
+    """
+    설정(간선 배율 alpha, beta, weights)마다 resolve_start_name()과 같은 시작 기술 — 후보 검색/간선 목록은 한 번만
+    edges는 alpha=1로 만든 그래프 (이미 alpha가 곱해진 그래프면 alphas=1)
+    반환: 설정별 시작 기술명 목록 (못 찾으면 None)
+    """
+    n = len(betas)
+    if not user_name:
+        return [None] * n
+    key = user_name.lower()
+    if key in tech_by_name:
+        return [tech_by_name[key]["name"]] * n
+
+    cands = find_name_like(tech_by_name, user_name)
+    if not cands:
+        return [None] * n
+    outs = [[(nxt.lower(), float(ew)) for nxt, ew in edges.get(cand, {}).items()] for cand in cands]
+
+    starts = []
+    for a, b, weights in zip(alphas, betas, profiles):
+        weights = weights or {}
+        best_name, best_score = None, float("-inf")
+        for cand, out in zip(cands, outs):
+            score = 0.0
+            for nxt, ew in out:
+                score += ew * a + b * float(weights.get(nxt, 0.0))
+            if score > best_score:
+                best_name, best_score = cand, score
+        starts.append(best_name or cands[0])
+    return starts
+
+def greedy_paths_multi(table, starts, path_len, alpha, beta, W, wrow):
+    """
+    설정 M개의 greedy 경로를 단계별로 한 번에 (best_path_from_name()과 같은 경로)
+      점수 = ew * alpha[m] + beta[m] * W[wrow[m], 다음 기술]
+    같은 노드에 있는 설정들은 후보 스캔 하나를 공유하고 점수만 (설정 수, 후보 수) 행렬로 계산
+    반환: (M, path_len) int32 노드 번호, 경로가 일찍 끝나면 뒤는 -1
+    """
+    import numpy as np
+
+    starts = np.asarray(starts, dtype=np.int32)
+    alpha = np.asarray(alpha, dtype=np.float64)
+    beta = np.asarray(beta, dtype=np.float64)
+    wrow = np.asarray(wrow, dtype=np.int64)
+    M = len(starts)
+    paths = np.full((M, path_len), -1, dtype=np.int32)
+    paths[:, 0] = starts
+    active = np.ones(M, dtype=bool)
+
+    for t in range(1, path_len):
+        cur = paths[:, t - 1]
+        for node in np.unique(cur[active]):
+            idx = np.flatnonzero(active & (cur == node))
+            j, ew = table["nbr"][node], table["ew"][node]
+            if not j.size:
+                active[idx] = False
+                continue
+            S = ew[None, :] * alpha[idx, None] + beta[idx, None] * W[wrow[idx]][:, j]
+            seen = (paths[idx, :t, None] == j[None, None, :]).any(axis=1)
+            S[seen] = -np.inf
+            k = S.shape[1] - 1 - np.argmax(S[:, ::-1], axis=1)
+            ok = np.isfinite(S[np.arange(len(idx)), k])
+            paths[idx[ok], t] = j[k[ok]]
+            active[idx[~ok]] = False
+        if not active.any():
+            break
+    return paths
+
+def path_to_steps(path, table, tech_by_name):
+    """노드 번호 경로(-1 패딩) → best_path_from_name()과 같은 steps"""
+    steps = []
+    for i in path:
+        if i < 0:
+            break
+        rec = tech_by_name[table["names"][i].lower()]
+        phase = next((p for p in rec["phases"] if p in PHASE_ORDER), "unknown")
+        steps.append({"phase": phase, "name": rec["name"]})
+    return steps
+
+# ------------- alpha/beta 스윕 (그래프 한 번) -------------
+RISK_L, RISK_I = 3, 4  # 스윕 위험도 계산용 방어/영향 (러너 기본값과 같음)
+
+def parse_grid(spec, cast=float):
+    """
+    "a:b:n" → a~b n개 등간격 (int면 "a:b" = a~b 정수 전부), "x,y,z" → 목록, "x" → [x]
+    """
+    import numpy as np
+
+    spec = str(spec).strip()
+    if ":" in spec:
+        parts = [p.strip() for p in spec.split(":")]
+        if cast is int:
+            lo, hi = int(parts[0]), int(parts[1])
+            step = int(parts[2]) if len(parts) > 2 else 1
+            return list(range(lo, hi + 1, step))
+        lo, hi = float(parts[0]), float(parts[1])
+        n = int(parts[2]) if len(parts) > 2 else 10
+        return [float(x) for x in np.linspace(lo, hi, n)]
+    return [cast(p) for p in spec.split(",") if p.strip()]
+
+def sweep_paths(edges, tech_by_name, start_input, alphas, betas, path_len, weights=None):
+    """
+    alpha × beta 격자 전체의 greedy 경로 (edges는 alpha=1 그래프, alpha는 간선 배율로 곱하기만 함)
+    greedy는 앞 단계가 같으면 계속 같으므로 가장 긴 path_len 하나만 계산하고 짧은 길이는 앞부분을 자름
+    반환: (table, grid [(alpha, beta)], paths (격자 수, path_len)), 시작을 못 찾으면 paths=None
+    """
+    import numpy as np
+
+    table = greedy_candidates(edges, tech_by_name)
+    W = weight_matrix([weights or {}], table["names"])
+    grid = [(a, b) for a in alphas for b in betas]
+    ga = [a for a, _ in grid]
+    gb = [b for _, b in grid]
+    starts = resolve_start_multi(start_input, tech_by_name, edges, ga, gb, [weights] * len(grid))
+    if None in starts:
+        return table, grid, None
+    paths = greedy_paths_multi(table, [table["pos"][s] for s in starts], path_len,
+                               ga, gb, W, np.zeros(len(grid), dtype=np.int64))
+    return table, grid, paths
+
+def node_risk_vector(table, ix_path, L=RISK_L, I=RISK_I):
+    """
+    shared_index 파일의 TID→CVE·EPSS로 기술별 NormRisk (EPSS 최고 CVE × (5-L)/4 × I/5, 러너와 같은 식)
+    반환: (노드 수,) float64, CVE/EPSS가 없는 기술은 0
+    """
+    import numpy as np
+    from shared_index import open_shared_index, find_node, lookup_cve
+
+    ix = open_shared_index(ix_path)
+    v_norm = max(0.0, min(1.0, (5 - L) / 4))
+    i_norm = max(0.0, min(1.0, I / 5))
+    risk = np.zeros(len(table["names"]), dtype=np.float64)
+    for k, nm in enumerate(table["names"]):
+        v = find_node(ix, nm)
+        t = int(ix["node_tid"][v]) if v >= 0 else -1
+        cve, epss, *_ = lookup_cve(ix, ix["tids"][t] if t >= 0 else "")
+        if cve:
+            risk[k] = epss * v_norm * i_norm
+    return risk
+
+def series_norm_paths(paths, node_risk):
+    """경로 행렬(-1 패딩) → 경로별 Series Norm = 1 - Π(1 - NormRisk)"""
+    import numpy as np
+
+    r = np.where(paths >= 0, node_risk[np.maximum(paths, 0)], 0.0)
+    return 1.0 - np.prod(1.0 - r, axis=1)
+
+# ------------- 경로 생성 (가중 랜덤워크) -------------
+def build_alias_tables(edges, tech_by_name, beta=1.0, weights=None):
+    """
+    노드별 다음 기술 후보를 (edge_weight + beta * weight(to)) 비례로 뽑기 위한 alias 테이블
+    후퇴 간선(pb < pa)과 번들에 없는 기술은 미리 제외 → 킬체인 단조성은 테이블 단계에서 보장
+    CSR 형태로 평탄화:
+      offsets[i]:offsets[i+1] 구간이 노드 i의 슬롯
+      nbr[slot]   = 이웃 노드, w[slot] = 점수(원래 가중치)
+      prob[slot]  = 슬롯 유지 확률, alias[slot] = 대체 이웃 노드
+    """
+    import numpy as np
+
+    names = sorted(rec["name"] for rec in tech_by_name.values())
+    pos = {nm: i for i, nm in enumerate(names)}
+    pidx = [phase_index(tech_by_name[nm.lower()]["phases"]) for nm in names]
+
+    offsets = [0]
+    nbr, w, prob, alias = [], [], [], []
+    for i, nm in enumerate(names):
+        cands = []
+        for nxt, ew in edges.get(nm, {}).items():
+            j = pos.get(tech_by_name[nxt.lower()]["name"]) if nxt.lower() in tech_by_name else None
+            if j is None or j == i or pidx[j] < pidx[i]:
+                continue
+            score = float(ew) + beta * float((weights or {}).get(nxt.lower(), 0.0))
+            if score > 0:
+                cands.append((j, score))
+
+        # Vose alias method
+        k = len(cands)
+        total = sum(s for _, s in cands)
+        scaled = [s * k / total for _, s in cands] if k else []
+        p_row = [1.0] * k
+        a_row = [c[0] for c in cands]
+        small = [x for x in range(k) if scaled[x] < 1.0]
+        large = [x for x in range(k) if scaled[x] >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            p_row[s] = scaled[s]
+            a_row[s] = cands[l][0]
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+
+        for x, (j, score) in enumerate(cands):
+            nbr.append(j)
+            w.append(score)
+            prob.append(p_row[x])
+            alias.append(a_row[x])
+        offsets.append(len(nbr))
+
+    offsets = np.asarray(offsets, dtype=np.int64)
+    return {
+        "names": names,
+        "offsets": offsets,
+        "deg": np.diff(offsets),
+        "nbr": np.asarray(nbr, dtype=np.int32),
+        "w": np.asarray(w, dtype=np.float64),
+        "prob": np.asarray(prob, dtype=np.float64),
+        "alias": np.asarray(alias, dtype=np.int32),
+    }
+
+def sample_walks(tables, n_walks, path_len=6, start_idx=None, seed=None, max_retry=8):
+    """
+    n_walks개의 랜덤워크를 한 번에 생성 (배치 벡터화)
+    반환: (n_walks, path_len) int32 배열, 경로가 일찍 끝나면 -1로 채움
+    - start_idx가 없으면 시작 기술을 균등 추출
+    - 재방문 금지: 이미 방문한 이웃이 뽑히면 max_retry번까지 다시 뽑고,
+      그래도 남은 워크만 미방문 이웃으로 재정규화해서 개별 추출
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    offsets, deg = tables["offsets"], tables["deg"]
+    nbr, w, prob, alias = tables["nbr"], tables["w"], tables["prob"], tables["alias"]
+    n = len(tables["names"])
+
+    paths = np.full((n_walks, path_len), -1, dtype=np.int32)
+    if start_idx is None:
+        paths[:, 0] = rng.integers(n, size=n_walks)
+    else:
+        paths[:, 0] = start_idx
+    active = deg[paths[:, 0]] > 0
+
+    for t in range(1, path_len):
+        idx = np.flatnonzero(active)
+        if not idx.size:
+            break
+        cur = paths[idx, t - 1]
+        chosen = np.full(idx.size, -1, dtype=np.int32)
+
+        pending = np.arange(idx.size)
+        for _ in range(max_retry):
+            c = cur[pending]
+            col = offsets[c] + (rng.random(pending.size) * deg[c]).astype(np.int64)
+            nxt = np.where(rng.random(pending.size) < prob[col], nbr[col], alias[col])
+            seen = (paths[idx[pending], :t] == nxt[:, None]).any(axis=1)
+            chosen[pending[~seen]] = nxt[~seen]
+            pending = pending[seen]
+            if not pending.size:
+                break
+
+        for p in pending:
+            lo, hi = offsets[cur[p]], offsets[cur[p] + 1]
+            nb, nw = nbr[lo:hi], w[lo:hi]
+            ok = ~np.isin(nb, paths[idx[p], :t])
+            if ok.any():
+                chosen[p] = rng.choice(nb[ok], p=nw[ok] / nw[ok].sum())
+
+        paths[idx, t] = chosen
+        active[idx] = chosen >= 0
+        active[idx[chosen >= 0]] = deg[chosen[chosen >= 0]] > 0
+
+    return paths
+
+def walks_to_steps(paths, tables, tech_by_name):
+    """sample_walks 결과 → [[{phase, name}, ...], ...] (best_path_from_name과 같은 형식)"""
+    names = tables["names"]
+    out = []
+    for row in paths.tolist():
+        steps = []
+        for j in row:
+            if j < 0:
+                break
+            rec = tech_by_name[names[j].lower()]
+            phase = next((p for p in rec["phases"] if p in PHASE_ORDER), "unknown")
+            steps.append({"phase": phase, "name": rec["name"]})
+        out.append(steps)
+    return out
+
+# ------------- 마르코프 분석 (희소 전이행렬) -------------
+MARKOV_TARGET_PHASES = ("exfiltration", "impact")
+
+def build_transition_matrix(edges, tech_by_name):
+    """
+    edges(from_name -> to_name -> weight) → 행 정규화 CSR 전이행렬
+    반환: (P, names)  P[i, j] = i→j 전이확률, names[i] = 기술 이름(원문)
+    나가는 간선이 없는 행(끝 노드)은 0행으로 남김
+    """
+    import numpy as np
+    from scipy import sparse
+
+    names = sorted(rec["name"] for rec in tech_by_name.values())
+    pos = {nm: i for i, nm in enumerate(names)}
+
+    rows, cols, vals = [], [], []
+    for a, outs in edges.items():
+        i = pos.get(a)
+        if i is None:
+            continue
+        for b, w in outs.items():
+            j = pos.get(b)
+            if j is None or w <= 0:
+                continue
+            rows.append(i)
+            cols.append(j)
+            vals.append(float(w))
+
+    n = len(names)
+    W = sparse.csr_matrix((vals, (rows, cols)), shape=(n, n), dtype=np.float64)
+    out_sum = np.asarray(W.sum(axis=1)).ravel()
+    inv = np.divide(1.0, out_sum, out=np.zeros(n), where=out_sum > 0)
+    P = sparse.diags(inv) @ W
+    return P.tocsr(), names
+
+def k_step_distribution(P, start_idx, k):
+    """
+    start에서 k번 전이한 뒤의 위치 분포
+    끝 노드(나가는 간선 없음)에 도달한 확률질량은 그 자리에 머무름(흡수)
+    """
+    import numpy as np
+
+    n = P.shape[0]
+    stuck = np.asarray(P.sum(axis=1)).ravel() == 0
+    PT = P.T.tocsr()
+    p = np.zeros(n)
+    p[start_idx] = 1.0
+    for _ in range(k):
+        p = PT @ p + np.where(stuck, p, 0.0)
+    return p
+
+def hitting_probability(P, target_mask, tol=1e-10, max_iter=1000):
+    """
+    각 기술에서 출발해 target(유출/영향 등)에 언젠가 도달할 확률
+    h = 1 (target), h = P h (그 외) 를 0에서 출발해 고정점 반복
+    """
+    import numpy as np
+
+    h = target_mask.astype(np.float64)
+    for _ in range(max_iter):
+        nxt = np.where(target_mask, 1.0, P @ h)
+        if np.abs(nxt - h).max() < tol:
+            return nxt
+        h = nxt
+    return h
+
+def stationary_distribution(P, damping=0.85, tol=1e-12, max_iter=1000):
+    """
+    정상분포 (PageRank 방식)
+    킬체인 순으로만 흐르는 체인은 끝 노드에서 질량이 빠져나가므로,
+    확률 (1 - damping)로 / 그리고 끝 노드에서는 항상 임의 기술로 재시작
+    """
+    import numpy as np
+
+    n = P.shape[0]
+    if n == 0:
+        return np.zeros(0)
+    dangling = np.asarray(P.sum(axis=1)).ravel() == 0
+    PT = P.T.tocsr()
+    pi = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        nxt = damping * (PT @ pi) + (damping * pi[dangling].sum() + (1.0 - damping)) / n
+        if np.abs(nxt - pi).sum() < tol:
+            return nxt
+        pi = nxt
+    return pi
+
+def markov_analysis(edges, tech_by_name, start_name=None, k=5, target_phases=MARKOV_TARGET_PHASES, damping=0.85):
+    """
+    기술별 결과 행 리스트
+      name, phase, k_step_prob(start가 있을 때만), hit_prob, stationary
+    """
+    import numpy as np
+
+    P, names = build_transition_matrix(edges, tech_by_name)
+    recs = [tech_by_name[nm.lower()] for nm in names]
+    targets = np.array([any(p in target_phases for p in rec["phases"]) for rec in recs], dtype=bool)
+
+    hit = hitting_probability(P, targets)
+    pi = stationary_distribution(P, damping=damping)
+    kp = None
+    if start_name:
+        kp = k_step_distribution(P, names.index(start_name), k)
+
+    rows = []
+    for i, rec in enumerate(recs):
+        phase = next((p for p in rec["phases"] if p in PHASE_ORDER), "unknown")
+        row = {"name": rec["name"], "phase": phase}
+        if kp is not None:
+            row["k_step_prob"] = float(kp[i])
+        row["hit_prob"] = float(hit[i])
+        row["stationary"] = float(pi[i])
+        rows.append(row)
+    return rows
+
+def save_rows_csv(rows, out_path):
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    cols = list(rows[0].keys()) if rows else ["name", "phase", "hit_prob", "stationary"]
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write(",".join(cols) + "\n")
+        for r in rows:
+            vals = []
+            for c in cols:
+                v = r[c]
+                if c == "name":
+                    vals.append('"' + (v or "").replace('"', "'") + '"')
+                elif isinstance(v, float):
+                    vals.append(f"{v:.8g}")
+                else:
+                    vals.append(str(v))
+            f.write(",".join(vals) + "\n")
+
+# ------------- 초크포인트 (경로 수 / 가중 betweenness) -------------
+def topo_names(edges, tech_by_name):
+    """
+    (phase_index, 이름) 순으로 정렬한 기술 이름과 그 순서로 정리한 간선
+    build_transition_graph의 간선은 actor별로 이 순서로 정렬한 뒤의 인접쌍이라 항상 앞으로만 감 → DAG
+    반환: (names, succ, dropped)  succ[i] = [(j, edge_weight), ...] (j > i), dropped = 순서를 거스르는 간선 수
+    """
+    names = sorted((rec["name"] for rec in tech_by_name.values()),
+                   key=lambda nm: (phase_index(tech_by_name[nm.lower()]["phases"]), nm))
+    pos = {nm: i for i, nm in enumerate(names)}
+    succ = [[] for _ in names]
+    dropped = 0
+    for a, outs in edges.items():
+        i = pos.get(a)
+        if i is None:
+            continue
+        for b, w in outs.items():
+            j = pos.get(b)
+            if j is None or w <= 0:
+                continue
+            if j <= i:
+                dropped += 1
+                continue
+            succ[i].append((j, float(w)))
+    return names, succ, dropped
+
+def chokepoint_analysis(edges, tech_by_name):
+    """
+    기술별 공격 경로 중심성 (경로를 나열하지 않고 위상 순서 DP로 계산)
+      paths_through  : v를 중간 단계로 지나는 서로 다른 경로 수 = (v로 끝나는 경로 수 - 1) * (v에서 시작하는 경로 수 - 1)
+      path_share     : 길이 2 이상 전체 경로 중 v를 지나는 비율
+      flow_between   : 간선 가중치 비례 전이확률로 센 같은 값 (모든 기술에서 한 번씩 출발하는 워커 기준,
+                       v 도달 기대횟수 × v 이후 기대 단계 수) — 자주 쓰이는 전이를 더 무겁게 반영
+    반환: (행 리스트, 순서를 거스른 간선 수)
+    """
+    names, succ, dropped = topo_names(edges, tech_by_name)
+    n = len(names)
+
+    # 경로 수 (정확한 정수)
+    f = [1] * n   # v로 끝나는 경로 수 (v 혼자 포함)
+    for i in range(n):
+        for j, _ in succ[i]:
+            f[j] += f[i]
+    g = [1] * n   # v에서 시작하는 경로 수 (v 혼자 포함)
+    for i in range(n - 1, -1, -1):
+        g[i] += sum(g[j] for j, _ in succ[i])
+    total = sum(g) - n
+
+    # 전이확률 가중 버전
+    prob = []
+    for outs in succ:
+        s = sum(w for _, w in outs)
+        prob.append([(j, w / s) for j, w in outs] if s > 0 else [])
+    fp = [1.0] * n
+    for i in range(n):
+        for j, p in prob[i]:
+            fp[j] += fp[i] * p
+    gp = [1.0] * n
+    for i in range(n - 1, -1, -1):
+        gp[i] += sum(p * gp[j] for j, p in prob[i])
+
+    rows = []
+    for i, nm in enumerate(names):
+        rec = tech_by_name[nm.lower()]
+        through = (f[i] - 1) * (g[i] - 1)
+        rows.append({
+            "name": nm,
+            "phase": next((p for p in rec["phases"] if p in PHASE_ORDER), "unknown"),
+            "tid": rec.get("tid", ""),
+            "paths_through": through,
+            "path_share": through / total if total else 0.0,
+            "flow_between": (fp[i] - 1.0) * (gp[i] - 1.0),
+        })
+    return rows, dropped
+
+# ------------- 도달 가능성 인덱스 (노드별 비트셋) -------------
+REACH_INDEX_VERSION = 1
+
+def edge_score(ew, to_name, beta=1.0, weights=None):
+    """경로 점수 한 칸: edge_weight + beta * weight(to) (greedy/랜덤워크와 같은 식)"""
+    return float(ew) + beta * float((weights or {}).get(to_name.lower(), 0.0))
+
+def build_reach_index(edges, tech_by_name):
+    """
+    킬체인 순서(DAG) 전이 그래프의 도달 가능성 인덱스
+      succ[i]    = [(j, edge_weight), ...]
+      succ_bits[i] = 한 번에 갈 수 있는 노드 비트셋
+      reach[i]   = i에서 언젠가 갈 수 있는 노드 비트셋 (위상 역순 DP)
+      coreach[j] = j로 언젠가 올 수 있는 노드 비트셋 (위상 순 DP)
+    phase/tid도 같이 담아서 저장본만으로 질의 가능
+    """
+    names, succ, _ = topo_names(edges, tech_by_name)
+    n = len(names)
+    succ_bits = [0] * n
+    reach = [0] * n
+    for i in range(n - 1, -1, -1):
+        b = 0
+        r = 0
+        for j, _ in succ[i]:
+            b |= 1 << j
+            r |= reach[j]
+        succ_bits[i] = b
+        reach[i] = b | r
+    coreach = [0] * n
+    for i in range(n):
+        for j, _ in succ[i]:
+            coreach[j] |= (1 << i) | coreach[i]
+
+    phases, tids = [], []
+    for nm in names:
+        rec = tech_by_name[nm.lower()]
+        phases.append(next((p for p in rec["phases"] if p in PHASE_ORDER), "unknown"))
+        tids.append(rec.get("tid", ""))
+    return {
+        "names": names, "phases": phases, "tids": tids,
+        "pos": {nm.lower(): i for i, nm in enumerate(names)},
+        "succ": succ, "succ_bits": succ_bits, "reach": reach, "coreach": coreach,
+    }
+
+def save_reach_index(index, out_path):
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    data = {
+        "version": REACH_INDEX_VERSION,
+        "names": index["names"], "phases": index["phases"], "tids": index["tids"],
+        "succ": [[[j, w] for j, w in outs] for outs in index["succ"]],
+        "reach": [format(b, "x") for b in index["reach"]],
+        "coreach": [format(b, "x") for b in index["coreach"]],
+    }
+    tmp = out_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, out_path)
+
+def load_reach_index(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != REACH_INDEX_VERSION:
+        return None
+    succ = [[(j, w) for j, w in outs] for outs in data["succ"]]
+    succ_bits = [0] * len(succ)
+    for i, outs in enumerate(succ):
+        for j, _ in outs:
+            succ_bits[i] |= 1 << j
+    return {
+        "names": data["names"], "phases": data["phases"], "tids": data["tids"],
+        "pos": {nm.lower(): i for i, nm in enumerate(data["names"])},
+        "succ": succ, "succ_bits": succ_bits,
+        "reach": [int(b, 16) for b in data["reach"]],
+        "coreach": [int(b, 16) for b in data["coreach"]],
+    }
+
+def graph_cache_path(bundle_path, args):
+    """
+    번들 내용 해시(artifact_manifest) + 그래프 옵션(alpha, actor 조건) → 캐시 파일 경로 (--graph adjacent 전용)
+    번들이 바뀌면 해시가 달라져서 자동으로 새로 만듦
+    """
+    import hashlib
+    from artifact_manifest import record_artifact
+
+    digest = record_artifact("graph_bundle", bundle_path)["sha256"]
+    opts = f"{digest}|{args.alpha}|{sorted(args.actor or [])}|{sorted(args.actor_type or [])}"
+    key = hashlib.sha256(opts.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(graph_cache_dir(), f"reach-{key}.json")
+
+def graph_cache_dir():
+    here = os.path.dirname(os.path.abspath(__file__))
+    return os.environ.get("SCENARIO_CACHE_DIR") or os.path.join(here, "graph_cache")
+
+def _bits(x):
+    while x:
+        low = x & -x
+        yield low.bit_length() - 1
+        x ^= low
+
+def resolve_in_index(index, user_name):
+    """정확 일치 우선, 없으면 부분일치 후보 중 사전순 첫 번째"""
+    key = (user_name or "").lower()
+    if key in index["pos"]:
+        return index["pos"][key]
+    hits = [i for i, nm in enumerate(index["names"]) if key and key in nm.lower()]
+    return min(hits, key=lambda i: index["names"][i]) if hits else None
+
+def min_hops(index, src, dst, max_hops=None):
+    """src → dst 최소 단계 수 (비트셋 BFS), 도달 불가/초과면 None"""
+    if not (index["reach"][src] >> dst) & 1:
+        return None
+    seen = frontier = 1 << src
+    hops = 0
+    while frontier and (max_hops is None or hops < max_hops):
+        hops += 1
+        nxt = 0
+        for i in _bits(frontier):
+            nxt |= index["succ_bits"][i]
+        if (nxt >> dst) & 1:
+            return hops
+        frontier = nxt & ~seen
+        seen |= nxt
+    return None
+
+def best_connecting_path(index, src, dst, max_hops, beta=1.0, weights=None):
+    """
+    src → dst 경로 중 점수 합(edge_weight + beta*weight(to))이 최대인 경로 (단계 수 ≤ max_hops)
+    src에서 갈 수 있고 dst로 갈 수 있는 노드만 후보로 두고 단계별 DP
+    반환: (노드 번호 리스트, 점수) 또는 (None, None)
+    """
+    allowed = (index["reach"][src] & (index["coreach"][dst] | (1 << dst)))
+    if not (allowed >> dst) & 1:
+        return None, None
+    names = index["names"]
+    layer = {src: 0.0}
+    parent = []
+    best, best_h = None, None
+    for h in range(1, max_hops + 1):
+        nxt, par = {}, {}
+        for v, sv in layer.items():
+            for j, ew in index["succ"][v]:
+                if not (allowed >> j) & 1:
+                    continue
+                s = sv + edge_score(ew, names[j], beta, weights)
+                if j not in nxt or s > nxt[j]:
+                    nxt[j], par[j] = s, v
+        parent.append(par)
+        if dst in nxt and (best is None or nxt[dst] > best):
+            best, best_h = nxt[dst], h
+        nxt.pop(dst, None)
+        if not nxt:
+            break
+        layer = nxt
+    if best is None:
+        return None, None
+    path = [dst]
+    for h in range(best_h - 1, -1, -1):
+        path.append(parent[h][path[-1]])
+    return path[::-1], best
+
+# ------------- k-best 경로 (Yen, 최단경로 트리 재사용) -------------
+def suffix_tree(index, dst, allowed, max_hops, beta=1.0, weights=None):
+    """
+    dst까지 남은 단계 수 b(≤ max_hops)별 최고 점수와 다음 노드 (역방향 DP)
+      best[b][v] = v에서 b단계 이하로 dst까지 가는 최고 점수, nxt[b][v] = 그때 다음 노드
+    Yen의 매 spur마다 최단경로를 다시 풀지 않고 이 트리를 그대로 재사용
+    """
+    names = index["names"]
+    nodes = list(_bits(allowed))
+    best = [{dst: 0.0}]
+    nxt = [{}]
+    for b in range(1, max_hops + 1):
+        prev = best[-1]
+        cur, ptr = {dst: 0.0}, {}
+        for v in nodes:
+            if v == dst:
+                continue
+            bv, bw = prev.get(v), nxt[-1].get(v)
+            for w, ew in index["succ"][v]:
+                if w not in prev:
+                    continue
+                s = edge_score(ew, names[w], beta, weights) + prev[w]
+                if bv is None or s > bv:
+                    bv, bw = s, w
+            if bv is not None:
+                cur[v], ptr[v] = bv, bw
+        best.append(cur)
+        nxt.append(ptr)
+    return best, nxt
+
+def _follow(nxt, v, dst, b):
+    path = [v]
+    while path[-1] != dst:
+        path.append(nxt[b][path[-1]])
+        b -= 1
+    return path
+
+def k_best_paths(index, src, dst, k=5, max_hops=5, beta=1.0, weights=None):
+    """
+    src → dst 점수 합(edge_weight + beta*weight(to)) 상위 k개 경로 (단계 수 ≤ max_hops, 중복 없음)
+    Yen 방식: 직전 경로의 각 노드를 spur로 잡고 같은 root를 가진 기존 경로의 다음 간선만 막은 뒤
+    spur 이후는 suffix_tree로 바로 완성. 그래프가 킬체인 순서 DAG라 root 노드는 spur 이후에 다시 나올 수 없음
+    반환: [(노드 번호 리스트, 점수), ...] (점수 내림차순)
+    """
+    import heapq
+
+    names = index["names"]
+    allowed = (index["reach"][src] | (1 << src)) & (index["coreach"][dst] | (1 << dst))
+    if not (allowed >> dst) & 1 or src == dst:
+        return []
+    best, nxt = suffix_tree(index, dst, allowed, max_hops, beta, weights)
+    if src not in best[max_hops]:
+        return []
+
+    first = _follow(nxt, src, dst, max_hops)
+    found = [(first, best[max_hops][src])]
+    seen = {tuple(first)}
+    heap = []
+    while len(found) < k:
+        last, _ = found[-1]
+        root_score = 0.0
+        for i in range(len(last) - 1):
+            spur, root = last[i], last[:i + 1]
+            budget = max_hops - i
+            blocked = {p[i + 1] for p, _ in found if len(p) > i + 1 and p[:i + 1] == root}
+            for w, ew in index["succ"][spur]:
+                if w in blocked or not (allowed >> w) & 1 or w not in best[budget - 1]:
+                    continue
+                path = root + _follow(nxt, w, dst, budget - 1)
+                t = tuple(path)
+                if t in seen:
+                    continue
+                seen.add(t)
+                score = root_score + edge_score(ew, names[w], beta, weights) + best[budget - 1][w]
+                heapq.heappush(heap, (-score, path))
+            root_score += edge_score(dict(index["succ"][spur])[last[i + 1]], names[last[i + 1]], beta, weights)
+        if not heap:
+            break
+        neg, path = heapq.heappop(heap)
+        found.append((path, -neg))
+    return found
+
 # ------------- CSV 저장 -------------
 def save_csv(steps, out_path):
     os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
@@ -237,7 +1424,351 @@ def save_csv(steps, out_path):
             safe = (s["name"] or "").replace('"', "'")
             f.write(f'{i},{s["phase"]},"{safe}"\n')
 
+def save_walks_csv(walks, out_path):
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write("walk,step,phase,name\n")
+        for w, steps in enumerate(walks, 1):
+            for i, s in enumerate(steps, 1):
+                safe = (s["name"] or "").replace('"', "'")
+                f.write(f'{w},{i},{s["phase"]},"{safe}"\n')
+
 # ------------- 메인 -------------
+def graph_from_args(args, rels, tech_by_id, actors):
+    """
+    --actor/--actor-type이 있으면 해당 actor들만의 부분 그래프, 없으면 전체 그래프
+    --graph cooc이면 인접 쌍 대신 공출현 그래프 (--cooc-norm)
+    """
+    cooc = args.graph == "cooc"
+    if not (args.actor or args.actor_type):
+        if cooc:
+            return build_cooccurrence_graph(rels, tech_by_id, alpha=args.alpha, norm=args.cooc_norm)
+        return build_transition_graph(rels, tech_by_id, alpha=args.alpha, workers=args.workers)
+
+    chosen = select_actors(actors, names=args.actor, types=args.actor_type)
+    if not chosen:
+        raise SystemExit("조건에 맞는 actor가 없음. --actor 이름/--actor-type을 확인하세요.")
+    print(f"[actor] {len(chosen)}개 actor로 전이 그래프 구성: "
+          + ", ".join(actors[a]["name"] for a in chosen[:10]) + (" ..." if len(chosen) > 10 else ""))
+
+    # 같은 번들·actor 부분집합·alpha면 graph_cache/에 저장된 부분 그래프를 그대로 사용
+    from run_metrics import record_cache
+    kind = f"cooc:{args.cooc_norm}" if cooc else "adjacent"
+    path = subset_cache_path(args.bundle, chosen, args.alpha, kind) if args.bundle else None
+    edges = load_subset_graph(path) if path and not args.rebuild_index else None
+    if edges is not None:
+        record_cache("subset_graph", hits=1)
+        return edges
+    record_cache("subset_graph", misses=1)
+
+    if cooc:
+        edges = build_cooccurrence_graph(rels, tech_by_id, alpha=args.alpha, norm=args.cooc_norm, actor_ids=chosen)
+    else:
+        index = build_actor_graph_index(rels, tech_by_id, actors)
+        edges = subset_graph(index, chosen, alpha=args.alpha)
+    if path:
+        save_subset_graph(edges, path)
+    return edges
+
+def run_markov(args, tech_by_name, actors, rels, tech_by_id):
+    weights = read_weights_csv(args.weights)
+    edges = graph_from_args(args, rels, tech_by_id, actors)
+
+    start_name = None
+    if args.tech:
+        start_name = resolve_start_name(args.tech, tech_by_name, edges, beta=args.beta, weights=weights)
+        if not start_name:
+            raise SystemExit(f'시작 공격기법을 찾지 못함: {args.tech}')
+    k = args.markov_k if args.markov_k is not None else max(1, args.path_len - 1)
+
+    rows = markov_analysis(edges, tech_by_name, start_name=start_name, k=k)
+
+    if start_name:
+        print(f'=== {k}-step 도달확률 (start → "{start_name}") ===')
+        for r in sorted(rows, key=lambda r: -r["k_step_prob"])[:15]:
+            if r["k_step_prob"] <= 0:
+                break
+            print(f'{r["k_step_prob"]:.4f}  [{r["phase"]}] {r["name"]}')
+    print(f'=== {"/".join(MARKOV_TARGET_PHASES)} 도달확률 상위 ===')
+    for r in sorted(rows, key=lambda r: -r["hit_prob"])[:15]:
+        print(f'{r["hit_prob"]:.4f}  [{r["phase"]}] {r["name"]}')
+    print("=== 정상분포 상위 ===")
+    for r in sorted(rows, key=lambda r: -r["stationary"])[:15]:
+        print(f'{r["stationary"]:.4f}  [{r["phase"]}] {r["name"]}')
+
+    if args.markov_csv:
+        save_rows_csv(rows, args.markov_csv)
+        print(f"[+] CSV saved: {args.markov_csv}")
+
+def run_chokepoints(args, tech_by_name, actors, rels, tech_by_id):
+    import time
+
+    edges = graph_from_args(args, rels, tech_by_id, actors)
+    t0 = time.perf_counter()
+    rows, dropped = chokepoint_analysis(edges, tech_by_name)
+    dt = time.perf_counter() - t0
+
+    key = "flow_between" if args.chokepoint_by == "flow" else "paths_through"
+    rows.sort(key=lambda r: -r[key])
+    print(f"=== 초크포인트 상위 {args.top} (기준: {key}, {dt:.3f}s) ===")
+    for i, r in enumerate(rows[:args.top], 1):
+        print(f'{i:02d}. {r["flow_between"]:10.3f}  {r["path_share"] * 100:6.2f}%  '
+              f'{r["tid"] or "-":<10} [{r["phase"]}] {r["name"]}')
+    if dropped:
+        print(f"[경고] 킬체인 순서를 거스르는 간선 {dropped}개 제외"
+              + (" (--graph cooc는 같은 전술 안 간선이 양방향 → 한 방향만 반영)" if args.graph == "cooc" else ""))
+
+    if args.chokepoint_csv:
+        save_rows_csv(rows, args.chokepoint_csv)
+        print(f"[+] CSV saved: {args.chokepoint_csv}")
+
+def load_or_build_reach_index(args, bundle_path):
+    """캐시(graph_cache/reach-<키>.json)가 있으면 번들을 읽지 않고 바로 사용"""
+    path = graph_cache_path(bundle_path, args)
+    from run_metrics import record_cache
+    index = None if args.rebuild_index else load_reach_index(path)
+    if index is not None:
+        record_cache("reach_index", hits=1)
+        return index, path, True
+    record_cache("reach_index", misses=1)
+    objs = load_bundle(bundle_path)
+    tech_by_id, tech_by_name, actors, rels = index_objects(objs)
+    edges = graph_from_args(args, rels, tech_by_id, actors)
+    index = build_reach_index(edges, tech_by_name)
+    save_reach_index(index, path)
+    return index, path, False
+
+def run_reach(args, bundle_path):
+    import time
+
+    t0 = time.perf_counter()
+    index, path, cached = load_or_build_reach_index(args, bundle_path)
+    t_load = time.perf_counter() - t0
+
+    src = resolve_in_index(index, args.from_tech)
+    dst = resolve_in_index(index, args.to_tech)
+    if src is None or dst is None:
+        raise SystemExit(f'공격기법을 찾지 못함: {args.from_tech if src is None else args.to_tech}')
+    names = index["names"]
+    max_hops = args.max_hops if args.max_hops is not None else max(1, args.path_len - 1)
+
+    t0 = time.perf_counter()
+    weights = read_weights_csv(args.weights)
+    hops = min_hops(index, src, dst)
+    path_ids, score = (None, None)
+    if hops is not None and hops <= max_hops:
+        path_ids, score = best_connecting_path(index, src, dst, max_hops, beta=args.beta, weights=weights)
+    t_query = time.perf_counter() - t0
+
+    print(f'=== "{names[src]}" → "{names[dst]}" (최대 {max_hops}단계) ===')
+    print(f"[index] {'캐시' if cached else '새로 생성'} {path} ({t_load:.3f}s), 질의 {t_query * 1000:.2f}ms")
+    if hops is None:
+        print("도달 불가")
+        return
+    if path_ids is None:
+        print(f"{max_hops}단계 안에는 도달 불가 (최소 {hops}단계 필요)")
+        return
+    print(f"도달 가능: 최소 {hops}단계, 최고 점수 경로 {len(path_ids) - 1}단계 (점수 {score:.3f})")
+    steps = [{"phase": index["phases"][i], "name": names[i]} for i in path_ids]
+    for i, s in enumerate(steps, 1):
+        print(f'{i:02d}. [{s["phase"]}] {s["name"]}')
+
+    if args.csv:
+        save_csv(steps, args.csv)
+        print(f"[+] CSV saved: {args.csv}")
+
+def run_kbest(args, bundle_path):
+    import time
+
+    index, path, cached = load_or_build_reach_index(args, bundle_path)
+    src = resolve_in_index(index, args.from_tech)
+    dst = resolve_in_index(index, args.to_tech)
+    if src is None or dst is None:
+        raise SystemExit(f'공격기법을 찾지 못함: {args.from_tech if src is None else args.to_tech}')
+    names = index["names"]
+    max_hops = args.max_hops if args.max_hops is not None else max(1, args.path_len - 1)
+
+    t0 = time.perf_counter()
+    paths = k_best_paths(index, src, dst, k=args.k, max_hops=max_hops, beta=args.beta, weights=read_weights_csv(args.weights))
+    dt = time.perf_counter() - t0
+
+    print(f'=== k-best 경로: "{names[src]}" → "{names[dst]}" (k={args.k}, 최대 {max_hops}단계, {dt * 1000:.1f}ms) ===')
+    if not paths:
+        print("연결 경로 없음")
+        return
+    all_steps = []
+    for r, (ids, score) in enumerate(paths, 1):
+        steps = [{"phase": index["phases"][i], "name": names[i]} for i in ids]
+        all_steps.append(steps)
+        print(f"#{r} (점수 {score:.3f}, {len(ids) - 1}단계): " + " → ".join(s["name"] for s in steps))
+
+    if args.csv:
+        # 경로마다 save_csv 형식 파일 하나 (1개면 지정한 경로 그대로)
+        if len(all_steps) == 1:
+            outs = [args.csv]
+        else:
+            stem, ext = os.path.splitext(args.csv)
+            outs = [f"{stem}_{r}{ext or '.csv'}" for r in range(1, len(all_steps) + 1)]
+        for steps, out in zip(all_steps, outs):
+            save_csv(steps, out)
+        print(f"[+] CSV saved: {', '.join(outs)}")
+
+def run_walks(args, objs, tech_by_name, actors, rels, tech_by_id):
+    import time
+
+    weights = read_weights_csv(args.weights)
+    edges = graph_from_args(args, rels, tech_by_id, actors)
+    tables = build_alias_tables(edges, tech_by_name, beta=args.beta, weights=weights)
+
+    start_idx = None
+    if args.tech:
+        start_name = resolve_start_name(args.tech, tech_by_name, edges, beta=args.beta, weights=weights)
+        if not start_name:
+            raise SystemExit(f'시작 공격기법을 찾지 못함: {args.tech}')
+        start_idx = tables["names"].index(start_name)
+
+    t0 = time.perf_counter()
+    paths = sample_walks(tables, args.walks, path_len=args.path_len, start_idx=start_idx, seed=args.seed)
+    dt = time.perf_counter() - t0
+    walks = walks_to_steps(paths, tables, tech_by_name)
+
+    print(f"=== Random walks: {args.walks}개, {dt:.3f}s ({args.walks / max(dt, 1e-9):,.0f} walks/s) ===")
+    for w, steps in enumerate(walks[:5], 1):
+        print(f"#{w}: " + " → ".join(s["name"] for s in steps))
+
+    if args.data_sources:
+        components, bits_by_name, _ = index_detections(objs, rels, tech_by_id)
+        mask = enabled_component_mask(components, read_data_sources(args.data_sources))
+        _, mean, uncovered = path_coverage(paths, coverage_vector(tables["names"], bits_by_name, mask))
+        print(f"[탐지] 경로 평균 커버리지 {mean.mean():.3f}, 미탐지 단계가 있는 경로 {(uncovered > 0).mean() * 100:.1f}%"
+              f", 경로당 미탐지 단계 평균 {uncovered.mean():.2f}")
+
+    if args.csv:
+        # 1개면 greedy 경로와 같은 step,phase,name 형식 (run_random_scenario_risk.py 호환)
+        if len(walks) == 1:
+            save_csv(walks[0], args.csv)
+        else:
+            save_walks_csv(walks, args.csv)
+        print(f"[+] CSV saved: {args.csv}")
+
+def run_profiles(args, tech_by_name, actors, rels, tech_by_id, start_input):
+    import time
+
+    profiles = read_weight_profiles(args.profiles)
+    if not profiles:
+        raise SystemExit("가중치 프로필(CSV)을 찾지 못함: " + ", ".join(args.profiles))
+    pnames = list(profiles)
+    edges = graph_from_args(args, rels, tech_by_id, actors)
+
+    t0 = time.perf_counter()
+    table = greedy_candidates(edges, tech_by_name)
+    W = weight_matrix(profiles.values(), table["names"])
+    P = len(pnames)
+    starts = resolve_start_multi(start_input, tech_by_name, edges, [1.0] * P, [args.beta] * P, profiles.values())
+    if None in starts:
+        raise SystemExit(f'시작 공격기법을 찾지 못함: {start_input}\n힌트: python make_scenario.py --find "{start_input}"')
+    paths = greedy_paths_multi(table, [table["pos"][s] for s in starts], args.path_len,
+                               [1.0] * P, [args.beta] * P, W, range(P))
+    dt = time.perf_counter() - t0
+    all_steps = [path_to_steps(p, table, tech_by_name) for p in paths]
+
+    # 같은 경로끼리 묶어서 출력
+    groups = {}
+    for pname, steps in zip(pnames, all_steps):
+        groups.setdefault(tuple(s["name"] for s in steps), []).append(pname)
+    labels = {sig: chr(ord("A") + g) if g < 26 else f"#{g + 1}" for g, sig in enumerate(groups)}
+    first = next(iter(groups))
+
+    print(f'=== 가중치 프로필 {P}개 경로 비교 (start 입력: "{start_input}", 서로 다른 경로 {len(groups)}개, {dt:.3f}s) ===')
+    for sig, members in groups.items():
+        steps = all_steps[pnames.index(members[0])]
+        print(f"[경로 {labels[sig]}] " + ", ".join(members))
+        for i, s in enumerate(steps, 1):
+            diff = " *" if sig != first and (i > len(first) or first[i - 1] != s["name"]) else ""
+            print(f'  {i:02d}. [{s["phase"]}] {s["name"]}{diff}')
+    common = [f"{i:02d} {nm}" for i, nm in enumerate(first, 1) if all(len(sig) >= i and sig[i - 1] == nm for sig in groups)]
+    print("공통 단계: " + (", ".join(common) if common else "없음"))
+    if len(groups) > 1:
+        print(f"(* = 경로 {labels[first]}와 다른 단계)")
+
+    if args.csv:
+        rows = []
+        for pname, steps in zip(pnames, all_steps):
+            sig = tuple(s["name"] for s in steps)
+            for i, s in enumerate(steps, 1):
+                rows.append({"profile": pname, "path": labels[sig], "step": i, "phase": s["phase"], "name": s["name"]})
+        save_rows_csv(rows, args.csv)
+        print(f"[+] CSV saved: {args.csv}")
+
+def run_sweep(args, tech_by_name, actors, rels, tech_by_id, start_input):
+    import time
+    import numpy as np
+
+    alphas = parse_grid(args.sweep_alpha) if args.sweep_alpha else [args.alpha]
+    betas = parse_grid(args.sweep_beta) if args.sweep_beta else [args.beta]
+    lens = sorted(set(parse_grid(args.sweep_len, int))) if args.sweep_len else [args.path_len]
+    if not alphas or not betas or not lens or min(lens) < 1:
+        raise SystemExit("--sweep-alpha / --sweep-beta / --sweep-len 범위를 확인하세요.")
+    weights = read_weights_csv(args.weights)
+
+    t0 = time.perf_counter()
+    base = argparse.Namespace(**dict(vars(args), alpha=1.0))
+    edges = graph_from_args(base, rels, tech_by_id, actors)
+    t1 = time.perf_counter()
+    table, grid, paths = sweep_paths(edges, tech_by_name, start_input, alphas, betas, max(lens), weights)
+    if paths is None:
+        raise SystemExit(f'시작 공격기법을 찾지 못함: {start_input}\n힌트: python make_scenario.py --find "{start_input}"')
+    node_risk = node_risk_vector(table, args.sweep_index) if args.sweep_index else None
+    t2 = time.perf_counter()
+
+    print(f'=== alpha {len(alphas)} × beta {len(betas)} × 길이 {len(lens)} 스윕 (start 입력: "{start_input}") ===')
+    print(f"그래프 {t1 - t0:.3f}s, 격자 {len(grid) * len(lens)}개 평가 {t2 - t1:.3f}s")
+    if not weights:
+        print("[참고] --weights가 없으면 beta는 경로에 영향이 없고, alpha > 0은 점수 배율만 바뀜")
+    if node_risk is None:
+        print("[참고] --sweep-index(shared_index.py 인덱스)가 없어 위험도(Series Norm)는 생략")
+
+    rows = []
+    for L in lens:
+        sub = paths[:, :L]
+        sigs, inv = np.unique(sub, axis=0, return_inverse=True)
+        inv = inv.reshape(-1)
+        # 경로 번호는 격자에서 처음 나온 순서대로
+        order = {}
+        for g in inv.tolist():
+            order.setdefault(g, len(order) + 1)
+        pid = np.array([order[g] for g in inv.tolist()])
+        series = series_norm_paths(sub, node_risk) if node_risk is not None else None
+
+        print(f"\n--- 경로 길이 {L}: 서로 다른 경로 {len(sigs)}개 ---")
+        for g, n in sorted(order.items(), key=lambda kv: kv[1]):
+            members = np.flatnonzero(inv == g)
+            steps = path_to_steps(sigs[g], table, tech_by_name)
+            risk = f"  Series Norm {series[members[0]]:.6f}" if series is not None else ""
+            print(f"P{n:<3} 격자 {len(members):>4}칸{risk}  " + " → ".join(s["name"] for s in steps))
+
+        # alpha(행) × beta(열) 경로 번호 지도
+        width = max(4, len(f"P{len(order)}") + 1)
+        print("alpha\\beta " + "".join(f"{b:>{width}.3g}" for b in betas))
+        for i, a in enumerate(alphas):
+            cells = pid[i * len(betas):(i + 1) * len(betas)]
+            print(f"{a:>10.3g} " + "".join(f"{'P' + str(c):>{width}}" for c in cells))
+        if series is not None:
+            lo, hi = int(np.argmin(series)), int(np.argmax(series))
+            print(f"Series Norm 범위 {series[lo]:.6f} (alpha={grid[lo][0]:.3g}, beta={grid[lo][1]:.3g})"
+                  f" ~ {series[hi]:.6f} (alpha={grid[hi][0]:.3g}, beta={grid[hi][1]:.3g})")
+
+        if args.csv:
+            for m, (a, b) in enumerate(grid):
+                for i, s in enumerate(path_to_steps(sub[m], table, tech_by_name), 1):
+                    rows.append({"alpha": a, "beta": b, "path_len": L, "path": f"P{pid[m]}",
+                                 "series_norm": float(series[m]) if series is not None else "",
+                                 "step": i, "phase": s["phase"], "name": s["name"]})
+
+    if args.csv:
+        save_rows_csv(rows, args.csv)
+        print(f"[+] CSV saved: {args.csv}")
+
 def main():
     p = argparse.ArgumentParser(description="ATT&CK technique-name path builder (no TID needed)")
     p.add_argument("tech", nargs="?", help='시작 "공격기법 이름" (예: PowerShell)')
@@ -246,11 +1777,57 @@ def main():
     p.add_argument("--weights", help="name,weight CSV (다음 기술 선호도)")
     p.add_argument("--alpha", type=float, default=1.0, help="간선(연속빈도) 가중치")
     p.add_argument("--beta", type=float, default=1.0, help="다음 기술 weight 가중치")
+    p.add_argument("--profiles", nargs="+", help="가중치 프로필 CSV 여러 개(또는 폴더) → 프로필별 greedy 경로를 한 번에 계산해 비교 (--weights 대신)")
+
+    # alpha/beta 스윕
+    p.add_argument("--sweep-alpha", help='alpha 범위 "시작:끝:개수" 또는 "x,y,z" → 그래프는 한 번만 만들고 격자 전체의 greedy 경로 비교')
+    p.add_argument("--sweep-beta", help='beta 범위 (형식은 --sweep-alpha와 같음)')
+    p.add_argument("--sweep-len", help='경로 길이 범위 "최소:최대" 또는 "4,6,8"')
+    p.add_argument("--sweep-index", help="위험도(Series Norm)를 계산할 shared_index.py 인덱스 파일 (EPSS 포함)")
 
     # 진단/검색
     p.add_argument("--stats", action="store_true", help="번들 통계 출력")
     p.add_argument("--find", help="공격기법 이름 부분검색 (대소문자 무시)")
 
+    # 그래프 빌드 병렬화
+    p.add_argument("--workers", type=int, default=1, help="전이 그래프 빌드 프로세스 수 (기본 1 = 직렬)")
+    p.add_argument("--bench-workers", action="store_true", help="worker 1/2/4/8개로 그래프 빌드 시간 측정")
+
+    # 간선 소스
+    p.add_argument("--graph", choices=GRAPH_KINDS, default="adjacent",
+                   help="adjacent: actor별 킬체인 정렬 후 인접 쌍 (기본), cooc: actor × 기술 공출현 전체 "
+                        "(전술 순방향, 같은 전술은 양방향이라 순환 있음 → --from/--to 사용 불가)")
+    p.add_argument("--cooc-norm", choices=COOC_NORMS, default="count", help="--graph cooc 가중치 (count / jaccard / pmi)")
+
+    # actor 조건부 그래프
+    p.add_argument("--actor", action="append", help="이 actor(이름 부분일치)들의 사용 패턴만으로 그래프 구성 (반복 가능, 예: FIN7)")
+    p.add_argument("--actor-type", action="append", choices=ACTOR_TYPES, help="이 타입의 actor만 사용 (반복 가능)")
+
+    # 가중 랜덤워크 샘플링
+    p.add_argument("--walks", type=int, help="가중 랜덤워크로 N개 경로 샘플링 (생략 시 greedy 1개)")
+    p.add_argument("--seed", type=int, help="랜덤워크 시드 (재현용)")
+
+    # 탐지 커버리지
+    p.add_argument("--data-sources", help="운영 중인 데이터 소스 목록 파일 (한 줄에 하나) → 단계별 탐지 커버리지 표시")
+
+    # 마르코프 분석
+    p.add_argument("--markov", action="store_true", help="전이행렬 마르코프 분석 (k-step/도달확률/정상분포)")
+    p.add_argument("--markov-k", type=int, help="k-step 전이 횟수 (기본: path-len - 1)")
+    p.add_argument("--markov-csv", help="기술별 마르코프 분석 결과 CSV 저장 경로")
+
+    # 초크포인트 분석
+    p.add_argument("--chokepoints", action="store_true", help="공격 경로가 많이 지나는 기술 순위 (경로 수 / 가중 betweenness)")
+    p.add_argument("--chokepoint-by", choices=["flow", "paths"], default="flow", help="순위 기준 (flow: 전이확률 가중, paths: 경로 수)")
+    p.add_argument("--chokepoint-csv", help="기술별 초크포인트 분석 결과 CSV 저장 경로")
+    p.add_argument("--top", type=int, default=20, help="출력할 순위 개수 (기본 20)")
+
+    # X → Y 도달 질의 (도달 가능성 인덱스, graph_cache/에 저장)
+    p.add_argument("--from", dest="from_tech", help="출발 공격기법 이름 (--to와 함께)")
+    p.add_argument("--to", dest="to_tech", help="도착 공격기법 이름 → 도달 여부 + 최고 점수 경로")
+    p.add_argument("--k", type=int, help="--from/--to 사이 점수 상위 k개 경로 (Yen 방식)")
+    p.add_argument("--max-hops", type=int, help="최대 단계 수 (기본: path-len - 1)")
+    p.add_argument("--rebuild-index", action="store_true", help="저장된 도달 가능성 인덱스 / actor 부분 그래프를 무시하고 다시 생성")
+
     # CSV 출력
     p.add_argument("--csv", help="CSV 저장 경로")
     args = p.parse_args()
@@ -258,9 +1835,24 @@ def main():
     bundle_path = args.bundle or find_default_bundle()
     if not bundle_path or not os.path.exists(bundle_path):
         raise SystemExit("ATT&CK 번들을 찾지 못했음. --bundle로 경로를 주거나, 같은 폴더에 enterprise-attack*.json 을 두세요.")
+    args.bundle = bundle_path  # 부분 그래프 캐시 키
 
-    objs = load_bundle(bundle_path)
-    tech_by_id, tech_by_name, actors, rels = index_objects(objs)
+    if args.from_tech or args.to_tech:
+        if not (args.from_tech and args.to_tech):
+            raise SystemExit("--from과 --to를 같이 주세요.")
+        if args.graph != "adjacent":
+            # 도달 인덱스 / 최고 점수 경로 / k-best는 위상 순서 DP → 순환이 있는 공출현 그래프에서는 간선이 빠져 틀린 답
+            raise SystemExit("--from/--to 질의는 킬체인 순서 DAG(--graph adjacent)에서만 가능합니다.")
+        if args.k:
+            run_kbest(args, bundle_path)
+        else:
+            run_reach(args, bundle_path)
+        return
+
+    from run_metrics import stage
+    with stage("bundle_load"):
+        objs = load_bundle(bundle_path)
+        tech_by_id, tech_by_name, actors, rels = index_objects(objs)
 
     if args.stats:
         print_stats(tech_by_name, tech_by_id, actors, rels)
@@ -275,12 +1867,40 @@ def main():
                 print(nm)
         return
 
+    if args.bench_workers:
+        print(f"[bench] uses 관계 {sum(1 for r in rels if r.get('relationship_type') == 'uses')}개")
+        results = bench_graph_build(rels, tech_by_id, alpha=args.alpha)
+        base = results[0][1]
+        for w, dt, same in results:
+            print(f"[bench] workers={w}: {dt:.3f}s  (x{base / max(dt, 1e-9):.2f})  직렬과 동일: {same}")
+        return
+
+    if args.markov:
+        run_markov(args, tech_by_name, actors, rels, tech_by_id)
+        return
+
+    if args.chokepoints:
+        run_chokepoints(args, tech_by_name, actors, rels, tech_by_id)
+        return
+
+    if args.walks:
+        run_walks(args, objs, tech_by_name, actors, rels, tech_by_id)
+        return
+
     start_input = args.tech
     if not start_input:
         start_input = input('시작 "공격기법 이름"을 입력하세요 (예: PowerShell): ').strip()
 
+    if args.sweep_alpha or args.sweep_beta or args.sweep_len:
+        run_sweep(args, tech_by_name, actors, rels, tech_by_id, start_input)
+        return
+
+    if args.profiles:
+        run_profiles(args, tech_by_name, actors, rels, tech_by_id, start_input)
+        return
+
     weights = read_weights_csv(args.weights)
-    edges = build_transition_graph(rels, tech_by_id, alpha=args.alpha)
+    edges = graph_from_args(args, rels, tech_by_id, actors)
 
     # 이름 해석(정확/부분일치 허용)
     start_name = resolve_start_name(start_input, tech_by_name, edges, beta=args.beta, weights=weights)
@@ -289,9 +1909,18 @@ def main():
 
     steps = best_path_from_name(start_name, edges, tech_by_name, path_len=args.path_len, beta=args.beta, weights=weights)
 
+    cov = {}
+    if args.data_sources:
+        components, bits_by_name, _ = index_detections(objs, rels, tech_by_id)
+        cov = detection_coverage(bits_by_name, enabled_component_mask(components, read_data_sources(args.data_sources)))
+
     print(f'=== Path from: "{start_input}"  (start → "{steps[0]["name"]}") ===')
     for i, s in enumerate(steps, 1):
-        print(f'{i:02d}. [{s["phase"]}] {s["name"]}')
+        mark = ""
+        if args.data_sources:
+            c = cov.get(s["name"].lower(), 0.0)
+            mark = f"  (탐지 {c:.2f})" if c > 0 else "  (미탐지)"
+        print(f'{i:02d}. [{s["phase"]}] {s["name"]}{mark}')
 
     if args.csv:
         save_csv(steps, args.csv)
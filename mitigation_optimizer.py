@@ -0,0 +1,183 @@
+# mitigation_optimizer.py — 시나리오 포트폴리오의 Series Norm 합을 가장 많이 줄이는 완화책(course-of-action) 선택
+#
+# - 번들의 course-of-action / mitigates 관계 → 기술×완화책 비트셋 (make_scenario.index_mitigations)
+# - 포트폴리오의 단계를 (시나리오, 단계) 슬롯 배열로 두고,
+#   완화책 m 이 막는 슬롯들을 비트셋 mit_bits[m] (np.packbits) 으로 미리 계산
+# - 완화책 집합의 커버리지 = 비트셋 OR, 후보 감소량은 후보 묶음의 비트셋을 한 번에 풀어 시나리오별 곱으로 계산
+# - 막힌 단계는 NormRisk *= (1 - efficacy)
+# - 예산(완화책 개수) 안에서 greedy(기본) / lazy-greedy(CELF, 근사)로 선택
+#
+# 사용 예)
+#   python mitigation_optimizer.py --steps results/run1/steps.parquet --budget 5
+#   python mitigation_optimizer.py --store S_1 S_2 S_3 --budget 3 --strategy lazy
+import argparse, heapq
+
+import numpy as np
+
+from make_scenario import find_default_bundle, load_bundle, index_objects, index_mitigations
+from sensitivity import scenario_arrays, norm_risk, load_steps_file, load_latest_from_store
+
+# =========================
+# 포트폴리오 → 슬롯 비트셋
+# =========================
+GAIN_CHUNK_CELLS = 1 << 22  # 후보 묶음 하나에서 펼치는 (후보 × 슬롯) 칸 수 상한
+
+def build_slots(rows_by_scenario, bits_by_tid, bits_by_name, n_mit):
+    """
+    시나리오 s의 j번째 단계 = 슬롯 (s, j) — scenario_arrays와 같은 (S, N) 패딩 배열 (패딩 슬롯은 NormRisk 0)
+    반환 dict:
+      ids, norm (S, N), valid (S, N)
+      mit_bits[m] = 완화책 m 이 막는 슬롯 비트셋 (np.packbits, (n_mit, ceil(S*N/8)) uint8)
+    """
+    ids, techs, epss, L, I, mask = scenario_arrays(rows_by_scenario)
+    nr = np.where(mask, norm_risk(epss, L, I), 0.0)
+    S, N = nr.shape
+
+    cover = np.zeros((n_mit, S * N), dtype=bool)
+    for s, sid in enumerate(ids):
+        for j, r in enumerate(rows_by_scenario[sid]):
+            bits = bits_by_tid.get(str(r.get("TID") or "").strip(), 0) or bits_by_name.get(str(r.get("technique", "")).lower(), 0)
+            for m in _iter_bits(bits):
+                cover[m, s * N + j] = True
+    return {"ids": ids, "norm": nr, "valid": mask, "mit_bits": np.packbits(cover, axis=1)}
+
+def _iter_bits(x):
+    while x:
+        low = x & -x
+        yield low.bit_length() - 1
+        x ^= low
+
+def slot_mask(state, m):
+    """완화책 m (번호 또는 번호 목록)의 슬롯 비트셋 → bool (..., S, N)"""
+    S, N = state["norm"].shape
+    bits = np.unpackbits(state["mit_bits"][m], axis=-1, count=S * N).astype(bool)
+    return bits.reshape(bits.shape[:-1] + (S, N))
+
+def scenario_survival(state, covered, efficacy):
+    """막힌 슬롯 covered (..., S, N) → 시나리오별 Π(1 - NormRisk) (..., S), 막힌 단계는 NormRisk *= 1 - efficacy"""
+    n = state["norm"]
+    return np.prod(1.0 - np.where(covered, n * (1.0 - efficacy), n), axis=-1)
+
+def total_series(state, covered, efficacy):
+    return float((1.0 - scenario_survival(state, covered, efficacy)).sum())
+
+def marginal_gains(state, covered, efficacy, cands):
+    """
+    후보 완화책마다 추가했을 때 Series Norm 합 감소량 — 후보 묶음의 비트셋을 한 번에 풀어 (후보, S, N)로 계산
+    새로 막히는 슬롯이 없는 시나리오는 곱이 그대로라 감소량 0
+    """
+    surv = scenario_survival(state, covered, efficacy)
+    cands = list(cands)
+    out = np.zeros(len(cands))
+    step = max(1, GAIN_CHUNK_CELLS // max(1, state["norm"].size))
+    for a in range(0, len(cands), step):
+        cov = slot_mask(state, cands[a:a + step]) | covered
+        out[a:a + step] = (scenario_survival(state, cov, efficacy) - surv).sum(axis=-1)
+    return out
+
+# =========================
+# 선택 전략
+# =========================
+def greedy(state, budget, efficacy=0.5):
+    """매 라운드 남은 후보 전체의 한계 감소량을 한 번에 계산해 최대인 것 선택 → [(m, gain), ...]"""
+    covered = np.zeros(state["norm"].shape, dtype=bool)
+    remaining = list(range(len(state["mit_bits"])))
+    chosen = []
+    for _ in range(budget):
+        if not remaining:
+            break
+        gains = marginal_gains(state, covered, efficacy, remaining)
+        k = int(np.argmax(gains))
+        if gains[k] <= 0:
+            break
+        m = remaining.pop(k)
+        covered |= slot_mask(state, m)
+        chosen.append((m, float(gains[k])))
+    return chosen
+
+def lazy_greedy(state, budget, efficacy=0.5):
+    """
+    CELF: 이전 라운드의 감소량을 상한으로 힙에 두고 맨 위 후보만 다시 계산
+    목적함수가 submodular가 아님 (같은 시나리오의 슬롯을 더 막을수록 다음 감소량이 커질 수 있음)
+    → 오래된 상한이 실제보다 작아져 greedy보다 나쁜 집합을 고를 수 있는 근사 방식 (기본값은 greedy)
+    """
+    covered = np.zeros(state["norm"].shape, dtype=bool)
+    gains = marginal_gains(state, covered, efficacy, range(len(state["mit_bits"])))
+    heap = [(-g, m, 0) for m, g in enumerate(gains.tolist()) if g > 0]
+    heapq.heapify(heap)
+
+    chosen = []
+    rnd = 0
+    while heap and len(chosen) < budget:
+        neg, m, stamp = heapq.heappop(heap)
+        if stamp == rnd:
+            covered |= slot_mask(state, m)
+            chosen.append((m, -neg))
+            rnd += 1
+            continue
+        g = float(marginal_gains(state, covered, efficacy, [m])[0])
+        if g > 0:
+            heapq.heappush(heap, (-g, m, rnd))
+    return chosen
+
+def optimize(rows_by_scenario, mitigations, bits_by_tid, bits_by_name, budget=5, efficacy=0.5, strategy="greedy"):
+    state = build_slots(rows_by_scenario, bits_by_tid, bits_by_name, len(mitigations))
+    none = np.zeros(state["norm"].shape, dtype=bool)
+    before = total_series(state, none, efficacy)
+    pick = lazy_greedy if strategy == "lazy" else greedy
+    chosen = pick(state, budget, efficacy)
+    covered = none.copy()
+    for m, _ in chosen:
+        covered |= slot_mask(state, m)
+    return {
+        "before": before,
+        "after": total_series(state, covered, efficacy),
+        "chosen": [(mitigations[m], gain, int(slot_mask(state, m).sum())) for m, gain in chosen],
+        "covered_slots": int(covered.sum()),
+        "total_slots": int(state["valid"].sum()),
+    }
+
+# =========================
+# 메인
+# =========================
+def main():
+    p = argparse.ArgumentParser(description="완화책 선택 최적화 (Series Norm 합 최소화)")
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--steps", nargs="+", help="steps.parquet / steps.jsonl (result_writer 출력)")
+    src.add_argument("--store", nargs="+", help="risk_store 시나리오 ID들 (각각 가장 최근 실행)")
+    p.add_argument("--bundle", help="enterprise-attack.json 경로 (생략 시 같은 폴더 자동 탐색)")
+    p.add_argument("--budget", type=int, default=5, help="선택할 완화책 개수 (기본 5)")
+    p.add_argument("--efficacy", type=float, default=0.5, help="막힌 단계의 NormRisk 감소 비율 (기본 0.5)")
+    p.add_argument("--strategy", choices=["greedy", "lazy"], default="greedy",
+                   help="greedy: 매 라운드 전체 재계산 (정확, 기본), lazy: CELF 근사 (목적함수가 submodular가 아니라 더 나쁠 수 있음)")
+    args = p.parse_args()
+
+    bundle_path = args.bundle or find_default_bundle()
+    if not bundle_path:
+        raise SystemExit("ATT&CK 번들을 찾지 못했음. --bundle로 경로를 주세요.")
+    objs = load_bundle(bundle_path)
+    tech_by_id, _, _, rels = index_objects(objs)
+    mitigations, bits_by_name, bits_by_tid = index_mitigations(objs, rels, tech_by_id)
+    if not mitigations:
+        raise SystemExit("번들에 course-of-action 객체가 없음.")
+
+    data = {}
+    for path in args.steps or []:
+        data.update(load_steps_file(path))
+    for sid in args.store or []:
+        data.update(load_latest_from_store(sid))
+    if not data:
+        raise SystemExit("분석할 시나리오가 없음.")
+
+    res = optimize(data, mitigations, bits_by_tid, bits_by_name,
+                   budget=args.budget, efficacy=args.efficacy, strategy=args.strategy)
+
+    print(f"=== 완화책 선택 ({args.strategy}, budget={args.budget}, efficacy={args.efficacy}) ===")
+    print(f"- 시나리오 {len(data)}개, 단계 {res['total_slots']}개, 완화책 후보 {len(mitigations)}개")
+    for i, (mit, gain, n) in enumerate(res["chosen"], 1):
+        print(f"{i:02d}. {mit['mid'] or '-':<7} {mit['name']}  (-{gain:.6f}, 단계 {n}개)")
+    print(f"- Series Norm 합: {res['before']:.6f} → {res['after']:.6f}")
+    print(f"- 막힌 단계: {res['covered_slots']}/{res['total_slots']}")
+
+if __name__ == "__main__":
+    main()
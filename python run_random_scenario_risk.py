@@ -1,58 +1,16 @@
 # run_random_scenario_risk.py
-import json, os, random, subprocess, sys, csv, glob
-from pathlib import Path
+import json, os, random, subprocess, sys, csv, time
+from datetime import datetime
 import pandas as pd
 import requests
+from artifact_manifest import find_artifact
+from run_metrics import stage, record_epss, record_cache, record_steps
+from tid_hierarchy import build_tid_hierarchy, step_cves, attach_epss, lookup_cve
+from cve_intel import load_intel, pick_key, intel_cols
+from epss_history import EpssLookupError, batched_lookup
 
 # -------------------------
-# 유틸: 파일 자동 탐색
-# -------------------------
-def find_file(candidates):
-    """
-    candidates: [정확한 경로 or 글롭패턴] 리스트
-    1) 정확 경로 존재하면 그대로 사용
-    2) 스크립트 폴더에서 글롭 검색
-    3) 현재 작업 폴더에서 글롭 검색
-    4) USERPROFILE/Desktop, OneDrive/Desktop 등 일반 위치들도 글롭 검색
-    반환: 찾으면 str 경로, 못 찾으면 None
-    """
-    here = Path(__file__).resolve().parent
-    cwd = Path.cwd()
-    common_dirs = {here, cwd}
-
-    # 환경에 따라 Desktop/OneDrive Desktop 후보 추가
-    up = os.environ.get("USERPROFILE")
-    if up:
-        common_dirs.add(Path(up) / "Desktop")
-        common_dirs.add(Path(up) / "바탕 화면")
-    one = os.environ.get("OneDrive")
-    if one:
-        common_dirs.add(Path(one) / "Desktop")
-        common_dirs.add(Path(one) / "바탕 화면")
-
-    # 1) 정확 경로 검사
-    for c in candidates:
-        p = Path(c)
-        if p.exists():
-            return str(p)
-
-    # 2) 글롭 검색 (스크립트 폴더부터)
-    def glob_search(base: Path, pattern: str):
-        return sorted(base.glob(pattern))
-
-    # 후보 폴더들에서 모든 패턴 검색
-    for base in list(common_dirs):
-        for c in candidates:
-            # 정확 경로가 아니라면 패턴으로 간주
-            pat = c if any(ch in c for ch in "*?[]") else Path(c).name
-            hits = glob_search(base, pat)
-            if hits:
-                return str(hits[-1])  # 가장 마지막(보통 최신/사전순 마지막)
-
-    return None
-
-# -------------------------
-# 기본 후보(패턴) 정의
+# 파일 자동 탐색 후보(패턴) — artifact_manifest.py가 찾은 경로/해시를 기록
 # -------------------------
 BUNDLE_CANDIDATES = [
     # 정확 경로 후보 (원한다면 직접 넣어도 됨)
@@ -80,11 +38,13 @@ MAKE_SCENARIO_CANDIDATES = [
 # ---------------------------
 # EPSS 관련
 # ---------------------------
-def fetch_epss_bulk(cves):
+def fetch_epss_bulk(cves, raise_errors=False):
+    """raise_errors=True면 실패를 {}로 삼키지 않고 예외 그대로 (묶음 조회에서 실패 CVE를 캐시하지 않도록)"""
     cves = [c for c in {c.strip().upper() for c in cves} if c]
     if not cves:
         return {}
     url = f"https://api.first.org/data/v1/epss?cve={','.join(cves)}"
+    t0 = time.perf_counter()
     try:
         r = requests.get(url, timeout=15)
         r.raise_for_status()
@@ -95,8 +55,12 @@ def fetch_epss_bulk(cves):
             epss = float(row.get("epss", 0.0))
             pct = float(row.get("percentile", 0.0)) * 100
             out[cve] = {"epss": round(epss,4), "percentile": round(pct,2), "date": row.get("date")}
+        record_epss("api", len(cves), time.perf_counter() - t0, len(out))
         return out
-    except Exception:
+    except Exception as e:
+        record_epss("api", len(cves), time.perf_counter() - t0, error=e)
+        if raise_errors:
+            raise
         return {}
 
 def epss_to_E(epss: float) -> int:
@@ -141,13 +105,13 @@ def index_tech(objects):
 # ---------------------------
 # 시나리오 생성 파일 호출
 # ---------------------------
-def run_make_scenario(make_script, start_name, bundle_path, path_len, csv_out):
+def run_make_scenario(make_script, start_name, bundle_path, path_len, csv_out, extra_args=None):
     cmd = [
         sys.executable, make_script,
         start_name, "--bundle", bundle_path,
         "--path-len", str(path_len),
         "--csv", csv_out
-    ]
+    ] + list(extra_args or [])
     # 에러 메시지 확인을 위해 capture_output=True
     res = subprocess.run(cmd, text=True, capture_output=True)
     if res.returncode != 0:
@@ -187,14 +151,28 @@ def read_mapping(mapping_csv):
             inv.setdefault(tid, []).append(cve)
     return inv
 
+def flush_history(history):
+    """버퍼에 모은 (rows, start, 시각)을 risk_store 이력에 한 번에 추가 → 계속 기록할지 (pyarrow 없으면 False)"""
+    if not history:
+        return True
+    try:
+        from risk_store import record_runs
+        record_runs(history, "random")
+    except ImportError as e:
+        print(f"[이력 저장 생략] {e}")
+        return False
+    finally:
+        history.clear()
+    return True
+
 # ---------------------------
 # 메인
 # ---------------------------
 def main():
     # 0) 필요 파일 자동 탐색
-    bundle_path = find_file(BUNDLE_CANDIDATES)
-    mapping_csv = find_file(MAPPING_CANDIDATES)
-    make_script = find_file(MAKE_SCENARIO_CANDIDATES)
+    bundle_path = find_artifact("bundle", BUNDLE_CANDIDATES)
+    mapping_csv = find_artifact("mapping", MAPPING_CANDIDATES)
+    make_script = find_artifact("make_scenario", MAKE_SCENARIO_CANDIDATES)
 
     missing = []
     if not bundle_path:  missing.append("enterprise-attack*.json")
@@ -213,100 +191,242 @@ def main():
     PATH_LEN = 6
     L, I = 3, 4  # 기본 방어/영향
     RAND_LI = False
+    RANDOM_WALK = False  # True면 greedy 대신 가중 랜덤워크로 경로 생성 (같은 시작이어도 매번 다른 시나리오)
+    WALK_SEED = None     # 재현이 필요하면 정수 지정
+
+    N_SCENARIOS = 1      # 한 번 실행에 생성/채점할 시나리오 수
+    RESULT_DIR = None    # 예: "results/run1" → 단계/요약 결과를 Parquet로 스트리밍 저장
+    RESULT_JSONL = False # True면 RESULT_DIR에 JSONL도 같이 저장
+    RECORD_HISTORY = True  # 시나리오마다 risk_store 이력에 추가 (scenario="random")
+    HISTORY_BATCH = 1000   # 이력은 이 개수만큼 모아서 part 파일 하나로 (끝나면 남은 것도 저장)
+    DATA_SOURCES_FILE = None  # 운영 중인 데이터 소스 목록 파일 → 단계별 탐지 커버리지(Detect) 표시
+    DETECT_DISCOUNT = 0.0     # 탐지되는 단계의 NormRisk 할인율 (NormRisk *= 1 - DETECT_DISCOUNT * 커버리지)
+    CVE_FALLBACK = None       # 하위 기술에 매핑된 CVE가 없을 때 대체: None | "parent" | "family"(부모+형제)
+    EPSS_MODE = None          # None이면 EPSS API 최신값, "asof" | "max" | "trend"면 일별 스냅샷 저장소 사용 (epss_history.py)
+    EPSS_AS_OF = None         # 스냅샷 기준일 "YYYY-MM-DD" (None이면 저장된 가장 최근 날짜)
+    CVE_PICK = "epss"         # 단계 대표 CVE 선택: "epss" | "kev"(KEV 우선) | "weighted"(EPSS+CVSS+KEV) (cve_intel.py)
+    START_SAMPLING = "uniform"  # 시작 기술 추출: "uniform"(균등) | "stratified"(층화 + 커버리지 우선, coverage_sampler.py)
+    STRATA = "phase"          # stratified 층 기준: "phase"(첫 전술) | "family"(부모 TID)
+    TARGET_COVERAGE = 0.9     # stratified: 경로에 나온 기술 비율이 이 값에 닿으면 N_SCENARIOS 전에 멈춤 (None=사용 안 함)
+    CONVERGE_TOL = 0.005      # stratified: Series Norm 평균 95% 신뢰구간 반폭이 이 값 이하면 멈춤 (None=사용 안 함)
+    WORKERS = 1               # 2 이상이면 시나리오 생성·CVE 선택을 프로세스 풀로 (worker는 shared_index.py mmap 인덱스를 공유)
 
     # 1) 번들 로드 & 인덱싱
-    objs = load_bundle(bundle_path)
-    name2tid, _ = index_tech(objs)
+    with stage("bundle_load"):
+        objs = load_bundle(bundle_path)
+        name2tid, name2phases = index_tech(objs)
     if not name2tid:
         sys.exit("번들에서 기술을 찾지 못함")
 
-    # 2) 랜덤 시작 + 시나리오 생성
-    start_lower = random.choice(list(name2tid.keys()))
-    start_disp = start_lower
-    tmp_csv = "_tmp_steps.csv"
-    run_make_scenario(make_script, start_disp, bundle_path, PATH_LEN, tmp_csv)
-
-    steps = read_steps_csv(tmp_csv)
-    if not steps:
-        sys.exit("시나리오 생성 실패")
-
-    # 3) TID→CVE 역매핑 만들고 EPSS 조회
-    mapping_inv = read_mapping(mapping_csv)
-    all_candidates = []
-    for s in steps:
-        nm = s["name"].lower()
-        tid = name2tid.get(nm, "")
-        cves = mapping_inv.get(tid, []) if tid else []
-        all_candidates.extend(cves)
-
-    epss_map = fetch_epss_bulk(all_candidates)
-
-    # 4) 단계별 점수
-    rows = []
-    for s in steps:
-        nm = s["name"].lower()
-        tid = name2tid.get(nm, "")
-        cves = mapping_inv.get(tid, []) if tid else []
-        best_cve, best_epss, best_pct, best_date = None, 0.0, None, None
-        for c in cves:
-            m = epss_map.get(c)
-            e = m["epss"] if m else 0.0
-            if m and e >= best_epss:
-                best_cve, best_epss = c, e
-                best_pct, best_date = m["percentile"], m["date"]
-
-        if RAND_LI:
-            curL = random.randint(1,5)
-            curI = random.randint(1,5)
+    with stage("mapping_load"):
+        mapping_inv = read_mapping(mapping_csv)
+        hier = build_tid_hierarchy(name2tid.values(), mapping_inv)
+    intel = load_intel() if CVE_PICK != "epss" else {}
+    epss_cache = {}
+
+    # 탐지 커버리지 (DATA_SOURCES_FILE 지정 시, 번들 기준으로 한 번만 계산)
+    detect_cov = None
+    if DATA_SOURCES_FILE:
+        from make_scenario import read_data_sources, detection_coverage_by_tid, apply_detection
+        detect_cov = detection_coverage_by_tid(objs, read_data_sources(DATA_SOURCES_FILE))
+
+    writer = None
+    if RESULT_DIR:
+        from result_writer import ResultWriter
+        writer = ResultWriter(RESULT_DIR, jsonl=RESULT_JSONL)
+
+    # 시작 기술 추출기
+    sampler = None
+    if START_SAMPLING == "stratified":
+        from coverage_sampler import CoverageSampler
+        sampler = CoverageSampler(name2tid, name2phases, by=STRATA, target=TARGET_COVERAGE, tol=CONVERGE_TOL,
+                                  seed=WALK_SEED)
+        next_start = sampler.next_start
+    else:
+        starts = list(name2tid.keys())
+        next_start = lambda: random.choice(starts)
+
+    # 프로세스 풀: 번들/매핑/EPSS를 인덱스 파일 하나로 만들어 두고 worker는 mmap으로 열기만 함
+    pooled = None
+    ix_temp = None  # EPSS 조회가 일부 실패해서 캐시하지 않은 임시 인덱스 (끝나면 삭제)
+    if WORKERS > 1 and N_SCENARIOS > 1:
+        from shared_index import ensure_shared_index, pool_scenarios
+        if EPSS_MODE:
+            from epss_history import epss_scores, history_tag, resolve_day
+            day = resolve_day(EPSS_AS_OF)  # None이면 지금 저장된 가장 최근 날짜로 고정 (캐시 키와 같은 날짜)
+            epss_lookup = lambda cs: epss_scores(cs, mode=EPSS_MODE, day=day)
+            epss_tag = history_tag(EPSS_MODE, day)
         else:
-            curL, curI = L, I
-
-        E = epss_to_E(best_epss if best_cve else 0.0)
-        pii_risk = E * (5 - curL) * curI
-        V_norm = max(0.0, min(1.0, (5 - curL) / 4))
-        I_norm = max(0.0, min(1.0, curI / 5))
-        norm = (best_epss if best_cve else 0.0) * V_norm * I_norm
-
-        rows.append({
-            "step": s["step"],
-            "phase": s["phase"],
-            "technique": s["name"],
-            "TID": tid,
-            "CVE": best_cve or "",
-            "EPSS": round(best_epss,4) if best_cve else "",
-            "EPSS_percentile(%)": best_pct if best_cve else "",
-            "EPSS_date": best_date if best_cve else "",
-            "L": curL, "I": curI, "E(1~5)": E,
-            "PII_Risk(0~125)": pii_risk,
-            "NormRisk(0~1)": round(norm,6)
-        })
-
-    df = pd.DataFrame(rows)
-
-    # 5) 요약(연쇄 결합)
-    series_norm = 1.0
-    for r in df["NormRisk(0~1)"]:
-        r = float(r) if r != "" else 0.0
-        series_norm *= (1.0 - r)
-    series_norm = 1.0 - series_norm
-
-    print(f'\n[랜덤 시작 기술] {start_disp}')
-    print("\n[단계별 결과]")
-    show_cols = ["step","phase","technique","TID","CVE","EPSS","E(1~5)","L","I","PII_Risk(0~125)","NormRisk(0~1)"]
-    print(df[show_cols].to_string(index=False))
-
-    print("\n[시나리오 요약]")
-    print(f"- Steps: {len(df)}")
-    print(f"- Sum PII_Risk(0~125): {int(df['PII_Risk(0~125)'].sum())}")
-    print(f"- Avg Norm(0~1): {round(float(df['NormRisk(0~1)'].replace('',0).astype(float).mean()),6)}")
-    print(f"- Max Norm(0~1): {round(float(df['NormRisk(0~1)'].replace('',0).astype(float).max()),6)}")
-    print(f"- Series Norm(0~1): {round(series_norm,6)}  (~ {round(series_norm*100,2)}%)")
-
-    # 임시 CSV 삭제
+            from datetime import date
+            epss_lookup = lambda cs: batched_lookup(lambda b: fetch_epss_bulk(b, raise_errors=True), cs)
+            epss_tag = f"api:{date.today()}"
+        ix_path, temp = ensure_shared_index(bundle_path, mapping_csv, mapping_inv, epss_lookup, epss_tag, intel)
+        if temp:
+            ix_temp = ix_path
+        # 시작은 제출할 때마다 고름 (stratified면 앞 시나리오 커버리지를 반영)
+        tasks = ((next_start(), WALK_SEED + k if WALK_SEED is not None else None) for k in range(N_SCENARIOS))
+        opts = {"path_len": PATH_LEN, "random_walk": RANDOM_WALK, "fallback": CVE_FALLBACK, "pick": CVE_PICK}
+        pooled = pool_scenarios(ix_path, tasks, WORKERS, opts)
+
+    tmp_csv = "_tmp_steps.csv"
+    history = []
     try:
-        os.remove(tmp_csv)
-    except Exception:
-        pass
+        for n in range(1, N_SCENARIOS + 1):
+            if pooled is not None:
+                start_disp, steps, picks = next(pooled)
+                if not steps:
+                    sys.exit("시나리오 생성 실패")
+            else:
+                # 2) 랜덤 시작 + 시나리오 생성
+                start_lower = next_start()
+                start_disp = start_lower
+                extra = []
+                if RANDOM_WALK:
+                    extra = ["--walks", "1"]
+                    if WALK_SEED is not None:
+                        extra += ["--seed", str(WALK_SEED + n - 1)]
+                with stage("make_scenario"):
+                    run_make_scenario(make_script, start_disp, bundle_path, PATH_LEN, tmp_csv, extra_args=extra)
+                    steps = read_steps_csv(tmp_csv)
+                if not steps:
+                    sys.exit("시나리오 생성 실패")
+
+                # 3) TID→CVE 역매핑으로 후보 CVE 모으고 EPSS 조회 (이미 조회한 CVE는 재사용)
+                all_candidates = []
+                for s in steps:
+                    nm = s["name"].lower()
+                    tid = name2tid.get(nm, "")
+                    all_candidates.extend(step_cves(hier, tid, CVE_FALLBACK))
+
+                missing_cves = [c for c in all_candidates if c not in epss_cache]
+                record_cache("epss", hits=len(all_candidates) - len(missing_cves), misses=len(missing_cves))
+                if missing_cves:
+                    failed = ()
+                    if EPSS_MODE:
+                        from epss_history import epss_scores
+                        fetched = epss_scores(missing_cves, mode=EPSS_MODE, day=EPSS_AS_OF)
+                    else:
+                        # 실패한 묶음의 CVE는 캐시하지 않음 → 다음 시나리오에서 다시 조회
+                        try:
+                            fetched = batched_lookup(lambda b: fetch_epss_bulk(b, raise_errors=True), missing_cves)
+                        except EpssLookupError as e:
+                            fetched, failed = e.partial, set(e.failed)
+                    for c in missing_cves:
+                        if c not in failed:
+                            epss_cache[c] = fetched.get(c)
+                attach_epss(hier, {c: v for c, v in epss_cache.items() if v}, pick_key(CVE_PICK, intel))
+                picks = [lookup_cve(hier, name2tid.get(s["name"].lower(), ""), CVE_FALLBACK) for s in steps]
+
+            # 4) 단계별 점수
+            rows = []
+            for s, (best_cve, best_epss, best_pct, best_date, via) in zip(steps, picks):
+                nm = s["name"].lower()
+                tid = name2tid.get(nm, "")
+
+                if RAND_LI:
+                    curL = random.randint(1,5)
+                    curI = random.randint(1,5)
+                else:
+                    curL, curI = L, I
+
+                E = epss_to_E(best_epss if best_cve else 0.0)
+                pii_risk = E * (5 - curL) * curI
+                V_norm = max(0.0, min(1.0, (5 - curL) / 4))
+                I_norm = max(0.0, min(1.0, curI / 5))
+                norm = (best_epss if best_cve else 0.0) * V_norm * I_norm
+
+                rows.append({
+                    "step": s["step"],
+                    "phase": s["phase"],
+                    "technique": s["name"],
+                    "TID": tid,
+                    "CVE": best_cve or "",
+                    "CVE_via": via,
+                    "EPSS": round(best_epss,4) if best_cve else "",
+                    "EPSS_percentile(%)": best_pct if best_cve else "",
+                    "EPSS_date": best_date if best_cve else "",
+                    "L": curL, "I": curI, "E(1~5)": E,
+                    "PII_Risk(0~125)": pii_risk,
+                    "NormRisk(0~1)": round(norm,6)
+                })
+                if intel:
+                    rows[-1].update(intel_cols(intel, best_cve))
+            record_steps(rows)
+
+            undetected = None
+            if detect_cov is not None:
+                undetected = apply_detection(rows, detect_cov, discount=DETECT_DISCOUNT)
+
+            df = pd.DataFrame(rows)
+
+            # 5) 요약(연쇄 결합)
+            series_norm = 1.0
+            for r in df["NormRisk(0~1)"]:
+                r = float(r) if r != "" else 0.0
+                series_norm *= (1.0 - r)
+            series_norm = 1.0 - series_norm
+
+            stop = False
+            if sampler:
+                sampler.observe([s["name"] for s in steps], series_norm, start=start_disp)
+                stop, why = sampler.done()
+
+            if writer:
+                from result_writer import summarize_rows
+                scenario_id = f"random-{n}"
+                writer.add_steps(scenario_id, rows)
+                writer.add_summary(summarize_rows(rows, scenario=scenario_id, start=start_disp))
+
+            # 이력 저장 (risk_store.py, pyarrow 필요) — 모아서 한 번에
+            if RECORD_HISTORY:
+                history.append((rows, start_disp, datetime.now()))
+                if len(history) >= HISTORY_BATCH:
+                    RECORD_HISTORY = flush_history(history)
+
+            if N_SCENARIOS > 1:
+                print(f"[{n}/{N_SCENARIOS}] {start_disp} → Series Norm {round(series_norm,6)}")
+                if stop:
+                    print(f"[sampling] {n}개에서 중단: {why}")
+                    break
+                continue
+
+            print(f'\n[랜덤 시작 기술] {start_disp}')
+            print("\n[단계별 결과]")
+            show_cols = ["step","phase","technique","TID","CVE","EPSS","E(1~5)","L","I","PII_Risk(0~125)","NormRisk(0~1)"]
+            if CVE_FALLBACK:
+                show_cols.append("CVE_via")
+            if intel:
+                show_cols += ["CVSS", "KEV"]
+            if undetected is not None:
+                show_cols.append("Detect(0~1)")
+            print(df[show_cols].to_string(index=False))
+
+            print("\n[시나리오 요약]")
+            print(f"- Steps: {len(df)}")
+            print(f"- Sum PII_Risk(0~125): {int(df['PII_Risk(0~125)'].sum())}")
+            print(f"- Avg Norm(0~1): {round(float(df['NormRisk(0~1)'].replace('',0).astype(float).mean()),6)}")
+            print(f"- Max Norm(0~1): {round(float(df['NormRisk(0~1)'].replace('',0).astype(float).max()),6)}")
+            print(f"- Series Norm(0~1): {round(series_norm,6)}  (~ {round(series_norm*100,2)}%)")
+            if undetected:
+                print(f"- Undetected steps: {len(undetected)} ({', '.join(undetected)})")
+        if sampler and N_SCENARIOS > 1:
+            print(f"[sampling] {sampler.report()}")
+    finally:
+        if pooled is not None:
+            pooled.close()
+        if writer:
+            writer.close()
+            print(f"[+] 결과 저장: {RESULT_DIR}")
+        if RECORD_HISTORY:
+            flush_history(history)
+
+        # 임시 CSV / 임시 인덱스 삭제
+        for tmp in (tmp_csv, ix_temp):
+            try:
+                if tmp:
+                    os.remove(tmp)
+            except Exception:
+                pass
 
 if __name__ == "__main__":
     main()
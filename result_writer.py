@@ -0,0 +1,151 @@
+# result_writer.py — 시나리오 단계/요약 결과 스트리밍 저장 (Parquet row group + 선택적 JSONL)
+import json
+from pathlib import Path
+
+# =========================
+# 컬럼 정의 (화면 출력용 컬럼명 → 저장용 컬럼명, 타입)
+# =========================
+STEP_COLUMNS = [
+    ("scenario",           "scenario",        "string"),
+    ("step",               "step",            "int64"),
+    ("phase",              "phase",           "string"),
+    ("technique",          "technique",       "string"),
+    ("TID",                "TID",             "string"),
+    ("CVE",                "CVE",             "string"),
+    ("EPSS",               "EPSS",            "float64"),
+    ("EPSS_percentile(%)", "EPSS_percentile", "float64"),
+    ("EPSS_date",          "EPSS_date",       "string"),
+    ("E(1~5)",             "E",               "int64"),
+    ("L",                  "L",               "int64"),
+    ("I",                  "I",               "int64"),
+    ("PII_Risk(0~125)",    "PII_Risk",        "int64"),
+    ("NormRisk(0~1)",      "NormRisk",        "float64"),
+    # 설정에 따라 붙는 컬럼 (CVE_FALLBACK / CVE_PICK / DATA_SOURCES_FILE) — 행에 없으면 null
+    ("CVE_via",            "CVE_via",         "string"),
+    ("CVSS",               "CVSS",            "float64"),
+    ("KEV",                "KEV",             "string"),
+    ("Detect(0~1)",        "Detect",          "float64"),
+]
+SUMMARY_COLUMNS = [
+    ("scenario",    "scenario",    "string"),
+    ("start",       "start",       "string"),
+    ("techniques",  "techniques",  "string"),
+    ("steps",       "steps",       "int64"),
+    ("sum_pii",     "sum_pii",     "int64"),
+    ("avg_norm",    "avg_norm",    "float64"),
+    ("max_norm",    "max_norm",    "float64"),
+    ("series_norm", "series_norm", "float64"),
+]
+
+def _cast(v, kind):
+    # 화면용 행은 값이 없으면 "" 로 채우므로 저장 시에는 null 로 바꿈
+    if v is None or (isinstance(v, str) and v.strip() == ""):
+        return None
+    try:
+        if kind == "int64":
+            return int(v)
+        if kind == "float64":
+            return float(v)
+    except (TypeError, ValueError):
+        return None
+    return str(v)
+
+def normalize_row(row, columns):
+    return {dst: _cast(row.get(src), kind) for src, dst, kind in columns}
+
+# =========================
+# 요약(연쇄 결합)
+# =========================
+def summarize_rows(rows, scenario="", start=""):
+    """단계별 행 리스트 → 요약 dict (S_* / runner의 [시나리오 요약]과 같은 계산)"""
+    norms = [float(r["NormRisk(0~1)"]) if str(r.get("NormRisk(0~1)", "")) != "" else 0.0 for r in rows]
+    series = 1.0
+    for x in norms:
+        series *= (1.0 - x)
+    return {
+        "scenario": scenario,
+        "start": start,
+        "techniques": " → ".join(str(r.get("technique", "")) for r in rows),
+        "steps": len(rows),
+        "sum_pii": int(sum(int(r.get("PII_Risk(0~125)", 0) or 0) for r in rows)),
+        "avg_norm": round(sum(norms) / len(norms), 6) if norms else 0.0,
+        "max_norm": round(max(norms), 6) if norms else 0.0,
+        "series_norm": round(1.0 - series, 6),
+    }
+
+# =========================
+# 스트리밍 writer
+# =========================
+class ResultWriter:
+    """
+    out_dir/steps.parquet, out_dir/summary.parquet 에 row group 단위로 이어 쓰기
+    - 버퍼가 row_group_size 행이 되면 바로 row group 하나를 내보냄 → 시나리오 수와 무관하게 메모리 일정
+    - jsonl=True 면 steps.jsonl / summary.jsonl 에도 행 단위로 즉시 기록
+    with ResultWriter(...) as w: 형태로 쓰면 종료 시 남은 버퍼까지 flush
+    """
+
+    def __init__(self, out_dir, row_group_size=10000, jsonl=False, parquet=True):
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.row_group_size = max(1, int(row_group_size))
+        self.parquet = parquet
+        self._buf = {"steps": [], "summary": []}
+        self._pq = {}
+        self._jsonl = {}
+        if jsonl:
+            for kind in ("steps", "summary"):
+                self._jsonl[kind] = open(self.out_dir / f"{kind}.jsonl", "w", encoding="utf-8")
+        if parquet:
+            import pyarrow  # noqa: F401  (없으면 여기서 바로 ImportError)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_steps(self, scenario, rows):
+        for r in rows:
+            self._add("steps", normalize_row(dict(r, scenario=scenario), STEP_COLUMNS))
+
+    def add_summary(self, summary):
+        self._add("summary", normalize_row(summary, SUMMARY_COLUMNS))
+
+    def _add(self, kind, rec):
+        if kind in self._jsonl:
+            self._jsonl[kind].write(json.dumps(rec, ensure_ascii=False) + "\n")
+        if not self.parquet:
+            return
+        buf = self._buf[kind]
+        buf.append(rec)
+        if len(buf) >= self.row_group_size:
+            self._flush(kind)
+
+    def _schema(self, kind):
+        import pyarrow as pa
+        cols = STEP_COLUMNS if kind == "steps" else SUMMARY_COLUMNS
+        return pa.schema([(dst, getattr(pa, kind_)()) for _, dst, kind_ in cols])
+
+    def _flush(self, kind):
+        buf = self._buf[kind]
+        if not buf:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = self._schema(kind)
+        table = pa.Table.from_pylist(buf, schema=schema)
+        if kind not in self._pq:
+            self._pq[kind] = pq.ParquetWriter(str(self.out_dir / f"{kind}.parquet"), schema, compression="zstd")
+        self._pq[kind].write_table(table)
+        buf.clear()
+
+    def close(self):
+        for kind in ("steps", "summary"):
+            self._flush(kind)
+            if kind in self._pq:
+                self._pq[kind].close()
+            if kind in self._jsonl:
+                self._jsonl[kind].close()
+        self._pq.clear()
+        self._jsonl.clear()
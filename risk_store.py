@@ -0,0 +1,176 @@
+# risk_store.py — 실행 결과 이력 저장소 (append-only, run_date/scenario 파티션)
+#
+# 레이아웃:
+#   <root>/steps/run_date=YYYY-MM-DD/scenario=<id>/part-<HHMMSS>-<uuid>.parquet
+#   <root>/summary/run_date=YYYY-MM-DD/scenario=<id>/part-<HHMMSS>-<uuid>.parquet
+# 한 번 쓴 파일은 수정하지 않고 실행마다 새 part 파일만 추가.
+# 조회는 디렉터리 이름(run_date, scenario)으로 먼저 파티션을 걸러서 필요한 파일만 읽음.
+#
+# 사용 예)
+#   python risk_store.py series S_2 --days 90
+#   python risk_store.py risers --days 7 --top 20
+import argparse, os, re, uuid
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from result_writer import STEP_COLUMNS, SUMMARY_COLUMNS, normalize_row, summarize_rows
+
+DEFAULT_ROOT = Path(os.environ.get("RISK_STORE_DIR") or Path(__file__).resolve().parent / "risk_history")
+
+def _root(root):
+    return Path(root) if root else DEFAULT_ROOT
+
+def _safe_part(v):
+    # 파티션 디렉터리 이름으로 쓸 수 있게 정리
+    return re.sub(r"[^0-9A-Za-z_.\-]+", "_", str(v)) or "_"
+
+# =========================
+# 쓰기
+# =========================
+def record_run(rows, scenario, start="", root=None, run_ts=None):
+    """
+    한 시나리오 실행 결과(단계별 행)를 이력에 추가
+    rows: S_* / runner가 만드는 단계별 행 dict 리스트
+    반환: 저장한 summary dict
+    """
+    return record_runs([(rows, start, run_ts)], scenario, root=root)[0]
+
+def record_runs(runs, scenario, root=None):
+    """
+    여러 실행 결과를 한 번에 추가 — 날짜 파티션마다 종류별 part 파일 하나
+    (시나리오를 많이 돌리는 러너가 실행마다 작은 파일을 쌓지 않도록)
+    runs: [(rows, start, run_ts or None), ...]
+    반환: summary dict 목록 (runs 순서)
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    now = datetime.now()
+    by_date = {}
+    summaries = []
+    for rows, start, run_ts in runs:
+        run_ts = run_ts or now
+        ts = run_ts.isoformat(timespec="seconds")
+        summary = summarize_rows(rows, scenario=scenario, start=start)
+        summaries.append(summary)
+        steps, sums = by_date.setdefault(run_ts.date().isoformat(), ([], []))
+        steps.extend(dict(normalize_row(dict(r, scenario=scenario), STEP_COLUMNS), run_ts=ts) for r in rows)
+        sums.append(dict(normalize_row(summary, SUMMARY_COLUMNS), run_ts=ts))
+
+    fname = f"part-{now:%H%M%S}-{uuid.uuid4().hex[:8]}.parquet"
+    for run_date, (step_recs, summary_recs) in by_date.items():
+        for kind, cols, recs in (("steps", STEP_COLUMNS, step_recs), ("summary", SUMMARY_COLUMNS, summary_recs)):
+            if not recs:
+                continue
+            schema = pa.schema([(dst, getattr(pa, t)()) for _, dst, t in cols] + [("run_ts", pa.string())])
+            part_dir = _root(root) / kind / f"run_date={run_date}" / f"scenario={_safe_part(scenario)}"
+            part_dir.mkdir(parents=True, exist_ok=True)
+            pq.write_table(pa.Table.from_pylist(recs, schema=schema), str(part_dir / fname))
+    return summaries
+
+# =========================
+# 파티션 선택
+# =========================
+def partition_files(kind, start_date=None, end_date=None, scenario=None, root=None):
+    """날짜 범위/시나리오에 해당하는 part 파일만 (디렉터리 이름만 보고 고름)"""
+    base = _root(root) / kind
+    if not base.exists():
+        return []
+    want_scn = f"scenario={_safe_part(scenario)}" if scenario else None
+    files = []
+    for d in sorted(os.listdir(base)):
+        if not d.startswith("run_date="):
+            continue
+        try:
+            dd = date.fromisoformat(d.split("=", 1)[1])
+        except ValueError:
+            continue
+        if (start_date and dd < start_date) or (end_date and dd > end_date):
+            continue
+        for s in sorted(os.listdir(base / d)):
+            if want_scn and s != want_scn:
+                continue
+            files.extend(sorted(str(p) for p in (base / d / s).glob("part-*.parquet")))
+    return files
+
+def _read(files, columns):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    if not files:
+        return None
+    return pa.concat_tables([pq.read_table(f, columns=columns) for f in files]).to_pandas()
+
+# =========================
+# 조회
+# =========================
+def series_history(scenario, days=90, root=None, today=None):
+    """시나리오의 Series Norm 이력 → [(run_ts, series_norm), ...] (시간순)"""
+    today = today or date.today()
+    files = partition_files("summary", today - timedelta(days=days), today, scenario=scenario, root=root)
+    df = _read(files, ["run_ts", "series_norm"])
+    if df is None:
+        return []
+    df = df.sort_values("run_ts")
+    return list(zip(df["run_ts"], df["series_norm"].astype(float)))
+
+def top_risers(days=7, top=20, scenario=None, root=None, today=None):
+    """
+    기간 안에서 NormRisk가 가장 많이 오른 기술
+    기술(TID)별로 기간 내 첫 날 평균 NormRisk 대비 마지막 날 평균 NormRisk 증가폭
+    반환: [(TID, technique, first, last, delta), ...] (delta 내림차순)
+    """
+    today = today or date.today()
+    files = partition_files("steps", today - timedelta(days=days), today, scenario=scenario, root=root)
+    df = _read(files, ["run_ts", "TID", "technique", "NormRisk"])
+    if df is None or df.empty:
+        return []
+    df = df[df["TID"].notna()].copy()
+    df["run_date"] = df["run_ts"].str.slice(0, 10)
+    df["NormRisk"] = df["NormRisk"].fillna(0.0).astype(float)
+    daily = df.groupby(["TID", "run_date"], as_index=False).agg(NormRisk=("NormRisk", "mean"), technique=("technique", "last"))
+    daily = daily.sort_values(["TID", "run_date"])
+    g = daily.groupby("TID")
+    res = g.agg(technique=("technique", "last"), first=("NormRisk", "first"), last=("NormRisk", "last"), n=("run_date", "count"))
+    res = res[res["n"] > 1]
+    res["delta"] = res["last"] - res["first"]
+    res = res[res["delta"] > 0].sort_values("delta", ascending=False).head(top)
+    return [(tid, r["technique"], round(float(r["first"]), 6), round(float(r["last"]), 6), round(float(r["delta"]), 6))
+            for tid, r in res.iterrows()]
+
+# =========================
+# 메인
+# =========================
+def main():
+    p = argparse.ArgumentParser(description="시나리오 리스크 이력 조회")
+    p.add_argument("--root", help="이력 저장소 경로 (기본: RISK_STORE_DIR 또는 스크립트 폴더/risk_history)")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    s1 = sub.add_parser("series", help="시나리오의 Series Norm 이력")
+    s1.add_argument("scenario", help="시나리오 ID (예: S_2, manual, random)")
+    s1.add_argument("--days", type=int, default=90)
+
+    s2 = sub.add_parser("risers", help="기간 내 NormRisk가 가장 많이 오른 기술")
+    s2.add_argument("--days", type=int, default=7)
+    s2.add_argument("--top", type=int, default=20)
+    s2.add_argument("--scenario", help="특정 시나리오로 한정")
+    args = p.parse_args()
+
+    if args.cmd == "series":
+        hist = series_history(args.scenario, days=args.days, root=args.root)
+        if not hist:
+            print("이력 없음.")
+            return
+        print(f"=== {args.scenario} Series Norm (최근 {args.days}일) ===")
+        for ts, v in hist:
+            print(f"{ts}  {v:.6f}")
+    else:
+        rows = top_risers(days=args.days, top=args.top, scenario=args.scenario, root=args.root)
+        if not rows:
+            print("비교할 이력 없음 (기간 내 2일 이상 기록된 기술이 필요).")
+            return
+        print(f"=== NormRisk 상승 상위 (최근 {args.days}일) ===")
+        for tid, nm, first, last, delta in rows:
+            print(f"{tid:<12} {first:.6f} → {last:.6f}  (+{delta:.6f})  {nm}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# run_metrics.py — 실행 지표 (EPSS 호출·캐시 적중·단계별 시간) → Prometheus textfile collector 파일
+#
+# fetch_epss_bulk()는 예외를 전부 삼키고 {}를 돌려줘서 API가 얼마나 실패하는지 보이지 않았고,
+# 번들 로드 시간 / 조회 실패(캐시 미스, CVE 없는 단계)도 남지 않았음. 여기서는 프로세스 안에 카운터와
+# 히스토그램을 모아 두고, 실행이 끝날 때(atexit) node_exporter textfile collector 폴더에
+# scenario_<스크립트>.prom 으로 씀 (임시 파일 → os.replace, 수집 중에 반쯤 쓴 파일을 읽지 않음).
+#
+# 지표 (이름 앞에 scenario_, 모든 시계열에 script 라벨)
+#   epss_requests_total{source, outcome}     outcome = ok | empty | error  (source = api | history)
+#   epss_errors_total{source, error}         예외 종류별
+#   epss_request_seconds{source}             히스토그램
+#   epss_batch_size{source}                  히스토그램 (요청 CVE 수)
+#   epss_cves_requested_total / epss_cves_returned_total{source}
+#   cache_requests_total{cache, result}      result = hit | miss
+#   stage_seconds{stage}                     히스토그램 (bundle_load, mapping_load, epss, scoring, ...)
+#   steps_scored_total / steps_no_cve_total  채점한 단계 / 대표 CVE가 없는 단계
+#   run_duration_seconds, last_run_timestamp_seconds
+#
+# 출력 폴더: 환경변수 SCENARIO_METRICS_DIR (예: /var/lib/node_exporter/textfile_collector), 없으면 쓰지 않음
+#
+# 사용 예)
+#   SCENARIO_METRICS_DIR=/var/lib/node_exporter/textfile_collector python S_1.py
+#   python run_metrics.py show
+import argparse, atexit, os, re, sys, time
+from contextlib import contextmanager
+
+METRICS_DIR = os.environ.get("SCENARIO_METRICS_DIR")
+PREFIX = "scenario_"
+
+BUCKETS = {
+    "epss_request_seconds": (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0),
+    "epss_batch_size": (1, 5, 10, 25, 50, 100, 250, 1000, 10000),
+    "stage_seconds": (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+}
+HELP = {
+    "epss_requests_total": ("counter", "EPSS 조회 호출 수 (outcome: ok/empty/error)"),
+    "epss_errors_total": ("counter", "EPSS 조회 실패 수 (예외 종류별)"),
+    "epss_request_seconds": ("histogram", "EPSS 조회 한 번 걸린 시간"),
+    "epss_batch_size": ("histogram", "EPSS 조회 한 번에 요청한 CVE 수"),
+    "epss_cves_requested_total": ("counter", "EPSS 조회로 요청한 CVE 수"),
+    "epss_cves_returned_total": ("counter", "EPSS 조회로 받은 CVE 수"),
+    "cache_requests_total": ("counter", "캐시 조회 수 (result: hit/miss)"),
+    "stage_seconds": ("histogram", "실행 단계별 걸린 시간"),
+    "steps_scored_total": ("counter", "채점한 시나리오 단계 수"),
+    "steps_no_cve_total": ("counter", "대표 CVE 없이 채점한 단계 수"),
+    "run_duration_seconds": ("gauge", "프로세스 시작(지표 모듈 로드)부터 기록까지 걸린 시간"),
+    "last_run_timestamp_seconds": ("gauge", "마지막 기록 시각 (unix time)"),
+}
+
+_counters = {}  # {(이름, 라벨 tuple): 값}
+_hists = {}     # {(이름, 라벨 tuple): [버킷별 개수..., 합, 개수]}
+_script = None
+_t0 = time.time()
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def set_script(name):
+    """script 라벨 / 파일 이름 (기본: 실행한 파일 이름)"""
+    global _script
+    _script = name
+
+def script_name():
+    name = _script or os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0]
+    return re.sub(r"[^A-Za-z0-9_]+", "_", name).strip("_") or "python"
+
+# =========================
+# 기록
+# =========================
+def inc(name, value=1, **labels):
+    key = (name, _labels(labels))
+    _counters[key] = _counters.get(key, 0) + value
+
+def observe(name, value, **labels):
+    bounds = BUCKETS[name]
+    key = (name, _labels(labels))
+    h = _hists.get(key)
+    if h is None:
+        h = _hists[key] = [0] * len(bounds) + [0.0, 0]
+    for k, b in enumerate(bounds):
+        if value <= b:
+            h[k] += 1
+    h[-2] += value
+    h[-1] += 1
+
+@contextmanager
+def stage(name):
+    """with stage("bundle_load"): ... → stage_seconds{stage=...}"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("stage_seconds", time.perf_counter() - t0, stage=name)
+
+def record_epss(source, n_cves, seconds, n_rows=0, error=None):
+    """EPSS 조회 한 번: 요청 CVE 수, 걸린 시간, 받은 CVE 수, 실패면 예외"""
+    outcome = "error" if error is not None else ("empty" if not n_rows else "ok")
+    inc("epss_requests_total", source=source, outcome=outcome)
+    if error is not None:
+        inc("epss_errors_total", source=source, error=type(error).__name__)
+    observe("epss_request_seconds", seconds, source=source)
+    observe("epss_batch_size", n_cves, source=source)
+    inc("epss_cves_requested_total", n_cves, source=source)
+    inc("epss_cves_returned_total", n_rows, source=source)
+
+def record_cache(cache, hits=0, misses=0):
+    if hits:
+        inc("cache_requests_total", hits, cache=cache, result="hit")
+    if misses:
+        inc("cache_requests_total", misses, cache=cache, result="miss")
+
+def record_steps(rows):
+    """채점 결과 행(CVE 컬럼) → 단계 수 / CVE 없는 단계 수"""
+    inc("steps_scored_total", len(rows))
+    inc("steps_no_cve_total", sum(1 for r in rows if not r.get("CVE")))
+
+# =========================
+# 출력
+# =========================
+def _fmt_labels(pairs):
+    if not pairs:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+def _num(v):
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+def render():
+    """지금까지 모은 지표 → textfile collector 형식 문자열"""
+    base = (("script", script_name()),)
+    now = time.time()
+    gauges = {("run_duration_seconds", ()): now - _t0, ("last_run_timestamp_seconds", ()): now}
+
+    by_name = {}
+    for (name, labels), v in list(_counters.items()) + list(gauges.items()):
+        by_name.setdefault(name, []).append((labels, v))
+    for (name, labels), h in _hists.items():
+        by_name.setdefault(name, []).append((labels, h))
+
+    lines = []
+    for name in sorted(by_name):
+        kind, text = HELP.get(name, ("untyped", name))
+        full = PREFIX + name
+        lines.append(f"# HELP {full} {text}")
+        lines.append(f"# TYPE {full} {kind}")
+        for labels, v in sorted(by_name[name], key=lambda x: x[0]):
+            lab = base + labels
+            if kind != "histogram":
+                lines.append(f"{full}{_fmt_labels(lab)} {_num(v)}")
+                continue
+            for b, c in zip(BUCKETS[name], v):
+                lines.append(f"{full}_bucket{_fmt_labels(lab + (('le', _num(b)),))} {c}")
+            lines.append(f"{full}_bucket{_fmt_labels(lab + (('le', '+Inf'),))} {v[-1]}")
+            lines.append(f"{full}_sum{_fmt_labels(lab)} {_num(v[-2])}")
+            lines.append(f"{full}_count{_fmt_labels(lab)} {v[-1]}")
+    return "\n".join(lines) + "\n"
+
+def write_textfile(out_dir=None):
+    """<폴더>/scenario_<스크립트>.prom 으로 저장 → 경로, 폴더가 없으면 None"""
+    out_dir = out_dir or METRICS_DIR
+    if not out_dir:
+        return None
+    path = os.path.join(out_dir, f"{PREFIX}{script_name()}.prom")
+    tmp = path + ".tmp"  # collector는 *.prom만 읽음
+    try:
+        os.makedirs(out_dir, exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(render())
+        os.replace(tmp, path)
+    except OSError:
+        return None  # 지표를 못 쓴다고 실행 결과를 망치지는 않음
+    return path
+
+@atexit.register
+def _write_at_exit():
+    if _counters or _hists:
+        write_textfile()
+
+# =========================
+# 메인
+# =========================
+def main():
+    p = argparse.ArgumentParser(description="실행 지표 (Prometheus textfile collector)")
+    p.add_argument("--dir", default=METRICS_DIR, help="지표 폴더 (기본: SCENARIO_METRICS_DIR)")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("show", help="폴더의 scenario_*.prom 출력")
+    args = p.parse_args()
+
+    if not args.dir or not os.path.isdir(args.dir):
+        print("지표 폴더 없음. SCENARIO_METRICS_DIR 또는 --dir을 지정하세요.")
+        return
+    files = sorted(f for f in os.listdir(args.dir) if f.startswith(PREFIX) and f.endswith(".prom"))
+    if not files:
+        print("기록된 지표 없음.")
+    for f in files:
+        print(f"== {f}")
+        with open(os.path.join(args.dir, f), "r", encoding="utf-8") as fh:
+            print(fh.read(), end="")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+# sensitivity.py — 시나리오 리스크 what-if 민감도 분석 (단일/쌍 단계 변경을 한 번에 배열 계산)
+#
+# 단계별 NormRisk = EPSS * clip((5 - L) / 4) * clip(I / 5)
+# Series Norm     = 1 - prod(1 - NormRisk)
+# 각 단계에 대해 아래 변경을 가정했을 때 Series Norm이 얼마나 줄어드는지 계산
+#   L+dL        : 방어 수준 향상
+#   I-dI        : 영향도 감소
+#   EPSS×scale  : 대표 CVE 패치 등으로 EPSS 감소 (기본 scale=0 → 0으로)
+# 시나리오 포트폴리오를 (S, N) 패딩 배열로 만들어 모든 단일/쌍 변경을 한 번에 평가
+#
+# 사용 예)
+#   python sensitivity.py --steps results/run1/steps.parquet
+#   python sensitivity.py --store S_2
+import argparse, json
+from pathlib import Path
+
+import numpy as np
+
+# =========================
+# 입력 → 배열
+# =========================
+def _num(v, default=0.0):
+    try:
+        return float(v) if str(v).strip() != "" else default
+    except (TypeError, ValueError):
+        return default
+
+def scenario_arrays(rows_by_scenario):
+    """
+    {scenario_id: [단계 행, ...]} → 패딩 배열
+    행은 화면용(EPSS, L, I, technique) / 저장용(ResultWriter, risk_store) 어느 쪽이든 가능
+    반환: ids, techs(list[list]), epss, L, I, mask  — 배열은 모두 (S, N)
+    """
+    ids = list(rows_by_scenario.keys())
+    n = max((len(v) for v in rows_by_scenario.values()), default=0)
+    S = len(ids)
+    epss = np.zeros((S, n))
+    L = np.full((S, n), 5.0)  # 패딩 단계는 L=5 → NormRisk 0
+    I = np.ones((S, n))
+    mask = np.zeros((S, n), dtype=bool)
+    techs = []
+    for s, sid in enumerate(ids):
+        rows = rows_by_scenario[sid]
+        techs.append([str(r.get("technique", "")) for r in rows])
+        for j, r in enumerate(rows):
+            epss[s, j] = _num(r.get("EPSS"))
+            L[s, j] = _num(r.get("L"), 3)
+            I[s, j] = _num(r.get("I"), 4)
+            mask[s, j] = True
+    return ids, techs, epss, L, I, mask
+
+def norm_risk(epss, L, I):
+    V_norm = np.clip((5 - L) / 4, 0.0, 1.0)
+    I_norm = np.clip(I / 5, 0.0, 1.0)
+    return epss * V_norm * I_norm
+
+def series_norm(norm, axis=-1):
+    return 1.0 - np.prod(1.0 - norm, axis=axis)
+
+# =========================
+# 변경안
+# =========================
+def perturbation_labels(dL=1, dI=1, epss_scale=0.0):
+    return [f"L+{dL}", f"I-{dI}", f"EPSS×{epss_scale:g}"]
+
+def perturbed_norm(epss, L, I, dL=1, dI=1, epss_scale=0.0):
+    """(S, N) → (S, N, K) 변경 후 단계별 NormRisk (K = 변경 종류)"""
+    return np.stack([
+        norm_risk(epss, np.minimum(L + dL, 5), I),
+        norm_risk(epss, L, np.maximum(I - dI, 1)),
+        norm_risk(epss * epss_scale, L, I),
+    ], axis=-1)
+
+# =========================
+# 단일/쌍 변경 평가
+# =========================
+def single_step_effects(norm, pnorm):
+    """
+    norm: (S, N), pnorm: (S, N, K)
+    반환: base (S,), single (S, N, K) — 단계 j에 변경 k만 적용했을 때 Series Norm
+    (1 - norm_j)로 나누지 않고 prefix/suffix 곱으로 '나머지 단계 생존확률'을 구함 → norm=1이어도 안전
+    """
+    surv = 1.0 - norm
+    S, N = surv.shape
+    ones = np.ones((S, 1))
+    prefix = np.cumprod(np.hstack([ones, surv]), axis=1)[:, :N]
+    suffix = np.cumprod(np.hstack([surv, ones])[:, ::-1], axis=1)[:, ::-1][:, 1:]
+    excl = prefix * suffix                                  # (S, N)
+    base = 1.0 - np.prod(surv, axis=1)
+    single = 1.0 - excl[:, :, None] * (1.0 - pnorm)
+    return base, single
+
+def pairwise_effects(norm, pnorm):
+    """
+    반환: (S, N, N, K, K) — 단계 j에 변경 a, 단계 k에 변경 b를 같이 적용했을 때 Series Norm
+    j >= k 칸은 의미 없음 (rank_pairs에서 걸러냄)
+    """
+    surv = 1.0 - norm
+    S, N = surv.shape
+    idx = np.arange(N)
+    drop = (idx[None, :, None] == idx[None, None, :])                       # (1, N, N): i == j
+    drop = drop[:, :, None, :] | drop[:, None, :, :]                        # (1, N(j), N(k), N(i))
+    excl2 = np.prod(np.where(drop, 1.0, surv[:, None, None, :]), axis=-1)   # (S, N, N)
+    ps = 1.0 - pnorm
+    return 1.0 - excl2[:, :, :, None, None] * ps[:, :, None, :, None] * ps[:, None, :, None, :]
+
+# =========================
+# 순위
+# =========================
+def rank_steps(ids, techs, base, single, mask, labels):
+    """
+    시나리오별 단계 순위: 그 단계에서 가능한 변경 중 가장 큰 Series Norm 감소폭(한계 효과) 기준
+    반환: {scenario: [(step, technique, best_change, new_series, reduction), ...]}
+    """
+    red = base[:, None, None] - single                  # (S, N, K)
+    red = np.where(mask[:, :, None], red, -np.inf)
+    best_k = red.argmax(axis=-1)
+    best_r = red.max(axis=-1)
+    out = {}
+    for s, sid in enumerate(ids):
+        order = [j for j in np.argsort(-best_r[s], kind="stable") if mask[s, j]]
+        out[sid] = [(j + 1, techs[s][j], labels[best_k[s, j]],
+                     round(float(single[s, j, best_k[s, j]]), 6), round(float(best_r[s, j]), 6)) for j in order]
+    return out
+
+def rank_pairs(ids, techs, base, pair, mask, labels, top=5):
+    """시나리오별 감소폭이 가장 큰 (단계, 변경) 쌍 상위 top개"""
+    S, N = mask.shape
+    valid = np.triu(np.ones((N, N), dtype=bool), k=1)[None] & mask[:, :, None] & mask[:, None, :]
+    red = base[:, None, None, None, None] - pair
+    red = np.where(valid[:, :, :, None, None], red, -np.inf)
+    out = {}
+    for s, sid in enumerate(ids):
+        flat = red[s].ravel()
+        n_valid = int(np.isfinite(flat).sum())
+        picks = np.argsort(-flat, kind="stable")[:min(top, n_valid)]
+        res = []
+        for f in picks:
+            j, k, a, b = np.unravel_index(f, red[s].shape)
+            res.append(((j + 1, techs[s][j], labels[a]), (k + 1, techs[s][k], labels[b]),
+                        round(float(pair[s, j, k, a, b]), 6), round(float(flat[f]), 6)))
+        out[sid] = res
+    return out
+
+def portfolio_techniques(techs, base, single, mask, labels, top=20):
+    """포트폴리오 전체에서 기술·변경별 Series Norm 감소 합계 상위"""
+    red = base[:, None, None] - single
+    agg = {}
+    S, N, K = red.shape
+    for s in range(S):
+        for j in range(N):
+            if not mask[s, j]:
+                continue
+            for k in range(K):
+                key = (techs[s][j], labels[k])
+                agg[key] = agg.get(key, 0.0) + float(red[s, j, k])
+    ranked = sorted(agg.items(), key=lambda kv: -kv[1])[:top]
+    return [(nm, lab, round(v, 6)) for (nm, lab), v in ranked]
+
+def analyze(rows_by_scenario, dL=1, dI=1, epss_scale=0.0, pairs=True, top_pairs=5):
+    """포트폴리오 민감도 분석 한 번에 실행 → dict"""
+    ids, techs, epss, L, I, mask = scenario_arrays(rows_by_scenario)
+    labels = perturbation_labels(dL, dI, epss_scale)
+    norm = np.where(mask, norm_risk(epss, L, I), 0.0)
+    pnorm = np.where(mask[:, :, None], perturbed_norm(epss, L, I, dL, dI, epss_scale), 0.0)
+    base, single = single_step_effects(norm, pnorm)
+    res = {
+        "base": dict(zip(ids, np.round(base, 6).tolist())),
+        "steps": rank_steps(ids, techs, base, single, mask, labels),
+        "portfolio": portfolio_techniques(techs, base, single, mask, labels),
+    }
+    if pairs:
+        res["pairs"] = rank_pairs(ids, techs, base, pairwise_effects(norm, pnorm), mask, labels, top=top_pairs)
+    return res
+
+def print_report(res, top=5):
+    for sid, base in res["base"].items():
+        print(f"\n[{sid}] Series Norm {base:.6f}")
+        for step, nm, lab, new, red in res["steps"][sid][:top]:
+            print(f"  step {step:02d} {lab:<9} → {new:.6f}  (-{red:.6f})  {nm}")
+        for (j, nj, la), (k, nk, lb), new, red in res.get("pairs", {}).get(sid, [])[:top]:
+            print(f"  pair {j:02d}:{la} + {k:02d}:{lb} → {new:.6f}  (-{red:.6f})")
+    if len(res["base"]) > 1:
+        print("\n[포트폴리오] 기술·변경별 Series Norm 감소 합계")
+        for nm, lab, v in res["portfolio"]:
+            print(f"  {v:.6f}  {lab:<9} {nm}")
+
+# =========================
+# 입력 읽기
+# =========================
+def load_steps_file(path):
+    """ResultWriter의 steps.parquet / steps.jsonl → {scenario: [행, ...]} (step 순)"""
+    p = Path(path)
+    if p.suffix == ".jsonl":
+        recs = [json.loads(line) for line in open(p, encoding="utf-8") if line.strip()]
+    else:
+        import pyarrow.parquet as pq
+        recs = pq.read_table(str(p)).to_pylist()
+    out = {}
+    for r in recs:
+        out.setdefault(r.get("scenario") or "scenario", []).append(r)
+    for rows in out.values():
+        rows.sort(key=lambda r: int(r.get("step") or 0))
+    return out
+
+def load_latest_from_store(scenario, days=30, root=None):
+    """risk_store에서 시나리오의 가장 최근 실행 단계 행"""
+    from datetime import date, timedelta
+    from risk_store import partition_files, _read
+
+    files = partition_files("steps", date.today() - timedelta(days=days), date.today(), scenario=scenario, root=root)
+    df = _read(files, None)
+    if df is None or df.empty:
+        return {}
+    df = df[df["run_ts"] == df["run_ts"].max()].sort_values("step")
+    return {scenario: df.to_dict("records")}
+
+def main():
+    p = argparse.ArgumentParser(description="시나리오 리스크 what-if 민감도 분석")
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--steps", help="steps.parquet / steps.jsonl (result_writer 출력)")
+    src.add_argument("--store", help="risk_store의 시나리오 ID (가장 최근 실행 사용)")
+    p.add_argument("--dL", type=int, default=1, help="L 증가량 (기본 1)")
+    p.add_argument("--dI", type=int, default=1, help="I 감소량 (기본 1)")
+    p.add_argument("--epss-scale", type=float, default=0.0, help="EPSS 배율 (기본 0 = 대표 CVE 제거)")
+    p.add_argument("--no-pairs", action="store_true", help="쌍 변경 평가 생략")
+    p.add_argument("--top", type=int, default=5)
+    args = p.parse_args()
+
+    data = load_steps_file(args.steps) if args.steps else load_latest_from_store(args.store)
+    if not data:
+        raise SystemExit("분석할 시나리오가 없음.")
+    res = analyze(data, dL=args.dL, dI=args.dI, epss_scale=args.epss_scale, pairs=not args.no_pairs, top_pairs=args.top)
+    print_report(res, top=args.top)
+
+if __name__ == "__main__":
+    main()
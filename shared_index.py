@@ -0,0 +1,408 @@
+# shared_index.py — 프로세스 풀 worker가 같이 쓰는 메모리 맵(mmap) 인덱스 파일
+#
+# worker마다 번들 JSON을 다시 파싱하고 name2tid / name2phases / mapping_inv / 간선 dict를 새로 만들면
+# worker 수만큼 메모리가 늘어남. 여기서는 채점에 필요한 것을 파일 하나에 평평한 배열로 써 두고,
+# worker는 mmap으로 열어 np.frombuffer 뷰로만 읽음 (복사 없음, OS 페이지 캐시 공유 → worker 시작이 거의 즉시).
+#
+# 파일 구조: b"SCNIDX01" + u64 헤더 길이 + JSON 헤더 + 64바이트 정렬 배열들
+#   기술 표 (이름 사전순 = build_alias_tables 순서)
+#     names / lnames(소문자 정렬) + lname_row, node_tid, phase_idx(phase_index), phase_disp(PHASE_ORDER 위치, -1=unknown)
+#   전이 그래프 CSR (build_alias_tables 그대로 → make_scenario.sample_walks에 바로 넘길 수 있음)
+#     offsets, nbr, w, prob, alias
+#   TID → CVE (TID 사전순, 하위 기술은 부모 바로 뒤에 연속)
+#     tids, tid_ptr, tid_cve
+#   CVE 표 (사전순): cves, epss, pct(percentile %), epss_date(날짜 목록 위치), cvss, kev
+#
+# 사용 예)
+#   python shared_index.py build --epss-mode asof
+#   python shared_index.py info graph_cache/shared-0123abcd.idx
+import argparse, json, mmap, os
+from bisect import bisect_left
+from pathlib import Path
+
+import numpy as np
+
+MAGIC = b"SCNIDX01"
+ALIGN = 64
+INDEX_VERSION = 1
+
+# =========================
+# 파일 형식
+# =========================
+class _StrTable:
+    """blob + offsets 문자열 표 (필요한 칸만 그때 디코드, 시퀀스처럼 len / [k] / bisect 가능)"""
+    def __init__(self, blob, offsets):
+        self.blob, self.offsets = blob, offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, k):
+        return bytes(self.blob[self.offsets[k]:self.offsets[k + 1]]).decode("utf-8")
+
+def _pack_strings(strs):
+    enc = [s.encode("utf-8") for s in strs]
+    offsets = np.zeros(len(enc) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in enc]) if enc else []
+    return np.frombuffer(b"".join(enc), dtype=np.uint8), offsets
+
+def write_index(path, arrays, meta):
+    """{이름: ndarray} + meta → 인덱스 파일 (임시 파일에 쓰고 교체)"""
+    specs, pos = {}, 0
+    for name, a in arrays.items():
+        a = np.ascontiguousarray(a)
+        arrays[name] = a
+        specs[name] = [a.dtype.str, pos, a.size]
+        pos += -(-a.nbytes // ALIGN) * ALIGN
+    header = json.dumps({"version": INDEX_VERSION, "meta": meta, "arrays": specs}, ensure_ascii=False).encode("utf-8")
+    base = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for name, a in arrays.items():
+            f.seek(base + specs[name][1])
+            f.write(a.tobytes())
+        f.truncate(base + pos)
+    os.replace(tmp, path)
+    return str(path)
+
+def open_shared_index(path):
+    """
+    인덱스 파일 → dict (배열은 전부 mmap 위의 읽기 전용 뷰)
+    names / lnames / tids / cves는 _StrTable, meta는 헤더의 meta
+    """
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"인덱스 파일 형식이 아님: {path}")
+    hlen = int.from_bytes(mm[len(MAGIC):len(MAGIC) + 8], "little")
+    head = json.loads(mm[len(MAGIC) + 8:len(MAGIC) + 8 + hlen].decode("utf-8"))
+    if head.get("version") != INDEX_VERSION:
+        raise ValueError(f"인덱스 버전이 다름: {head.get('version')} (필요: {INDEX_VERSION})")
+    base = -(-(len(MAGIC) + 8 + hlen) // ALIGN) * ALIGN
+
+    ix = {"_mm": mm, "meta": head["meta"], "path": str(path)}
+    for name, (dtype, off, size) in head["arrays"].items():
+        ix[name] = np.frombuffer(mm, dtype=np.dtype(dtype), count=size, offset=base + off)
+    for s in ("names", "lnames", "tids", "cves"):
+        ix[s] = _StrTable(ix.pop(s + "_blob"), ix.pop(s + "_off"))
+    ix["deg"] = np.diff(ix["offsets"])
+    return ix
+
+# =========================
+# 생성
+# =========================
+def build_shared_index(out_path, bundle_path, mapping_inv, epss_lookup=None, intel=None, alpha=1.0):
+    """번들 + TID→CVE 매핑 + EPSS → 인덱스 파일 (index_arrays 참고)"""
+    arrays, meta = index_arrays(bundle_path, mapping_inv, epss_lookup=epss_lookup, intel=intel, alpha=alpha)
+    return write_index(out_path, arrays, meta)
+
+def index_arrays(bundle_path, mapping_inv, epss_lookup=None, intel=None, alpha=1.0):
+    """
+    번들 + TID→CVE 매핑 + EPSS → (배열 dict, meta)
+    epss_lookup: CVE 목록 → {CVE: {"epss", "percentile", "date"}} (batched_lookup / epss_scores)
+      EpssLookupError면 받은 값만 넣고 meta["epss_complete"] = False
+    intel: cve_intel.load_intel() 결과 (CVE_PICK="kev"/"weighted"용, 없으면 0)
+    """
+    from make_scenario import (PHASE_ORDER, load_bundle, index_objects, build_transition_graph,
+                               build_alias_tables, phase_index)
+
+    tech_by_id, tech_by_name, _, rels = index_objects(load_bundle(bundle_path))
+    edges = build_transition_graph(rels, tech_by_id, alpha=alpha)
+    tables = build_alias_tables(edges, tech_by_name)
+    names = tables["names"]
+    recs = [tech_by_name[nm.lower()] for nm in names]
+
+    lorder = sorted(range(len(names)), key=lambda k: names[k].lower())
+    node_tids = [r.get("tid", "") for r in recs]
+    tids = sorted({t for t in node_tids if t} | {t for t in mapping_inv if t})
+    tpos = {t: k for k, t in enumerate(tids)}
+
+    own = [list(dict.fromkeys(mapping_inv.get(t, []))) for t in tids]
+    cves = sorted({c for lst in own for c in lst})
+    cpos = {c: k for k, c in enumerate(cves)}
+    tid_ptr = np.zeros(len(tids) + 1, dtype=np.int64)
+    tid_ptr[1:] = np.cumsum([len(lst) for lst in own]) if own else []
+    tid_cve = np.array([cpos[c] for lst in own for c in lst], dtype=np.int32)
+
+    from epss_history import EpssLookupError
+    complete = True
+    try:
+        emap = epss_lookup(cves) if (epss_lookup and cves) else {}
+    except EpssLookupError as e:
+        emap, complete = e.partial, False
+    dates = sorted({v["date"] for v in emap.values() if v and v.get("date")})
+    dpos = {d: k for k, d in enumerate(dates)}
+    epss = np.full(len(cves), np.nan)
+    pct = np.full(len(cves), np.nan)
+    edate = np.full(len(cves), -1, dtype=np.int16)
+    cvss = np.full(len(cves), np.nan)
+    kev = np.zeros(len(cves), dtype=np.uint8)
+    for k, c in enumerate(cves):
+        v = emap.get(c)
+        if v:
+            epss[k], pct[k], edate[k] = v["epss"], v["percentile"], dpos.get(v.get("date"), -1)
+        if intel and c in intel:
+            s, kv = intel[c][0], intel[c][1]
+            cvss[k] = np.nan if s is None else s
+            kev[k] = 1 if kv else 0
+
+    arrays = {}
+    for key, strs in (("names", names), ("lnames", [names[k].lower() for k in lorder]), ("tids", tids), ("cves", cves)):
+        arrays[key + "_blob"], arrays[key + "_off"] = _pack_strings(strs)
+    arrays.update({
+        "lname_row": np.array(lorder, dtype=np.int32),
+        "node_tid": np.array([tpos.get(t, -1) for t in node_tids], dtype=np.int32),
+        "phase_idx": np.array([phase_index(r["phases"]) for r in recs], dtype=np.int16),
+        "phase_disp": np.array([next((PHASE_ORDER.index(p) for p in r["phases"] if p in PHASE_ORDER), -1)
+                                for r in recs], dtype=np.int16),
+        "offsets": tables["offsets"], "nbr": tables["nbr"], "w": tables["w"],
+        "prob": tables["prob"], "alias": tables["alias"],
+        "tid_ptr": tid_ptr, "tid_cve": tid_cve,
+        "epss": epss, "pct": pct, "epss_date": edate, "cvss": cvss, "kev": kev,
+    })
+    meta = {"phase_order": list(PHASE_ORDER), "epss_dates": dates, "alpha": alpha,
+            "n_tech": len(names), "n_edges": int(tables["offsets"][-1]), "n_tid": len(tids), "n_cve": len(cves),
+            "epss_complete": complete}
+    return arrays, meta
+
+def shared_index_path(*parts):
+    """캐시 키 조각(번들/매핑 해시, EPSS 출처 등) → graph_cache/shared-<키>.idx"""
+    import hashlib
+    key = hashlib.sha256("|".join(map(str, parts)).encode("utf-8")).hexdigest()[:16]
+    here = os.path.dirname(os.path.abspath(__file__))
+    root = os.environ.get("SCENARIO_CACHE_DIR") or os.path.join(here, "graph_cache")
+    return os.path.join(root, f"shared-{key}.idx")
+
+def ensure_shared_index(bundle_path, mapping_path, mapping_inv, epss_lookup=None, epss_tag="", intel=None, alpha=1.0):
+    """
+    번들·매핑·CVE 인텔 내용 해시 + EPSS 출처 태그로 캐시된 인덱스를 찾고, 없으면 새로 만듦 → (경로, 임시 파일 여부)
+    EPSS 묶음이 하나라도 실패했으면 캐시에 남기지 않고 이번 실행 전용 임시 파일로 씀 (다음 실행에서 다시 조회)
+    임시 파일이면 호출한 쪽이 다 쓴 뒤 지움
+    """
+    from artifact_manifest import content_hash, record_artifact
+    from run_metrics import record_cache
+    intel_tag = (content_hash("cve_intel") or f"n={len(intel)}") if intel else "-"  # load_intel()이 등록한 파일
+    parts = (INDEX_VERSION, record_artifact("bundle", bundle_path)["sha256"],
+             record_artifact("mapping", mapping_path)["sha256"], epss_tag, alpha, intel_tag)
+    path = shared_index_path(*parts)
+    hit = os.path.isfile(path)
+    record_cache("shared_index", hits=int(hit), misses=int(not hit))
+    if hit:
+        return path, False
+    arrays, meta = index_arrays(bundle_path, mapping_inv, epss_lookup=epss_lookup, intel=intel, alpha=alpha)
+    if not meta["epss_complete"]:
+        import tempfile
+        path = os.path.join(tempfile.gettempdir(), f"{os.getpid()}-{os.path.basename(path)}")
+        print(f"[!] EPSS 조회 일부 실패 → 인덱스를 캐시하지 않음 ({path})")
+    return write_index(path, arrays, meta), not meta["epss_complete"]
+
+# =========================
+# 조회
+# =========================
+def find_node(ix, name):
+    """기술 이름(대소문자 무관) → 노드 번호, 없으면 -1"""
+    key = name.strip().lower()
+    k = bisect_left(ix["lnames"], key)
+    return int(ix["lname_row"][k]) if k < len(ix["lnames"]) and ix["lnames"][k] == key else -1
+
+def find_tid(ix, tid):
+    k = bisect_left(ix["tids"], tid)
+    return k if tid and k < len(ix["tids"]) and ix["tids"][k] == tid else -1
+
+def _own(ix, t):
+    return ix["tid_cve"][ix["tid_ptr"][t]:ix["tid_ptr"][t + 1]] if t >= 0 else ix["tid_cve"][:0]
+
+def _family(ix, root):
+    """부모 + 하위 기술(사전순으로 부모 바로 뒤 연속 구간) CVE, 처음 나온 순서로 중복 제거"""
+    t = find_tid(ix, root)
+    lo = bisect_left(ix["tids"], root + ".")
+    hi = bisect_left(ix["tids"], root + "/")
+    parts = ([_own(ix, t)] if t >= 0 else []) + [_own(ix, c) for c in range(lo, hi)]
+    pool = np.concatenate(parts) if parts else ix["tid_cve"][:0]
+    _, first = np.unique(pool, return_index=True)
+    return pool[np.sort(first)]
+
+def _pick_keys(ix, ids, pick, weights):
+    e = ix["epss"][ids]
+    if pick == "kev":
+        return ix["kev"][ids] * 2.0 + e
+    if pick == "weighted":
+        from cve_intel import PICK_WEIGHTS
+        w = dict(PICK_WEIGHTS, **(weights or {}))
+        return w["epss"] * e + w["cvss"] * (np.nan_to_num(ix["cvss"][ids]) / 10.0) + w["kev"] * ix["kev"][ids]
+    return e
+
+def _best(ix, ids, pick, weights):
+    # tid_hierarchy._best와 같은 규칙: EPSS가 있는 CVE 중 키 최고, 같으면 뒤쪽 CVE
+    ids = ids[~np.isnan(ix["epss"][ids])]
+    if not ids.size:
+        return None
+    keys = _pick_keys(ix, ids, pick, weights)
+    c = int(ids[len(ids) - 1 - int(np.argmax(keys[::-1]))])
+    d = int(ix["epss_date"][c])
+    return (ix["cves"][c], float(ix["epss"][c]), float(ix["pct"][c]), ix["meta"]["epss_dates"][d] if d >= 0 else "")
+
+def lookup_cve(ix, tid, fallback=None, pick="epss", weights=None):
+    """tid_hierarchy.lookup_cve와 같은 (CVE, EPSS, percentile, date, via)"""
+    from tid_hierarchy import NO_CVE, parent_tid
+    if not tid:
+        return NO_CVE
+    t = find_tid(ix, tid)
+    own = _own(ix, t)
+    if own.size:
+        b = _best(ix, own, pick, weights)
+        return b + ("",) if b else NO_CVE
+    if fallback == "parent":
+        p = parent_tid(tid)
+        pool, via = _own(ix, find_tid(ix, p)) if p else own, f"parent:{p}"
+    elif fallback == "family":
+        root = parent_tid(tid) or tid
+        pool, via = _family(ix, root), f"family:{root}"
+    else:
+        return NO_CVE
+    b = _best(ix, pool, pick, weights)
+    return b + (via,) if b else NO_CVE
+
+def greedy_path(ix, start, path_len=6):
+    """make_scenario.best_path_from_name과 같은 greedy (beta 가중치 없음): 점수 최고, 같으면 이름 뒤쪽"""
+    path, seen, cur = [start], {start}, start
+    for _ in range(path_len - 1):
+        lo, hi = ix["offsets"][cur], ix["offsets"][cur + 1]
+        best = None
+        for j, s in zip(ix["nbr"][lo:hi].tolist(), ix["w"][lo:hi].tolist()):
+            if j not in seen and (best is None or (s, j) > best):
+                best = (s, j)
+        if best is None:
+            break
+        cur = best[1]
+        path.append(cur)
+        seen.add(cur)
+    return path
+
+def path_steps(ix, nodes):
+    """노드 번호 목록 → [{step, phase, name}] (read_steps_csv와 같은 형식)"""
+    order = ix["meta"]["phase_order"]
+    steps = []
+    for v in nodes:
+        if v < 0:
+            break
+        d = int(ix["phase_disp"][v])
+        steps.append({"step": len(steps) + 1, "phase": order[d] if d >= 0 else "unknown", "name": ix["names"][v]})
+    return steps
+
+# =========================
+# 프로세스 풀
+# =========================
+_IX = None
+_OPTS = None
+
+def _init_worker(path, opts):
+    global _IX, _OPTS
+    _IX, _OPTS = open_shared_index(path), opts
+
+def scenario_task(task):
+    """
+    (시작 기술 이름, 랜덤워크 시드) → (시작 이름, steps, 단계별 lookup_cve 결과)
+    worker는 인덱스 뷰만 읽음 (번들/매핑 파싱 없음)
+    """
+    start_name, seed = task
+    ix, o = _IX, _OPTS
+    v = find_node(ix, start_name)
+    if v < 0:
+        return start_name, [], []
+    if o.get("random_walk"):
+        from make_scenario import sample_walks
+        nodes = sample_walks(ix, 1, path_len=o["path_len"], start_idx=v, seed=seed)[0].tolist()
+    else:
+        nodes = greedy_path(ix, v, o["path_len"])
+    steps = path_steps(ix, nodes)
+    picks = []
+    for v in nodes[:len(steps)]:
+        t = int(ix["node_tid"][v])
+        tid = ix["tids"][t] if t >= 0 else ""
+        picks.append(lookup_cve(ix, tid, o.get("fallback"), o.get("pick", "epss"), o.get("weights")))
+    return start_name, steps, picks
+
+def pool_scenarios(path, tasks, workers, opts):
+    """
+    tasks 순서대로 scenario_task 결과를 내보내는 제너레이터 (worker는 인덱스를 mmap으로 공유)
+    tasks는 지연 이터러블이어도 됨 — 동시에 workers*4개만 제출하므로 앞 결과를 보고 다음 시작을 고를 수 있고,
+    중간에 멈추면(close) 남은 작업은 취소
+    """
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+    from itertools import islice
+
+    it = iter(tasks)
+    ex = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(path, opts))
+    try:
+        window = deque(ex.submit(scenario_task, t) for t in islice(it, workers * 4))
+        while window:
+            res = window.popleft().result()
+            for t in islice(it, 1):
+                window.append(ex.submit(scenario_task, t))
+            yield res
+    finally:
+        ex.shutdown(wait=False, cancel_futures=True)
+
+# =========================
+# 메인
+# =========================
+def main():
+    p = argparse.ArgumentParser(description="worker 공유용 mmap 인덱스")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="번들 + 매핑 + EPSS(스냅샷 저장소) → 인덱스")
+    b.add_argument("--bundle")
+    b.add_argument("--mapping")
+    b.add_argument("--epss-mode", choices=("asof", "max", "trend"), help="epss_history 저장소 점수 (생략하면 EPSS 비움)")
+    b.add_argument("--epss-as-of")
+    b.add_argument("--alpha", type=float, default=1.0)
+    b.add_argument("--out", help="출력 경로 (기본: graph_cache/shared-<키>.idx)")
+    i = sub.add_parser("info", help="인덱스 요약")
+    i.add_argument("path")
+    args = p.parse_args()
+
+    if args.cmd == "info":
+        ix = open_shared_index(args.path)
+        print(json.dumps(ix["meta"], ensure_ascii=False, indent=2))
+        print(f"파일 크기: {os.path.getsize(args.path):,} bytes")
+        return
+
+    import pandas as pd
+    from artifact_manifest import find_artifact
+    bundle = find_artifact("bundle", [args.bundle] if args.bundle else None)
+    mapping = find_artifact("mapping", [args.mapping] if args.mapping else None)
+    if not bundle or not mapping:
+        raise SystemExit("번들 / 매핑 CSV를 찾지 못함 (--bundle / --mapping)")
+    df = pd.read_csv(mapping, dtype="string")
+    df.columns = df.columns.str.strip()
+    cve = df["CVE ID"].str.replace("\u2010|\u2011|\u2012|\u2013|\u2212", "-", regex=True).str.strip().str.upper()
+    tid_cols = [df[c].str.strip().fillna("").tolist() for c in df.columns if c.upper() in ("TID_1", "TID_2")]
+    inv = {}
+    # 행 순서 → TID_1, TID_2 순 (각 스크립트의 read_mapping과 같은 CVE 순서)
+    for c, *ts in zip(cve.fillna("").tolist(), *tid_cols):
+        for t in ts:
+            if c and t:
+                inv.setdefault(t, []).append(c)
+
+    lookup, tag = None, "-"
+    if args.epss_mode:
+        from epss_history import epss_scores, history_tag, resolve_day
+        day = resolve_day(args.epss_as_of)
+        lookup = lambda cs: epss_scores(cs, mode=args.epss_mode, day=day)
+        tag = history_tag(args.epss_mode, day)
+    temp = False
+    if args.out:
+        path = build_shared_index(args.out, bundle, inv, epss_lookup=lookup, alpha=args.alpha)
+    else:
+        path, temp = ensure_shared_index(bundle, mapping, inv, epss_lookup=lookup, epss_tag=tag, alpha=args.alpha)
+    print(f"[+] {path}  ({os.path.getsize(path):,} bytes){'  (임시 — 캐시되지 않음)' if temp else ''}")
+
+if __name__ == "__main__":
+    main()
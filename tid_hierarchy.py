@@ -0,0 +1,130 @@
+# tid_hierarchy.py — 기술 ID 계층(T1555 → T1555.003) 인덱스와 단계별 CVE 집계
+#
+# 매핑 CSV(TID → [CVE])는 T1555와 T1555.003을 서로 무관한 문자열로 다루기 때문에
+# 하위 기술에 CVE가 하나도 없으면 부모 기술에 CVE가 많아도 그 단계는 0점이 됨.
+# 인덱스 시점에 부모 → 자식 트리와 수준별 CVE 목록/개수를 한 번 만들어 두고,
+# EPSS를 받은 뒤에는 수준별 최고 EPSS CVE를 한 번 집계해서 단계 채점은 조회만 함.
+#
+# 대체(fallback) 정책 — 자기 TID에 매핑된 CVE가 없을 때만 적용
+#   None     : 대체 없음 (기존 동작)
+#   "parent" : 부모 기술 자체의 CVE
+#   "family" : 부모 + 모든 하위 기술(형제)의 CVE  (부모 TID면 자식들의 CVE)
+FALLBACKS = (None, "parent", "family")
+
+NO_CVE = ("", 0.0, "", "", "")
+
+def parent_tid(tid):
+    """'T1555.003' → 'T1555', 부모가 없으면 ''"""
+    return tid.split(".", 1)[0] if "." in tid else ""
+
+def _family_root(tid):
+    return parent_tid(tid) or tid
+
+def _unique(seq):
+    return list(dict.fromkeys(seq))
+
+# =========================
+# 인덱스 (매핑 기준, EPSS 무관)
+# =========================
+def build_tid_hierarchy(tids, mapping_inv):
+    """
+    tids: 번들의 TID들, mapping_inv: {TID: [CVE, ...]} (read_mapping 결과)
+    반환 dict:
+      children: {부모 TID: [하위 TID, ...]}
+      own:      {TID: [CVE, ...]}            (매핑 그대로, 중복 제거)
+      family:   {부모 TID: [CVE, ...]}       (부모 + 하위 기술 전체, 중복 제거)
+      n_own / n_family: 수준별 CVE 개수
+      best_own / best_family: attach_epss() 뒤에 채워짐 (lookup_cve가 조회)
+    """
+    all_tids = sorted({t for t in tids if t} | {t for t in mapping_inv if t})
+    children = {}
+    for t in all_tids:
+        p = parent_tid(t)
+        if p:
+            children.setdefault(p, []).append(t)
+
+    own = {t: _unique(mapping_inv.get(t, [])) for t in all_tids if mapping_inv.get(t)}
+    family = {}
+    for t in all_tids:
+        if parent_tid(t):
+            continue
+        pool = list(own.get(t, []))
+        for c in children.get(t, []):
+            pool.extend(own.get(c, []))
+        if pool:
+            family[t] = _unique(pool)
+
+    return {
+        "children": children,
+        "own": own,
+        "family": family,
+        "n_own": {t: len(v) for t, v in own.items()},
+        "n_family": {t: len(v) for t, v in family.items()},
+        "best_own": {},
+        "best_family": {},
+    }
+
+def _pool(h, tid, fallback):
+    """대체 정책에 따른 (CVE 목록, 출처 키, 출처 표시)"""
+    if fallback == "parent":
+        p = parent_tid(tid)
+        return h["own"].get(p, []), ("own", p), f"parent:{p}"
+    if fallback == "family":
+        root = _family_root(tid)
+        return h["family"].get(root, []), ("family", root), f"family:{root}"
+    return [], None, ""
+
+def step_cves(h, tid, fallback=None):
+    """단계의 EPSS 조회 대상 CVE — 자기 CVE, 없으면 대체 정책의 CVE"""
+    if not tid:
+        return []
+    cves = h["own"].get(tid)
+    if cves:
+        return cves
+    return _pool(h, tid, fallback)[0]
+
+# =========================
+# EPSS 집계
+# =========================
+def _best(cves, epss_map, key=None):
+    # 기존 단계 루프와 같은 규칙: EPSS가 있는 CVE 중 최고값, 같으면 뒤쪽 CVE
+    # key(CVE, EPSS)를 주면 그 값으로 비교 (cve_intel.pick_key — CVSS/KEV 반영)
+    best = None
+    best_k = None
+    for c in cves:
+        m = epss_map.get(c)
+        if not m:
+            continue
+        k = key(c, m["epss"]) if key else m["epss"]
+        if best_k is None or k >= best_k:
+            best, best_k = (c, m["epss"], m["percentile"], m["date"]), k
+    return best
+
+def attach_epss(h, epss_map, key=None):
+    """수준별(TID 자신 / 부모 계열) 대표 CVE를 한 번에 계산해 h에 저장 (기본: EPSS 최고)"""
+    h["best_own"] = {t: b for t, cves in h["own"].items() if (b := _best(cves, epss_map, key))}
+    h["best_family"] = {t: b for t, cves in h["family"].items() if (b := _best(cves, epss_map, key))}
+    return h
+
+def lookup_cve(h, tid, fallback=None):
+    """
+    반환: (CVE, EPSS, percentile, date, via) — via는 대체했을 때만 'parent:T1555' / 'family:T1555'
+    CVE가 없으면 NO_CVE
+    """
+    if not tid:
+        return NO_CVE
+    if tid in h["own"]:
+        b = h["best_own"].get(tid)
+        return b + ("",) if b else NO_CVE
+    _, key, via = _pool(h, tid, fallback)
+    if key is None:
+        return NO_CVE
+    kind, t = key
+    b = h["best_own" if kind == "own" else "best_family"].get(t)
+    return b + (via,) if b else NO_CVE
+
+def family_stats(h, tid):
+    """TID 계열 요약: (부모 TID, 하위 기술 수, 자기 CVE 수, 계열 CVE 수, 계열 최고 EPSS)"""
+    root = _family_root(tid)
+    b = h["best_family"].get(root)
+    return root, len(h["children"].get(root, [])), h["n_own"].get(tid, 0), h["n_family"].get(root, 0), (b[1] if b else 0.0)